@@ -51,6 +51,11 @@ def make_parser():
         default="640,640",
         help="Specify an input shape for inference.",
     )
+    parser.add_argument(
+        "--end2end",
+        action="store_true",
+        help="Whether the model was exported with --end2end (decode and NMS in the graph).",
+    )
     return parser
 
 
@@ -74,6 +79,20 @@ if __name__ == '__main__':
     ort_inputs = {session.get_inputs()[0].name: img[None, :, :, :]}
     output = session.run(None, ort_inputs)
     
+    if args.end2end:
+        # [max_det, 6] (x1, y1, x2, y2, score, class) detections, padded with zeros
+        dets = output[0][0]
+        dets = dets[dets[:, 4] >= args.score_thr]
+        print(f"Se encontraron {len(dets)} detecciones válidas")
+        if len(dets) > 0:
+            origin_img = vis(origin_img, dets[:, :4] / ratio, dets[:, 4], dets[:, 5],
+                             conf=args.score_thr, class_names=CLASSES_PERSONALIZADAS)
+        mkdir(args.output_dir)
+        output_path = os.path.join(args.output_dir, os.path.basename(args.image_path))
+        cv2.imwrite(output_path, origin_img)
+        print(f"Resultado guardado en: {output_path}")
+        exit(0)
+
     print(f"Shape de output: {output[0].shape}")
     print(f"Rango de valores en output: min={np.min(output[0])}, max={np.max(output[0])}")
     
@@ -31,7 +31,8 @@ class Exp(MyExp):
             preproc=TrainTransform(
                 max_labels=50,
                 flip_prob=self.flip_prob,
-                hsv_prob=self.hsv_prob),
+                hsv_prob=self.hsv_prob,
+                dtype=self.data_dtype),
             cache=cache,
             cache_type=cache_type,
             
@@ -45,7 +46,7 @@ class Exp(MyExp):
             data_dir="datasets/VOCdevkit",
             image_sets=[("2020", "val")],
             img_size=self.test_size,
-            preproc=ValTransform(legacy=legacy),
+            preproc=ValTransform(legacy=legacy, dtype=self.data_dtype),
             
         )
 
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.nn.parallel import DistributedDataParallel as DDP
+
+from yolox.core.distill_trainer import (
+    DistillTrainer,
+    FeatureAdapters,
+    IndexedDataset,
+    head_predictions,
+    register_distill_hooks
+)
+from yolox.data import Dataset
+from yolox.exp import get_exp
+
+
+class ConstantDataset(Dataset):
+    """Images filled with 10 times their index, at the input size, all with the image id 0."""
+
+    def __init__(self):
+        super().__init__((96, 96))
+
+    def __len__(self):
+        return 3
+
+    @Dataset.mosaic_getitem
+    def __getitem__(self, index):
+        img = np.full((3, *self.input_dim), index * 10, dtype=np.float32)
+        return img, np.zeros((1, 5), dtype=np.float32), self.input_dim, np.array([0])
+
+
+class TestDistillHooks(unittest.TestCase):
+
+    def test_head_predictions(self):
+        model = get_exp(exp_name="yolox-nano").get_model().eval()
+        store = {}
+        register_distill_hooks(model, store)
+        with torch.no_grad():
+            outputs = model(torch.rand(2, 3, 128, 96) * 255)
+
+        self.assertEqual(len(store["fpn"]), 3)
+        preds = head_predictions(store)
+        self.assertEqual(preds.shape, (2, outputs.shape[1], 81))
+        # same anchor order as the outputs of the head
+        self.assertTrue(torch.allclose(preds.sigmoid(), outputs[..., 4:]))
+
+    def test_teacher_cache_key(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            ckpt_files = [os.path.join(tmp_dir, "{}.pth".format(i)) for i in range(2)]
+            for i, ckpt_file in enumerate(ckpt_files):
+                torch.save({"model": {"w": torch.full((2,), float(i))}}, ckpt_file)
+
+            def key(ckpt_file, input_size=(640, 640), teacher_exp="yolox-l"):
+                exp = SimpleNamespace(
+                    teacher_exp=teacher_exp, teacher_ckpt=ckpt_file, input_size=input_size
+                )
+                return DistillTrainer.teacher_cache_key(SimpleNamespace(exp=exp))
+
+            self.assertEqual(key(ckpt_files[0]), key(ckpt_files[0]))
+            self.assertNotEqual(key(ckpt_files[0]), key(ckpt_files[1]))
+            self.assertNotEqual(key(ckpt_files[0]), key(ckpt_files[0], (320, 320)))
+            self.assertNotEqual(key(ckpt_files[0]), key(ckpt_files[0], teacher_exp="yolox-m"))
+
+    def test_build_teacher_cache(self):
+        teacher = get_exp(exp_name="yolox-nano").get_model().eval()
+        teacher_store = {}
+        register_distill_hooks(teacher, teacher_store)
+        dataset = IndexedDataset(ConstantDataset())
+        self.assertEqual(dataset[(False, 2, (64, 64))][3].tolist(), [2])
+        self.assertEqual(dataset.input_dim, (64, 64))
+
+        # dataset left at another multiscale size, and ids repeating
+        dataset._input_dim = (96, 96)
+        trainer = SimpleNamespace(
+            teacher=teacher, teacher_store=teacher_store, device="cpu",
+            data_type=torch.float32, amp_training=False, args=SimpleNamespace(batch_size=2),
+            exp=SimpleNamespace(input_size=(64, 64), data_num_workers=0),
+            train_loader=SimpleNamespace(dataset=dataset),
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_file = os.path.join(tmp_dir, "teacher_outputs.npy")
+            shape = (3, 8 * 8 + 4 * 4 + 2 * 2, 81)
+            DistillTrainer.build_teacher_cache(trainer, cache_file, shape)
+            self.assertEqual(os.listdir(tmp_dir), ["teacher_outputs.npy"])
+            cache = np.load(cache_file)
+
+        with torch.no_grad():
+            teacher(torch.full((1, 3, 64, 64), 20.0))
+        expected = head_predictions(teacher_store)[0].numpy().astype(np.float16)
+        self.assertTrue(np.allclose(cache[2], expected, atol=1e-2))
+
+
+def adapters_worker(rank, init_file, grads_file):
+    dist.init_process_group("gloo", "file://" + init_file, rank=rank, world_size=2)
+    torch.manual_seed(rank)
+    adapters = DDP(FeatureAdapters([4, 8], [6, 10]))
+    features = [torch.rand(2, 4, 8, 8) * (rank + 1), torch.rand(2, 8, 4, 4) * (rank + 1)]
+    sum(feat.square().mean() for feat in adapters(features)).backward()
+    torch.save([p.grad for p in adapters.parameters()], grads_file.format(rank))
+    dist.destroy_process_group()
+
+
+class TestFeatureAdapters(unittest.TestCase):
+
+    def test_distributed_grads(self):
+        # every rank must step the same adapters, from the gradients of all ranks
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            grads_file = os.path.join(tmp_dir, "grads_{}.pth")
+            mp.spawn(
+                adapters_worker, args=(os.path.join(tmp_dir, "init"), grads_file), nprocs=2
+            )
+            grads = [torch.load(grads_file.format(rank)) for rank in range(2)]
+        for grad_0, grad_1 in zip(*grads):
+            self.assertTrue(torch.equal(grad_0, grad_1))
+
+
+if __name__ == "__main__":
+    unittest.main()
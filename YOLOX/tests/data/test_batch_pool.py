@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import threading
+import time
+import unittest
+
+import numpy as np
+
+import torch
+from torch.utils.data.dataloader import default_collate
+
+from yolox.data import AsyncPrefetcher, BatchPool, DataLoader, trim_labels_collate
+
+
+class SampleDataset(torch.utils.data.Dataset):
+    """(img, padded_labels, img_info, img_id) samples, with an input size per 4 samples."""
+
+    input_dim = (16, 16)
+
+    def __len__(self):
+        return 20
+
+    def __getitem__(self, index):
+        img = np.full((3, 8 + 8 * (index // 4 % 2), 16), index, dtype=np.float32)
+        labels = np.zeros((10, 5), dtype=np.float32)
+        labels[:index % 4 + 1] = index
+        return img, labels, (480, 640), np.array([index])
+
+
+class TestBatchPool(unittest.TestCase):
+
+    def setUp(self):
+        self.dataset = SampleDataset()
+        self.batches = [
+            [self.dataset[i] for i in (0, 1, 2)],
+            [self.dataset[i] for i in (4, 5)],
+        ]
+
+    def assert_batches_equal(self, batch, expected):
+        for x, y in zip(batch, expected):
+            if isinstance(y, (list, tuple)):
+                self.assert_batches_equal(x, y)
+            else:
+                self.assertTrue(torch.equal(x, y))
+
+    def test_collate(self):
+        pool = BatchPool(2, 4, (16, 16), max_labels=10, pin=False)
+        for samples in self.batches:
+            batch, = pool.unpack([pool(samples)])
+            self.assert_batches_equal(batch, default_collate(samples))
+            self.assertTrue(batch[0].is_contiguous() and batch[1].is_contiguous())
+
+        self.assertTrue(pool.free_slots.empty())
+        pool.release(pool.slot_of(batch[0]))
+        self.assertEqual(pool.free_slots.get(), 1)
+
+    def test_trim_labels(self):
+        pool = BatchPool(1, 4, (16, 16), max_labels=10, trim_labels=True, pin=False)
+        batch, = pool.unpack([pool(self.batches[0])])
+        self.assertEqual(batch[1].shape, (3, 3, 5))
+        self.assert_batches_equal(batch, trim_labels_collate(self.batches[0]))
+
+    def test_loader(self):
+        num_workers, depth = 2, 2
+        pool = BatchPool(
+            2 * num_workers + depth + 2, 4, (16, 16), max_labels=10, trim_labels=True, pin=False,
+        )
+        sampler = torch.utils.data.BatchSampler(
+            torch.utils.data.SequentialSampler(self.dataset), 4, drop_last=False
+        )
+        loader = DataLoader(
+            self.dataset, batch_sampler=sampler, num_workers=num_workers, collate_fn=pool,
+        )
+        reference = DataLoader(
+            self.dataset, batch_sampler=sampler, collate_fn=trim_labels_collate,
+        )
+        # more batches than slots, slots are recycled by the prefetcher
+        for _ in range(2):
+            prefetcher = AsyncPrefetcher(loader, "cpu", depth=depth)
+            for inps, targets, _, img_ids in reference:
+                self.assert_batches_equal(prefetcher.next(), (inps, targets))
+                self.assertTrue(torch.equal(prefetcher.img_ids, img_ids))
+            self.assertEqual(prefetcher.next(), (None, None))
+
+    def test_restart(self):
+        num_workers, depth = 2, 2
+        # fewer slots than batches in flight, so that workers wait for slots
+        pool = BatchPool(depth + 2, 4, (16, 16), max_labels=10, trim_labels=True, pin=False)
+        batches = [list(range(i, i + 4)) for i in range(0, 20, 4)] * 10
+        reference = trim_labels_collate([self.dataset[i] for i in batches[0]])
+        loader = DataLoader(
+            self.dataset, batch_sampler=batches, num_workers=num_workers, collate_fn=pool,
+        )
+        prefetcher = AsyncPrefetcher(loader, "cpu", depth=depth)
+        self.assert_batches_equal(prefetcher.next(), reference[:2])
+        # let the workers take all the slots and wait for more
+        time.sleep(0.5)
+        prefetcher.close()
+
+        # new loader on the same pool, as DistillTrainer.use_teacher_cache does
+        loader = DataLoader(
+            self.dataset, batch_sampler=batches, num_workers=num_workers,
+            collate_fn=loader.collate_fn,
+        )
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(AsyncPrefetcher(loader, "cpu", depth=depth).next()),
+            daemon=True,
+        )
+        thread.start()
+        thread.join(timeout=60)
+        self.assertFalse(thread.is_alive(), "restarted loader is blocked")
+        self.assert_batches_equal(results[0], reference[:2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import importlib.util
+import os
+import unittest
+
+import cv2
+import numpy as np
+
+import torch
+
+from yolox.data import MosaicDetection
+from yolox.data.data_augment import (
+    TrainTransform,
+    ValTransform,
+    augment_hsv,
+    preproc,
+    preproc_batch
+)
+from yolox.models.network_blocks import InputNorm
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def reference_preproc(img, input_size):
+    padded_img = np.ones((input_size[0], input_size[1], 3), dtype=np.uint8) * 114
+    r = min(input_size[0] / img.shape[0], input_size[1] / img.shape[1])
+    resized_img = cv2.resize(
+        img, (int(img.shape[1] * r), int(img.shape[0] * r)), interpolation=cv2.INTER_LINEAR,
+    )
+    padded_img[: int(img.shape[0] * r), : int(img.shape[1] * r)] = resized_img
+    return np.ascontiguousarray(padded_img.transpose(2, 0, 1), dtype=np.float32), r
+
+
+class TestPreproc(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.imgs = [
+            rng.integers(0, 256, shape, dtype=np.uint8)
+            for shape in [(480, 640, 3), (640, 480, 3), (100, 100, 3), (720, 1280, 3)]
+        ]
+        self.input_size = (320, 416)
+
+    def test_preproc(self):
+        for img in self.imgs:
+            padded_img, r = preproc(img, self.input_size)
+            ref_img, ref_r = reference_preproc(img, self.input_size)
+            self.assertEqual(padded_img.dtype, np.float32)
+            self.assertEqual(r, ref_r)
+            self.assertTrue(np.array_equal(padded_img, ref_img))
+
+    def test_preproc_batch(self):
+        out, ratios = preproc_batch(self.imgs, self.input_size)
+        self.assertEqual(out.shape, (len(self.imgs), 3, *self.input_size))
+        for img, padded_img, r in zip(self.imgs, out, ratios):
+            ref_img, ref_r = reference_preproc(img, self.input_size)
+            self.assertEqual(r, ref_r)
+            self.assertTrue(np.array_equal(padded_img, ref_img))
+
+    def test_preproc_batch_reuse_buffer(self):
+        buffer = np.zeros((8, 3, *self.input_size), dtype=np.uint8)
+        out, _ = preproc_batch(self.imgs[:2], self.input_size, out=buffer, fill=0)
+        self.assertEqual(out.dtype, np.uint8)
+        self.assertEqual(len(out), 2)
+        self.assertTrue(np.shares_memory(out, buffer))
+
+        out, _ = preproc_batch(self.imgs, self.input_size, out=buffer)
+        self.assertTrue(np.shares_memory(out, buffer))
+        for img, padded_img in zip(self.imgs, out):
+            ref_img, _ = reference_preproc(img, self.input_size)
+            self.assertTrue(np.array_equal(padded_img, ref_img.astype(np.uint8)))
+
+        # buffer of mismatched shape is not reused
+        out, _ = preproc_batch(self.imgs, (64, 64), out=buffer)
+        self.assertFalse(np.shares_memory(out, buffer))
+
+    def test_flip(self):
+        out, _ = preproc_batch(self.imgs, self.input_size, flips=[True, False, True, True])
+        for i, (img, padded_img) in enumerate(zip(self.imgs, out)):
+            ref_img, _ = reference_preproc(img[:, ::-1] if i != 1 else img, self.input_size)
+            # interpolation weights of a mirrored position may round the other way
+            self.assertLessEqual(np.abs(padded_img - ref_img).max(), 1)
+        padded_img, _ = preproc(self.imgs[0], self.input_size, flip=True)
+        self.assertTrue(np.array_equal(padded_img, out[0]))
+
+    def test_train_transform(self):
+        targets = np.array([[10, 20, 110, 220, 3], [0, 0, 1, 1, 2]], dtype=np.float32)
+        transform = TrainTransform(max_labels=4, flip_prob=1.0, hsv_prob=0.0)
+        for img in self.imgs:
+            padded_img, padded_labels = transform(img.copy(), targets, self.input_size)
+            ref_img, r = reference_preproc(img[:, ::-1], self.input_size)
+            self.assertLessEqual(np.abs(padded_img - ref_img).max(), 1)
+            width = img.shape[1]
+            expected = np.zeros((4, 5), dtype=np.float32)
+            if r > 1:
+                expected[:2] = [[3, width - 60, 120, 100, 200], [2, width - 0.5, 0.5, 1, 1]]
+            else:
+                # the box too small once resized is dropped
+                expected[0] = [3, width - 60, 120, 100, 200]
+            expected[:, 1:] *= r
+            self.assertTrue(np.allclose(padded_labels, expected, atol=1e-4))
+
+        # no box left after resizing, the sample is letterboxed without augmentation
+        padded_img, padded_labels = transform(self.imgs[3].copy(), targets[1:], self.input_size)
+        ref_img, r = reference_preproc(self.imgs[3], self.input_size)
+        self.assertTrue(np.array_equal(padded_img, ref_img))
+        self.assertTrue(np.allclose(padded_labels[0], [2, 0.5 * r, 0.5 * r, r, r]))
+
+    def test_uint8_legacy_transform(self):
+        float_transform = ValTransform(legacy=True)
+        uint8_transform = ValTransform(legacy=True, dtype=np.uint8)
+        input_norm = InputNorm(legacy=True)
+        for img in self.imgs:
+            ref_img, _ = float_transform(img, None, self.input_size)
+            uint8_img, _ = uint8_transform(img, None, self.input_size)
+            self.assertEqual(uint8_img.dtype, np.uint8)
+            normed_img = input_norm(torch.from_numpy(uint8_img)[None])[0]
+            self.assertTrue(torch.allclose(normed_img, torch.from_numpy(ref_img), atol=1e-5))
+
+
+def import_benchmark():
+    spec = importlib.util.spec_from_file_location(
+        "benchmark_data", os.path.join(ROOT, "tools", "benchmark_data.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestAugmentHsv(unittest.TestCase):
+
+    def test_matches_int16_shifts(self):
+        # the benchmark compares against the same previous implementation
+        reference_augment_hsv = import_benchmark().augment_hsv_int16
+        img = np.random.default_rng(0).integers(0, 256, (60, 80, 3), dtype=np.uint8)
+        num_unchanged = 0
+        for seed in range(40):
+            expected, augmented = img.copy(), img.copy()
+            shifted = reference_augment_hsv(expected, np.random.default_rng(seed))
+            augment_hsv(augmented, rng=np.random.default_rng(seed))
+            if shifted:
+                self.assertTrue(np.array_equal(augmented, expected))
+            else:
+                # no hsv round trip without shift
+                self.assertTrue(np.array_equal(augmented, img))
+                num_unchanged += 1
+        self.assertLess(num_unchanged, 20)
+
+
+class BoxesDataset:
+    """Random images with a few boxes, as pulled by MosaicDetection."""
+
+    def __init__(self, size=8):
+        rng = np.random.default_rng(0)
+        self.imgs = [rng.integers(0, 256, (96, 128, 3), dtype=np.uint8) for _ in range(size)]
+        self.labels = np.array([[10, 10, 60, 50, 0], [40, 30, 120, 90, 1]], dtype=np.float32)
+
+    def __len__(self):
+        return len(self.imgs)
+
+    def load_anno(self, index):
+        return self.labels
+
+    def pull_item(self, index):
+        return self.imgs[index].copy(), self.labels.copy(), (96, 128), np.array([index])
+
+
+class TestCounterRng(unittest.TestCase):
+
+    def test_mosaic_is_a_function_of_the_key(self):
+        dataset = MosaicDetection(
+            BoxesDataset(), (64, 64), preproc=TrainTransform(max_labels=20), mosaic_prob=0.5,
+            mixup_prob=0.5,
+        )
+        keys = [(7, batch, 0, idx) for batch in range(4) for idx in range(4)]
+        samples = [dataset[(True, key[3], None, key)] for key in keys]
+        # in any order, in any process, the same key gives the same sample
+        np.random.seed(1)
+        for key, sample in reversed(list(zip(keys, samples))):
+            img, labels, _, _ = dataset[(True, key[3], None, key)]
+            self.assertTrue(np.array_equal(img, sample[0]))
+            self.assertTrue(np.array_equal(labels, sample[1]))
+        # and different keys different augmentations of the same image
+        self.assertFalse(np.array_equal(samples[0][0], samples[4][0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import unittest
+
+import torch
+
+from yolox.data import AsyncPrefetcher
+
+
+class TestAsyncPrefetcher(unittest.TestCase):
+
+    def setUp(self):
+        self.batches = [
+            (
+                torch.full((2, 3, 4, 4), i, dtype=torch.uint8),
+                torch.full((2, 5, 5), i),
+                None,
+                torch.tensor([[2 * i], [2 * i + 1]]),
+            )
+            for i in range(5)
+        ]
+
+    def test_order_and_exhaustion(self):
+        prefetcher = AsyncPrefetcher(self.batches, "cpu", depth=3)
+        for i in range(len(self.batches)):
+            inps, targets = prefetcher.next()
+            self.assertTrue(torch.equal(inps, self.batches[i][0]))
+            self.assertTrue(torch.equal(targets, self.batches[i][1]))
+            self.assertTrue(torch.equal(prefetcher.img_ids, self.batches[i][3]))
+            self.assertGreaterEqual(prefetcher.wait_time, 0)
+        self.assertEqual(prefetcher.next(), (None, None))
+
+    def test_preprocess(self):
+        def preprocess(inps, targets):
+            return inps.float() / 2, targets + 1
+
+        prefetcher = AsyncPrefetcher(self.batches, "cpu", depth=1, preprocess=preprocess)
+        inps, targets = prefetcher.next()
+        self.assertEqual(inps.dtype, torch.float32)
+        self.assertTrue(torch.equal(targets, self.batches[0][1] + 1))
+
+    def test_close(self):
+        def endless_loader():
+            while True:
+                yield self.batches[0]
+
+        prefetcher = AsyncPrefetcher(endless_loader(), "cpu", depth=1)
+        prefetcher.next()
+        prefetcher.close()
+        self.assertFalse(prefetcher.thread.is_alive())
+
+    def test_loader_error(self):
+        def broken_loader():
+            yield self.batches[0]
+            raise ValueError("broken")
+
+        prefetcher = AsyncPrefetcher(broken_loader(), "cpu")
+        prefetcher.next()
+        with self.assertRaises(ValueError):
+            prefetcher.next()
+
+
+if __name__ == "__main__":
+    unittest.main()
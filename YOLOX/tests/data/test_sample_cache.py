@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+
+from yolox.data import MosaicDetection, SampleCache, TrainTransform
+
+
+class BoxesDataset:
+    """Random images of different shapes with a few boxes."""
+
+    def __init__(self):
+        rng = np.random.default_rng(0)
+        self.imgs = [
+            rng.integers(0, 256, shape, dtype=np.uint8)
+            for shape in [(96, 128, 3), (128, 64, 3), (100, 100, 3)]
+        ]
+        self.labels = np.array([[10, 10, 60, 50, 0], [40, 30, 60, 90, 1]], dtype=np.float32)
+
+    def __len__(self):
+        return len(self.imgs)
+
+    def pull_item(self, index):
+        img = self.imgs[index]
+        return img.copy(), self.labels.copy(), img.shape[:2], np.array([index + 100])
+
+
+class TestSampleCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dataset = BoxesDataset()
+        self.cache = SampleCache(self.tmp_dir.name, (64, 64), max_labels=10)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_samples(self):
+        self.assertFalse(self.cache.ready(len(self.dataset)))
+        self.cache.build(self.dataset, num_threads=2)
+        self.assertTrue(self.cache.ready(len(self.dataset)))
+
+        transform = TrainTransform(max_labels=10, flip_prob=0.0, hsv_prob=0.0, dtype=np.uint8)
+        never, always = np.random.default_rng(0), np.random.default_rng(0)
+        for index in range(len(self.dataset)):
+            img, labels, info, img_id = self.dataset.pull_item(index)
+            ref_img, ref_labels = transform(img, labels, (64, 64))
+            cached = self.cache.get(index, (64, 64), 0.0, never, dtype=np.uint8)
+            self.assertTrue(np.array_equal(cached[0], ref_img))
+            self.assertTrue(np.array_equal(cached[1], ref_labels))
+            self.assertEqual(cached[2:], (info, img_id))
+
+            # flipped inside the image, the letterbox padding stays on the right
+            width = int(img.shape[1] * min(64 / img.shape[0], 64 / img.shape[1]))
+            flipped, flipped_labels, _, _ = self.cache.get(index, (64, 64), 1.0, always)
+            self.assertEqual(flipped.dtype, np.float32)
+            self.assertTrue(np.array_equal(flipped[:, :, :width], ref_img[:, :, width - 1::-1]))
+            self.assertTrue(np.array_equal(flipped[:, :, width:], ref_img[:, :, width:]))
+            self.assertTrue(np.allclose(flipped_labels[:2, 1], width - ref_labels[:2, 1]))
+
+        _, labels, _, _ = self.cache.get(0, (64, 64), 0.0, never)
+        resized, resized_labels, _, _ = self.cache.get(0, (96, 128), 0.0, never)
+        self.assertEqual(resized.shape, (3, 96, 128))
+        self.assertTrue(np.allclose(resized_labels[:, 1:], labels[:, 1:] * [2, 1.5, 2, 1.5]))
+
+        # workers map the store again instead of receiving a copy of it
+        self.assertIsNone(pickle.loads(pickle.dumps(self.cache)).arrays)
+
+    def test_mosaic_detection(self):
+        dataset = MosaicDetection(
+            self.dataset, (64, 64), preproc=TrainTransform(max_labels=10), sample_cache=self.cache
+        )
+        key = (0, 0, 0, 1)
+        uncached = dataset[(False, 1, None, key)]
+        dataset.build_sample_cache()
+        cached = dataset[(False, 1, None, key)]
+        self.assertEqual(cached[0].shape, uncached[0].shape)
+        self.assertEqual(cached[1].shape, uncached[1].shape)
+        self.assertEqual(cached[2:], uncached[2:])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import itertools
+import unittest
+
+import numpy as np
+
+from torch.utils.data import SequentialSampler
+
+from yolox.data import (
+    GroupedBatchSampler,
+    InfiniteSampler,
+    RectBatchSampler,
+    YoloBatchSampler,
+    trim_labels_collate
+)
+
+
+class TestYoloBatchSampler(unittest.TestCase):
+
+    def test_multiscale_sizes(self):
+        sizes = [(320, 320), (416, 416), (512, 512)]
+        batch_sampler = YoloBatchSampler(
+            SequentialSampler(range(40)), 2, False, multiscale_sizes=sizes, size_interval=4
+        )
+        batches = list(batch_sampler)
+        self.assertEqual(len(batches), 20)
+        for i, batch in enumerate(batches):
+            self.assertEqual(len({item[2] for item in batch}), 1)
+            self.assertIn(batch[0][2], sizes)
+            # size only changes every `size_interval` batches
+            if i % 4:
+                self.assertEqual(batch[0][2], batches[i - 1][0][2])
+
+        # same seed, same sizes, as required to keep ranks in sync
+        other = YoloBatchSampler(
+            SequentialSampler(range(40)), 2, False, multiscale_sizes=sizes, size_interval=4
+        )
+        self.assertEqual([b[0][2] for b in other], [b[0][2] for b in batches])
+
+    def test_default_tuples(self):
+        batch_sampler = YoloBatchSampler(SequentialSampler(range(4)), 2, False, mosaic=False)
+        self.assertEqual(list(batch_sampler), [[(False, 0), (False, 1)], [(False, 2), (False, 3)]])
+
+    def test_sample_keys(self):
+        batch_sampler = YoloBatchSampler(
+            SequentialSampler(range(4)), 2, False, mosaic=False, seed=3, sample_keys=True
+        )
+        self.assertEqual(list(batch_sampler)[1], [
+            (False, 2, None, (3, 1, 0, 2)), (False, 3, None, (3, 1, 1, 3)),
+        ])
+
+    def test_set_start(self):
+        # a run resumed at batch 13 sees exactly the batches of the original run
+        sizes = [(320, 320), (416, 416), (512, 512)]
+        for world_size, rank in [(1, 0), (2, 1)]:
+            def batches(start, count):
+                batch_sampler = YoloBatchSampler(
+                    InfiniteSampler(10, seed=5, rank=rank, world_size=world_size), 3, False,
+                    multiscale_sizes=sizes, size_interval=4, sample_keys=True,
+                )
+                batch_sampler.set_start(start)
+                return list(itertools.islice(batch_sampler, count))
+
+            self.assertEqual(batches(13, 7), batches(0, 20)[13:])
+
+
+class TestInfiniteSampler(unittest.TestCase):
+
+    def test_set_start(self):
+        sampler = InfiniteSampler(7, seed=1, rank=1, world_size=2)
+        stream = list(itertools.islice(sampler, 30))
+        # starts in the second pass over the dataset
+        sampler.set_start(11)
+        self.assertEqual(list(itertools.islice(sampler, 19)), stream[11:])
+
+
+class TestGroupedBatchSampler(unittest.TestCase):
+
+    def test_groups_by_num_labels(self):
+        num_labels = [i % 5 for i in range(40)]
+        batch_sampler = GroupedBatchSampler(
+            SequentialSampler(range(40)), 8, False, num_labels=num_labels, pool_size=5
+        )
+        batches = list(batch_sampler)
+        self.assertEqual(sorted(item[1] for b in batches for item in b), list(range(40)))
+        for batch in batches:
+            self.assertEqual(len({num_labels[item[1]] for item in batch}), 1)
+
+    def test_set_start(self):
+        num_labels = [i % 5 for i in range(40)]
+
+        def batches(start, count):
+            batch_sampler = GroupedBatchSampler(
+                InfiniteSampler(40, seed=2), 4, False, num_labels=num_labels, pool_size=3
+            )
+            batch_sampler.set_start(start)
+            return list(itertools.islice(batch_sampler, count))
+
+        # the start batch is in the middle of a pool
+        self.assertEqual(batches(7, 10), batches(0, 17)[7:])
+
+    def test_trim_labels_collate(self):
+        batch = []
+        for num in (1, 3):
+            labels = np.zeros((50, 5), dtype=np.float32)
+            labels[:num] = 1
+            batch.append((np.zeros((3, 4, 4), dtype=np.float32), labels, (4, 4), num))
+        imgs, labels, _, _ = trim_labels_collate(batch)
+        self.assertEqual(tuple(imgs.shape), (2, 3, 4, 4))
+        self.assertEqual(tuple(labels.shape), (2, 3, 5))
+        self.assertEqual(labels.sum().item(), 20)
+
+
+class TestRectBatchSampler(unittest.TestCase):
+
+    def test_groups_by_aspect_ratio(self):
+        img_shapes = [(480, 640), (640, 480), (720, 1280), (500, 500)] * 3
+        batch_sampler = RectBatchSampler(
+            SequentialSampler(range(12)), 3, False, img_shapes=img_shapes, test_size=(640, 640)
+        )
+        batches = list(batch_sampler)
+        self.assertEqual(sorted(item[1] for b in batches for item in b), list(range(12)))
+        self.assertEqual(
+            [b[0][2] for b in batches], [(640, 480), (640, 640), (480, 640), (384, 640)]
+        )
+        for batch in batches:
+            self.assertEqual(len({img_shapes[item[1]] for item in batch}), 1)
+            self.assertFalse(batch[0][0])
+            # same letterbox ratio as the square test size, boxes map back the same way
+            height, width = img_shapes[batch[0][1]]
+            input_h, input_w = batch[0][2]
+            self.assertEqual(min(input_h / height, input_w / width), min(640 / height, 640 / width))
+
+
+if __name__ == "__main__":
+    unittest.main()
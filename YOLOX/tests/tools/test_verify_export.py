@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import torch
+
+from yolox.exp import get_exp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def import_tool():
+    spec = importlib.util.spec_from_file_location(
+        "verify_export", os.path.join(ROOT, "tools", "verify_export.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestVerifyExport(unittest.TestCase):
+
+    def test_exit_code_on_error(self):
+        # eg. no image to verify on, the check must fail instead of passing silently
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            ckpt_file = os.path.join(tmp_dir, "nano.pth")
+            torch.save({"model": get_exp(None, "yolox-nano").get_model().state_dict()}, ckpt_file)
+            image_dir = os.path.join(tmp_dir, "images")
+            os.makedirs(image_dir)
+            python_path = os.pathsep.join([ROOT, os.environ.get("PYTHONPATH", "")])
+            env = dict(os.environ, PYTHONPATH=python_path)
+            process = subprocess.run(
+                [
+                    sys.executable, os.path.join(ROOT, "tools", "verify_export.py"),
+                    "-n", "yolox-nano", "-c", ckpt_file, "--path", image_dir, "--tsize", "64",
+                ],
+                env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            )
+        self.assertNotEqual(process.returncode, 0)
+        self.assertIn(b"no image found", process.stdout)
+
+    def test_match_detections(self):
+        match_detections = import_tool().match_detections
+        # x1, y1, x2, y2, obj, cls conf, cls
+        ref = torch.tensor([[0, 0, 10, 10, 1, 1, 0], [20, 20, 30, 30, 1, 1, 1]])
+        self.assertEqual(match_detections(ref, ref, 0.9), (2, 2))
+        # a spurious detection matches no reference one
+        spurious = torch.cat([ref, torch.tensor([[50, 50, 60, 60, 1, 1, 0]])])
+        self.assertEqual(match_detections(ref, spurious, 0.9), (2, 2))
+        # nor does one of another class
+        self.assertEqual(match_detections(ref, ref[:, [0, 1, 2, 3, 4, 5, 5]], 0.9), (1, 1))
+        self.assertEqual(match_detections(ref, None, 0.9), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
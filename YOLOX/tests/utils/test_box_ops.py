@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import unittest
+
+import numpy as np
+
+import torch
+
+from yolox.utils import (
+    cxcywh_to_xyxy,
+    pairwise_iou,
+    scale_boxes,
+    xyxy_to_cxcywh,
+    xyxy_to_xywh
+)
+
+
+def random_boxes(rng, num_boxes):
+    xy = rng.uniform(0, 100, (num_boxes, 2))
+    wh = rng.uniform(1, 50, (num_boxes, 2))
+    return np.hstack([xy, xy + wh]).astype(np.float32)
+
+
+def reference_iou(a, b):
+    ious = np.zeros((len(a), len(b)))
+    for i, box_a in enumerate(a.tolist()):
+        for j, box_b in enumerate(b.tolist()):
+            w = max(0, min(box_a[2], box_b[2]) - max(box_a[0], box_b[0]))
+            h = max(0, min(box_a[3], box_b[3]) - max(box_a[1], box_b[1]))
+            area_a = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1])
+            area_b = (box_b[2] - box_b[0]) * (box_b[3] - box_b[1])
+            ious[i, j] = w * h / (area_a + area_b - w * h)
+    return ious
+
+
+class TestBoxOps(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.boxes_a = random_boxes(rng, 7)
+        self.boxes_b = random_boxes(rng, 11)
+
+    def test_conversions(self):
+        boxes = np.array([[10, 20, 30, 60, 7]], dtype=np.float32)
+        self.assertTrue(np.array_equal(xyxy_to_cxcywh(boxes), [[20, 40, 20, 40]]))
+        self.assertTrue(np.array_equal(xyxy_to_xywh(boxes), [[10, 20, 20, 40]]))
+        self.assertTrue(np.array_equal(cxcywh_to_xyxy(xyxy_to_cxcywh(boxes)), boxes[:, :4]))
+
+        for to_array in (np.array, torch.tensor):
+            for convert in (xyxy_to_cxcywh, cxcywh_to_xyxy, xyxy_to_xywh):
+                expected = convert(to_array(boxes))
+                # in place, the columns after the box are left untouched
+                inplace = to_array(boxes)
+                self.assertIs(convert(inplace, out=inplace), inplace)
+                self.assertTrue((inplace[:, :4] == expected).all())
+                self.assertEqual(float(inplace[0, 4]), 7)
+
+    def test_scale_boxes(self):
+        boxes = np.array([[10, 20, 30, 60, 1], [-5, 0, 5, 10, 2]], dtype=np.float32)
+        expected = [[23, 44, 63, 50], [0, 4, 13, 24]]
+        self.assertTrue(np.array_equal(scale_boxes(boxes, 2, (3, 4), (80, 50)), expected))
+        scaled = scale_boxes(torch.from_numpy(boxes), 2, (3, 4), (80, 50), out=boxes)
+        self.assertIs(scaled, boxes)
+        self.assertTrue(np.array_equal(boxes[:, :4], expected))
+
+    def test_pairwise_iou(self):
+        expected = reference_iou(self.boxes_a, self.boxes_b)
+        self.assertTrue(np.allclose(pairwise_iou(self.boxes_a, self.boxes_b), expected))
+
+        a, b = torch.from_numpy(self.boxes_a), torch.from_numpy(self.boxes_b)
+        ious = pairwise_iou(a, b)
+        self.assertTrue(np.allclose(ious.numpy(), expected, atol=1e-6))
+        self.assertTrue(torch.equal(pairwise_iou(a, b, chunk_size=3), ious))
+        out = torch.empty(7, 11)
+        self.assertIs(pairwise_iou(a, b, out=out), out)
+        self.assertTrue(torch.equal(out, ious))
+        cxcywh = pairwise_iou(xyxy_to_cxcywh(a), xyxy_to_cxcywh(b), fmt="cxcywh")
+        self.assertTrue(torch.allclose(cxcywh, ious, atol=1e-6))
+
+        with self.assertRaises(IndexError):
+            pairwise_iou(a[:, :3], b)
+        with self.assertRaises(ValueError):
+            pairwise_iou(a, b, mode="ciou")
+
+    def test_giou_diou(self):
+        a = np.array([[0, 0, 2, 2]], dtype=np.float32)
+        b = np.array([[0, 0, 2, 2], [1, 0, 3, 2], [4, 0, 6, 2]], dtype=np.float32)
+        self.assertTrue(np.allclose(pairwise_iou(a, b, mode="giou"), [[1, 1 / 3, -1 / 3]]))
+        # centers 1 and 4 apart, diagonals of the enclosing boxes sqrt(13) and sqrt(40)
+        self.assertTrue(np.allclose(pairwise_iou(a, b, mode="diou"), [[1, 1 / 3 - 1 / 13, -0.4]]))
+
+        ious = pairwise_iou(self.boxes_a, self.boxes_b)
+        for mode in ("giou", "diou"):
+            values = pairwise_iou(self.boxes_a, self.boxes_b, mode=mode, chunk_size=2)
+            self.assertTrue((values <= ious + 1e-6).all() and (values >= -1).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import importlib
+import os
+import subprocess
+import sys
+import unittest
+
+LAZY_PACKAGES = [
+    "yolox.core", "yolox.data", "yolox.data.datasets", "yolox.evaluators", "yolox.exp",
+    "yolox.models", "yolox.utils",
+]
+HEAVY_MODULES = [
+    "cv2", "mlflow", "onnxruntime", "psutil", "pycocotools", "tabulate", "thop", "torchvision",
+    "wandb",
+]
+
+
+class TestLazyImport(unittest.TestCase):
+
+    def test_exports(self):
+        for name in LAZY_PACKAGES:
+            package = importlib.import_module(name)
+            for attr in package.__all__:
+                self.assertTrue(hasattr(package, attr), "{}.{}".format(name, attr))
+                self.assertIn(attr, dir(package))
+            # a function named like its submodule
+            if name == "yolox.core":
+                self.assertTrue(callable(package.launch))
+            with self.assertRaises(AttributeError):
+                package.not_an_attribute
+
+    def test_exports_of_submodules(self):
+        # every public name of the utils submodules stays available from yolox.utils
+        utils = importlib.import_module("yolox.utils")
+        utils_dir = os.path.dirname(utils.__file__)
+        for file_name in sorted(os.listdir(utils_dir)):
+            if not file_name.endswith(".py") or file_name.startswith("_"):
+                continue
+            module = importlib.import_module("yolox.utils." + file_name[:-3])
+            for attr in getattr(module, "__all__", []):
+                self.assertIs(getattr(utils, attr), getattr(module, attr))
+
+    def test_no_heavy_imports(self):
+        # building a model must not import the dependencies of data loading, evaluation
+        # or visualization, run in a fresh interpreter so that other tests do not interfere
+        code = (
+            "import sys\n"
+            "from yolox.exp import get_exp\n"
+            "get_exp(None, 'yolox-nano').get_model()\n"
+            "from yolox.models import yolox_tiny\n"
+            "print(' '.join(m for m in {!r} if m in sys.modules))\n"
+        ).format(HEAVY_MODULES)
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([root, os.environ.get("PYTHONPATH", "")]))
+        output = subprocess.run(
+            [sys.executable, "-c", code], env=env, check=True, stdout=subprocess.PIPE,
+        ).stdout.decode().strip()
+        self.assertEqual(output, "")
+
+
+if __name__ == "__main__":
+    unittest.main()
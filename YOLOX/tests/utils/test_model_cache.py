@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import torch
+
+import yolox
+from yolox.exp import get_exp
+from yolox.utils import load_cached_model, model_cache_key
+
+
+class TestModelCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        self.ckpt_file = os.path.join(self.tmp_dir.name, "ckpt.pth")
+        torch.manual_seed(0)
+        torch.save({"model": self.get_exp().get_model().state_dict()}, self.ckpt_file)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_exp(self):
+        exp = get_exp(exp_name="yolox-nano")
+        exp.test_size = (96, 128)
+        return exp
+
+    def test_cached_model(self):
+        model, cached = load_cached_model(self.get_exp(), self.ckpt_file, cache_dir=self.cache_dir)
+        self.assertFalse(cached)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        cached_model, cached = load_cached_model(
+            self.get_exp(), self.ckpt_file, cache_dir=self.cache_dir
+        )
+        self.assertTrue(cached)
+
+        eager = self.get_exp().get_model().eval()
+        eager.load_state_dict(torch.load(self.ckpt_file)["model"])
+        x = torch.rand(2, 3, 96, 128) * 255
+        with torch.no_grad():
+            self.assertTrue(torch.allclose(cached_model(x), eager(x), atol=1e-3))
+
+    def test_key(self):
+        exp = self.get_exp()
+        key = model_cache_key(exp, self.ckpt_file)
+        exp.test_conf = 0.5
+        self.assertEqual(model_cache_key(exp, self.ckpt_file), key)
+        exp.test_size = (128, 128)
+        self.assertNotEqual(model_cache_key(exp, self.ckpt_file), key)
+        self.assertNotEqual(model_cache_key(self.get_exp(), self.ckpt_file, fuse=False), key)
+
+        with mock.patch.object(yolox, "__version__", "0.0.0"):
+            self.assertNotEqual(model_cache_key(self.get_exp(), self.ckpt_file), key)
+        with mock.patch("yolox.utils.model_cache._code_digest", return_value="edited"):
+            self.assertNotEqual(model_cache_key(self.get_exp(), self.ckpt_file), key)
+
+        torch.save({"model": {}}, self.ckpt_file)
+        self.assertNotEqual(model_cache_key(self.get_exp(), self.ckpt_file), key)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import os
+import tempfile
+import unittest
+
+from torch import nn
+
+from yolox.exp import get_exp
+from yolox.utils import profile_model
+
+
+class TestModelProfiler(unittest.TestCase):
+
+    def test_conv_flops(self):
+        model = nn.Sequential(nn.Conv2d(3, 8, 3, padding=1), nn.Conv2d(8, 8, 3, groups=8))
+        profile = profile_model(model, (32, 16), batch_sizes=(2,), iters=1, cache_dir=None)
+        total = profile["batches"]["2"][""]
+        self.assertEqual(total["flops"], 2 * 2 * (8 * 32 * 16 * 27 + 8 * 30 * 14 * 9))
+        self.assertEqual(total["activations"], 2 * 4 * (8 * 32 * 16 + 8 * 30 * 14))
+        self.assertEqual(profile["params"][""], 8 * 27 + 8 + 8 * 9 + 8)
+
+    def test_modules_and_cache(self):
+        model = get_exp(exp_name="yolox-nano").get_model()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            profile = profile_model(model, (128, 96), iters=1, cache_dir=cache_dir)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            self.assertTrue(model.training)
+
+            stats = profile["batches"]["1"]
+            self.assertEqual(
+                stats["backbone"]["flops"] + stats["head"]["flops"], stats[""]["flops"]
+            )
+            self.assertIn("backbone.backbone.dark3", stats)
+            self.assertIn("head.stems.2", stats)
+            self.assertNotIn("head.iou_loss", stats)
+            self.assertGreater(stats[""]["time"], 0)
+
+            # profiled leaf modules count their own output
+            conv = model.head.cls_preds[0]
+            output_size = conv.out_channels * (128 // 8) * (96 // 8)
+            self.assertEqual(stats["head.cls_preds.0"]["flops"], 2 * output_size * conv.in_channels)
+            self.assertEqual(stats["head.cls_preds.0"]["activations"], 4 * output_size)
+
+            self.assertEqual(profile_model(model, (128, 96), iters=1, cache_dir=cache_dir), profile)
+            profile_model(model, (128, 128), iters=1, cache_dir=cache_dir)
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
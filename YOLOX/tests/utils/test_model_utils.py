@@ -7,7 +7,7 @@ import unittest
 import torch
 from torch import nn
 
-from yolox.utils import adjust_status, freeze_module
+from yolox.utils import adjust_status, freeze_module, fuse_model
 from yolox.exp import get_exp
 
 
@@ -102,6 +102,24 @@ class TestModelUtils(unittest.TestCase):
         for p in self.model.head.parameters():
             self.assertTrue(p.requires_grad)
 
+    def test_fuse_model(self):
+        self.model.eval()
+        for module in self.model.modules():
+            if isinstance(module, nn.BatchNorm2d):
+                module.running_mean.uniform_(-0.1, 0.1)
+                module.running_var.uniform_(0.5, 1.5)
+        data = torch.rand(2, 3, 128, 160) * 255
+        with torch.no_grad():
+            outputs = self.model(data)
+            fused_model = fuse_model(self.model)
+            fused_outputs = fused_model(data)
+
+        self.assertFalse(any(isinstance(m, nn.BatchNorm2d) for m in fused_model.modules()))
+        self.assertEqual(len(fused_model.head.reg_obj_preds), 3)
+        self.assertFalse(hasattr(fused_model.head, "obj_preds"))
+        self.assertEqual(fused_model.backbone.backbone.stem.conv.conv.kernel_size, (6, 6))
+        self.assertTrue(torch.allclose(outputs, fused_outputs, rtol=1e-4, atol=1e-2))
+
 
 if __name__ == "__main__":
     unittest.main()
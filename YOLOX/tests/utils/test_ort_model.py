@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import os
+import tempfile
+import unittest
+
+import torch
+from torch import nn
+
+from yolox.utils import ORTModel
+
+
+class TestORTModel(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.onnx_file = os.path.join(self.tmp_dir.name, "model.onnx")
+        self.optimized_file = os.path.join(self.tmp_dir.name, "model.ort.onnx")
+        self.x = torch.rand(1, 3, 8, 8)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def export(self, scale):
+        model = nn.Conv2d(3, 4, 1, bias=False)
+        nn.init.constant_(model.weight, scale)
+        torch.onnx.export(model, self.x, self.onnx_file, dynamo=False)
+        return model(self.x).detach()
+
+    def test_optimized_file(self):
+        expected = self.export(1.0)
+        ort_model = ORTModel(self.onnx_file, optimized_file=self.optimized_file)
+        self.assertTrue(torch.allclose(ort_model(self.x), expected, atol=1e-5))
+        self.assertTrue(os.path.exists(self.optimized_file))
+        self.assertTrue(os.path.exists(self.optimized_file + ".json"))
+
+        ort_model = ORTModel(self.onnx_file, optimized_file=self.optimized_file)
+        self.assertTrue(torch.allclose(ort_model(self.x), expected, atol=1e-5))
+
+        # a new export of the source model replaces the cached graph
+        expected = self.export(2.0)
+        ort_model = ORTModel(self.onnx_file, optimized_file=self.optimized_file)
+        self.assertTrue(torch.allclose(ort_model(self.x), expected, atol=1e-5))
+
+
+if __name__ == "__main__":
+    unittest.main()
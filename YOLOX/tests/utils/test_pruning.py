@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import copy
+import unittest
+
+import torch
+from torch import nn
+
+from yolox.exp import get_exp
+from yolox.utils import (
+    apply_pruned_channels,
+    bn_gamma_importance,
+    bn_taylor_importance,
+    get_pruned_channels,
+    keep_bn_stats,
+    prune_channels
+)
+
+
+class TestPruning(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.data = torch.rand(1, 3, 128, 128) * 255
+
+    def get_model(self, name):
+        model = get_exp(exp_name=name).get_model().eval()
+        for module in model.modules():
+            if isinstance(module, nn.BatchNorm2d):
+                module.weight.data.uniform_(0, 1)
+                module.running_mean.uniform_(-0.1, 0.1)
+                module.running_var.uniform_(0.5, 1.5)
+        return model
+
+    def test_prune_nothing(self):
+        model = self.get_model("yolox-s")
+        pruned = prune_channels(copy.deepcopy(model), bn_gamma_importance(model), 0, divisor=1)
+        self.assertEqual(get_pruned_channels(pruned, model), {})
+        with torch.no_grad():
+            self.assertTrue(torch.allclose(model(self.data), pruned(self.data)))
+
+    def test_prune_and_rebuild(self):
+        for name in ("yolox-nano", "yolox-s"):
+            model = self.get_model(name)
+            origin = copy.deepcopy(model)
+            pruned = prune_channels(model, bn_gamma_importance(model), 0.5)
+            channels = get_pruned_channels(pruned, origin)
+            self.assertGreater(len(channels), 0)
+            self.assertLess(
+                sum(p.numel() for p in pruned.parameters()),
+                0.7 * sum(p.numel() for p in origin.parameters()),
+            )
+
+            rebuilt = apply_pruned_channels(get_exp(exp_name=name).get_model(), channels)
+            rebuilt.load_state_dict(pruned.state_dict())
+            rebuilt.eval()
+            with torch.no_grad():
+                outputs = pruned(self.data)
+                self.assertEqual(outputs.shape, origin(self.data).shape)
+                self.assertTrue(torch.equal(outputs, rebuilt(self.data)))
+
+    def test_taylor_keeps_bn_stats(self):
+        model = self.get_model("yolox-nano")
+        stats = {k: v.clone() for k, v in model.state_dict().items() if "running" in k}
+        targets = torch.tensor([[[0, 64, 64, 32, 32]]], dtype=torch.float32)
+        with keep_bn_stats(model.train()):
+            model(self.data, targets)["total_loss"].backward()
+        importance = bn_taylor_importance(model)
+        self.assertGreater(len(importance), 0)
+        for key, value in model.state_dict().items():
+            if key in stats:
+                self.assertTrue(torch.equal(value, stats[key]), key)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import unittest
+
+import torch
+
+from yolox.utils import roi_input_size, roi_region
+
+
+class TestRoi(unittest.TestCase):
+
+    def test_roi_region(self):
+        boxes = torch.tensor([[100.0, 100, 200, 150], [150, 120, 300, 200]])
+        self.assertEqual(roi_region(boxes, (720, 1280), 0.5), (0, 50, 400, 250))
+        self.assertEqual(roi_region(boxes, (180, 350), 0.5), (0, 50, 350, 180))
+        degenerate = torch.tensor([[10.0, 10, 10, 10]])
+        self.assertEqual(roi_region(degenerate, (20, 20), 0), (10, 10, 11, 11))
+
+    def test_roi_input_size(self):
+        # the 1280x720 frame is letterboxed with a ratio of 0.5
+        self.assertEqual(roi_input_size((200, 400), (720, 1280), (640, 640)), (128, 224))
+        self.assertEqual(roi_input_size((720, 1280), (720, 1280), (640, 640)), (384, 640))
+        self.assertEqual(roi_input_size((10, 10), (720, 1280), (640, 640)), (32, 32))
+
+
+if __name__ == "__main__":
+    unittest.main()
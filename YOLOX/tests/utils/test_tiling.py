@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import unittest
+
+import numpy as np
+
+import torch
+
+from yolox.utils import merge_tiles, tile_image, tile_offsets, weighted_box_fusion
+
+
+class TestTiling(unittest.TestCase):
+
+    def setUp(self):
+        self.img = np.random.RandomState(0).randint(0, 255, (700, 1000, 3), dtype=np.uint8)
+        self.tile_size = (320, 320)
+
+    def test_tile_offsets(self):
+        self.assertEqual(tile_offsets(200, 320, 0.2), [0])
+        offsets = tile_offsets(1000, 320, 0.2)
+        self.assertEqual(offsets[0], 0)
+        self.assertEqual(offsets[-1], 1000 - 320)
+        self.assertTrue(all(320 - (b - a) >= 0.2 * 320 for a, b in zip(offsets, offsets[1:])))
+
+    def test_tile_image(self):
+        tiles, tile_info = tile_image(self.img, self.tile_size, 0.2, full_image=True)
+        self.assertEqual(tiles.shape, (3 * 4 + 1, 3, 320, 320))
+        for tile, (x0, y0, ratio) in zip(tiles[:-1], tile_info[:-1]):
+            self.assertEqual(ratio, 1)
+            crop = self.img[int(y0):int(y0) + 320, int(x0):int(x0) + 320]
+            self.assertTrue(np.array_equal(tile, crop.transpose(2, 0, 1)))
+        self.assertAlmostEqual(tile_info[-1, 2], 320 / 1000)
+
+    def test_merge_tiles(self):
+        _, tile_info = tile_image(self.img, self.tile_size, 0.2)
+        # an object at (470, 230, 530, 290) of the image, in the overlap of four tiles
+        box = torch.tensor([500.0, 260.0, 60.0, 60.0])
+        outputs = torch.zeros(len(tile_info), 10, 5 + 2)
+        num_seen = 0
+        for i, (x0, y0, _) in enumerate(tile_info):
+            if x0 <= 470 and 530 <= x0 + 320 and y0 <= 230 and 290 <= y0 + 320:
+                outputs[i, 3, :4] = box - torch.tensor([x0, y0, 0, 0])
+                outputs[i, 3, 4:] = torch.tensor([0.9, 0.1, 0.8 - 0.1 * num_seen])
+                num_seen += 1
+        self.assertGreater(num_seen, 1)
+
+        for merge in ("nms", "wbf"):
+            dets = merge_tiles(outputs, tile_info, 2, 0.3, 0.45, merge=merge)
+            self.assertEqual(len(dets), 1)
+            self.assertTrue(torch.allclose(dets[0, :4], torch.tensor([470.0, 230, 530, 290])))
+            self.assertAlmostEqual(dets[0, 5].item(), 0.8, places=5)
+
+    def test_weighted_box_fusion(self):
+        dets = torch.tensor([
+            [0.0, 0, 10, 10, 1.0, 0.75, 0],
+            [2.0, 0, 12, 10, 1.0, 0.25, 0],
+            [2.0, 0, 12, 10, 1.0, 0.50, 1],
+            [50.0, 50, 60, 60, 1.0, 0.50, 0],
+        ])
+        fused = weighted_box_fusion(dets, 0.5)
+        self.assertEqual(len(fused), 3)
+        self.assertTrue(torch.allclose(fused[0], torch.tensor([0.5, 0, 10.5, 10, 1.0, 0.75, 0])))
+        self.assertEqual(len(weighted_box_fusion(dets, 0.5, class_agnostic=True)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
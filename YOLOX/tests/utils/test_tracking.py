@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import unittest
+
+import numpy as np
+
+from yolox.utils import BoxTracker, DetectionScheduler
+
+
+def detection(x, y, score=0.9, cls=0):
+    return [x, y, x + 50, y + 50, 1.0, score, cls]
+
+
+class TestTracking(unittest.TestCase):
+
+    def test_tracks_keep_ids_and_propagate(self):
+        tracker = BoxTracker()
+        for t in range(10):
+            tracker.predict()
+            tracks = tracker.update(np.array([detection(10 * t, 0), detection(300, 300, cls=1)]))
+        self.assertEqual(tracks[:, 6].tolist(), [1, 2])
+
+        # between detections, the moving box keeps its velocity
+        for t in range(10, 13):
+            tracks = tracker.predict()
+        self.assertLess(abs(tracks[0, 0] - 120), 5)
+        self.assertLess(tracks[0, 4], 0.9)
+        self.assertAlmostEqual(tracks[1, 0], 300, places=3)
+
+    def test_tracks_matched_by_class_and_removed(self):
+        tracker = BoxTracker(max_misses=1)
+        tracker.update(np.array([detection(0, 0)]))
+        tracker.predict()
+        tracks = tracker.update(np.array([detection(0, 0, cls=1)]))
+        self.assertEqual(tracks[:, 6].tolist(), [1, 2])
+        tracker.predict()
+        tracks = tracker.update(None)
+        self.assertEqual(tracks[:, 6].tolist(), [2])
+        np.testing.assert_allclose(tracker.class_scores(2), [0, 0.9 * 0.95])
+
+    def test_stable_score(self):
+        tracker = BoxTracker(score_momentum=0.5)
+        tracker.update(np.array([detection(0, 0, score=0.8)]))
+        tracker.predict()
+        tracks = tracker.update(np.array([detection(0, 0, score=0.4)]))
+        self.assertAlmostEqual(tracks[0, 4], 0.6)
+
+    def test_scheduler(self):
+        tracker = BoxTracker(score_decay=0.9)
+        scheduler = DetectionScheduler(interval=3, motion_thre=0.1, track_conf=0.5)
+        frame = np.zeros((64, 64, 3), dtype=np.uint8)
+        decisions = [scheduler.need_detection(frame, tracker) for _ in range(7)]
+        self.assertEqual(decisions, [True, False, False, True, False, False, True])
+        self.assertTrue(scheduler.need_detection(frame + 128, tracker))
+
+        # a track above track_conf is confirmed once its decayed confidence falls below
+        tracker.update(np.array([detection(0, 0, score=0.54)]))
+        self.assertFalse(scheduler.need_detection(frame + 128, tracker))
+        tracker.predict()
+        self.assertTrue(scheduler.need_detection(frame + 128, tracker))
+        self.assertEqual(scheduler.num_detections, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
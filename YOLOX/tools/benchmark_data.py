@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import argparse
+import time
+from loguru import logger
+import psutil
+
+import cv2
+import numpy as np
+
+import torch
+
+from yolox.data.data_augment import (
+    TrainTransform,
+    ValTransform,
+    augment_hsv,
+    preproc,
+    preproc_batch
+)
+
+
+def make_parser():
+    parser = argparse.ArgumentParser("YOLOX data pipeline benchmark")
+    parser.add_argument(
+        "bench", default="preproc", help="benchmark to run, eg. preproc, hsv, transform, loader"
+    )
+    parser.add_argument("--tsize", default=640, type=int, help="letterbox size")
+    parser.add_argument("-b", "--batch-size", type=int, default=16, help="batch size")
+    parser.add_argument("--iters", type=int, default=20, help="timed iterations")
+    parser.add_argument(
+        "--img-shapes",
+        default="480x640,720x1280,1080x1920",
+        type=str,
+        help="comma separated HxW shapes of the random source images",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random images")
+    parser.add_argument("--num-workers", type=int, default=4, help="dataloader workers")
+    return parser
+
+
+def random_images(args):
+    rng = np.random.default_rng(args.seed)
+    shapes = [tuple(int(v) for v in s.split("x")) for s in args.img_shapes.split(",")]
+    return [
+        rng.integers(0, 256, (*shapes[i % len(shapes)], 3), dtype=np.uint8)
+        for i in range(args.batch_size)
+    ]
+
+
+def timeit(func, iters):
+    func()  # warmup
+    start = time.perf_counter()
+    for _ in range(iters):
+        func()
+    return (time.perf_counter() - start) / iters
+
+
+def bench_preproc(args):
+    imgs = random_images(args)
+    input_size = (args.tsize, args.tsize)
+    num_imgs = len(imgs)
+
+    def per_image():
+        np.stack([preproc(img, input_size)[0] for img in imgs])
+
+    buffers = {}
+
+    def batched(dtype):
+        def run():
+            buffers[dtype], _ = preproc_batch(imgs, input_size, buffers.get(dtype), dtype=dtype)
+        return run
+
+    results = [
+        ("preproc + np.stack", timeit(per_image, args.iters)),
+        ("preproc_batch float32", timeit(batched(np.float32), args.iters)),
+        ("preproc_batch uint8", timeit(batched(np.uint8), args.iters)),
+    ]
+    for name, cost in results:
+        logger.info("{:<24}: {:.3f} ms/img".format(name, 1000 * cost / num_imgs))
+
+
+def augment_hsv_int16(img, rng, hgain=5, sgain=30, vgain=30):
+    """
+    Previous `augment_hsv`, shifting an int16 copy of the whole hsv image. Also the reference
+    of the tests of `augment_hsv`, returns whether any channel is shifted.
+    """
+    hsv_augs = rng.uniform(-1, 1, 3) * [hgain, sgain, vgain]
+    hsv_augs *= rng.integers(0, 2, 3)
+    hsv_augs = hsv_augs.astype(np.int16)
+    img_hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV).astype(np.int16)
+
+    img_hsv[..., 0] = (img_hsv[..., 0] + hsv_augs[0]) % 180
+    img_hsv[..., 1] = np.clip(img_hsv[..., 1] + hsv_augs[1], 0, 255)
+    img_hsv[..., 2] = np.clip(img_hsv[..., 2] + hsv_augs[2], 0, 255)
+
+    cv2.cvtColor(img_hsv.astype(img.dtype), cv2.COLOR_HSV2BGR, dst=img)
+    return hsv_augs.any()
+
+
+def bench_hsv(args):
+    # the augmented image sizes of training, mosaics are twice the input size
+    imgs = [
+        np.random.default_rng(args.seed).integers(0, 256, (size, size, 3), dtype=np.uint8)
+        for size in (args.tsize, 2 * args.tsize)
+    ]
+    for img in imgs:
+        for name, func in [("int16", augment_hsv_int16), ("lut", augment_hsv)]:
+            rng = np.random.default_rng(args.seed)
+            work = img.copy()
+            cost = timeit(lambda: func(work, rng=rng), args.iters * args.batch_size)
+            logger.info("augment_hsv {:<5} {}x{}: {:.3f} ms/img, {:.0f} img/s".format(
+                name, img.shape[0], img.shape[1], 1000 * cost, 1 / cost
+            ))
+
+
+def bench_transform(args):
+    # TrainTransform of the samples without mosaic, with and without the flip
+    imgs = random_images(args)
+    targets = np.array([[10, 10, 200, 150, 0], [120, 80, 400, 300, 1]], dtype=np.float32)
+    input_size = (args.tsize, args.tsize)
+    for flip_prob in (0.0, 1.0):
+        transform = TrainTransform(max_labels=120, flip_prob=flip_prob, hsv_prob=0.0)
+
+        def run():
+            for img in imgs:
+                transform(img, targets, input_size)
+
+        cost = timeit(run, args.iters) / len(imgs)
+        logger.info("TrainTransform flip_prob={}: {:.3f} ms/img".format(flip_prob, 1000 * cost))
+
+
+class RandomImageDataset(torch.utils.data.Dataset):
+    def __init__(self, imgs, input_size, dtype):
+        self.imgs = imgs
+        self.input_size = input_size
+        self.preproc = ValTransform(dtype=dtype)
+
+    def __len__(self):
+        return len(self.imgs) * 8
+
+    def __getitem__(self, index):
+        img, target = self.preproc(self.imgs[index % len(self.imgs)], None, self.input_size)
+        return img, target
+
+
+def workers_rss(process):
+    return sum(child.memory_info().rss for child in process.children(recursive=True))
+
+
+def bench_loader(args):
+    imgs = random_images(args)
+    input_size = (args.tsize, args.tsize)
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    process = psutil.Process()
+    mb = 1 << 20
+
+    for dtype in ("float32", "uint8"):
+        loader = torch.utils.data.DataLoader(
+            RandomImageDataset(imgs, input_size, dtype),
+            batch_size=args.batch_size,
+            num_workers=args.num_workers,
+            pin_memory=device == "cuda",
+        )
+        peak_rss, batch_bytes = 0, 0
+        start = time.perf_counter()
+        for inps, _ in loader:
+            batch_bytes = inps.numel() * inps.element_size()
+            inps = inps.to(device, non_blocking=True).float()
+            peak_rss = max(peak_rss, workers_rss(process))
+        cost = (time.perf_counter() - start) / len(loader.dataset)
+        logger.info(
+            "{:<8}: {:.1f} MB/batch, {:.3f} ms/img, workers peak rss {:.0f} MB".format(
+                dtype, batch_bytes / mb, 1000 * cost, peak_rss / mb
+            )
+        )
+
+
+def main():
+    args = make_parser().parse_args()
+    cv2.setNumThreads(0)
+    logger.info("args: {}".format(args))
+    if args.bench == "preproc":
+        bench_preproc(args)
+    elif args.bench == "hsv":
+        bench_hsv(args)
+    elif args.bench == "transform":
+        bench_transform(args)
+    elif args.bench == "loader":
+        bench_loader(args)
+    else:
+        raise ValueError("Unknown benchmark: {}".format(args.bench))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from loguru import logger
+
+
+def make_parser():
+    parser = argparse.ArgumentParser("YOLOX import time benchmark")
+    parser.add_argument(
+        "--statements",
+        default=[
+            "import torch",
+            "from yolox.exp import get_exp; get_exp(None, 'yolox-s').get_model()",
+            "from yolox.utils import postprocess, vis",
+            "from yolox.data import COCODataset, TrainTransform",
+            "from yolox.evaluators import COCOEvaluator",
+            "from yolox.core import Trainer",
+        ],
+        nargs="+",
+        help="statements to time, each in a fresh interpreter",
+    )
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to show")
+    return parser
+
+
+def import_times(statement):
+    """
+    Run `statement` in a fresh interpreter.
+
+    Returns:
+        float: wall time in seconds, interpreter startup included.
+        dict: cumulative import time in seconds of each module imported.
+    """
+    path = os.pathsep.join([os.getcwd(), os.environ.get("PYTHONPATH", "")])
+    start = time.perf_counter()
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        env=dict(os.environ, PYTHONPATH=path), check=True, stderr=subprocess.PIPE,
+    ).stderr.decode()
+    wall_time = time.perf_counter() - start
+    times = {}
+    for line in stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| *(\S+)", line)
+        if match:
+            times[match.group(2)] = int(match.group(1)) / 1e6
+    return wall_time, times
+
+
+@logger.catch
+def main(args):
+    for statement in args.statements:
+        wall_time, times = import_times(statement)
+        # only the top level imports, their submodules are included in their times
+        top = sorted(
+            ((t, name) for name, t in times.items() if "." not in name), reverse=True
+        )[:args.top]
+        logger.info(
+            "{}: {:.2f}s, {} modules imported\n{}".format(
+                statement, wall_time, len(times),
+                "\n".join("    {:6.3f}s {}".format(t, name) for t, name in top),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(make_parser().parse_args())
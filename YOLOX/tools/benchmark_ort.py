@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import argparse
+import time
+from loguru import logger
+
+import numpy as np
+
+import torch
+
+from yolox.utils import ORTModel
+
+
+def make_parser():
+    parser = argparse.ArgumentParser("YOLOX onnxruntime latency benchmark")
+    parser.add_argument("-m", "--model", required=True, type=str, help="onnx model")
+    parser.add_argument("--tsize", default=640, type=int, help="input size")
+    parser.add_argument("-b", "--batch-size", type=int, default=1, help="batch size")
+    parser.add_argument(
+        "--threads", default="1,2,4,8", type=str, help="comma separated intra op threads to sweep"
+    )
+    parser.add_argument(
+        "--inter-threads", default=0, type=int, help="inter op threads of parallel mode"
+    )
+    parser.add_argument(
+        "--opt-level",
+        default="all",
+        choices=["disable", "basic", "extended", "all"],
+        help="graph optimization level",
+    )
+    parser.add_argument("--parallel", action="store_true", help="parallel execution mode")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed iterations")
+    parser.add_argument("--iters", type=int, default=100, help="timed iterations")
+    return parser
+
+
+def percentiles(func, warmup, iters):
+    for _ in range(warmup):
+        func()
+    latency = []
+    for _ in range(iters):
+        start = time.perf_counter()
+        func()
+        latency.append(1000 * (time.perf_counter() - start))
+    return np.percentile(latency, [50, 90, 99])
+
+
+def main():
+    args = make_parser().parse_args()
+    logger.info("args: {}".format(args))
+    x = torch.rand(args.batch_size, 3, args.tsize, args.tsize) * 255
+
+    for threads in [int(t) for t in args.threads.split(",")]:
+        model = ORTModel(
+            args.model,
+            providers=["CPUExecutionProvider"],
+            opt_level=args.opt_level,
+            intra_op_threads=threads,
+            inter_op_threads=args.inter_threads,
+            parallel=args.parallel,
+        )
+        inputs = {model.input_name: x.numpy()}
+
+        def session_run():
+            model.session.run(None, inputs)
+
+        def io_binding():
+            model(x)
+
+        for name, func in (("session.run", session_run), ("io binding", io_binding)):
+            p50, p90, p99 = percentiles(func, args.warmup, args.iters)
+            logger.info(
+                "threads {:>2}, {:<12}: p50 {:.2f} ms, p90 {:.2f} ms, p99 {:.2f} ms".format(
+                    threads, name, p50, p90, p99
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import argparse
+import time
+from loguru import logger
+
+import numpy as np
+
+import torch
+
+from yolox.exp import get_exp
+from yolox.utils import fuse_model, merge_tiles, tile_image
+
+
+def make_parser():
+    parser = argparse.ArgumentParser("YOLOX tiled inference benchmark")
+    parser.add_argument("-n", "--name", type=str, default=None, help="model name")
+    parser.add_argument(
+        "-f",
+        "--exp_file",
+        default=None,
+        type=str,
+        help="experiment description file",
+    )
+    parser.add_argument("-c", "--ckpt", default=None, type=str, help="ckpt, random if not set")
+    parser.add_argument("--tsize", default=None, type=int, help="tile size")
+    parser.add_argument(
+        "--sizes",
+        default="640,1280,1920,2560,3840",
+        type=str,
+        help="comma separated widths of the 4:3 images to tile",
+    )
+    parser.add_argument("--overlap", default=0.2, type=float, help="overlap of the tiles")
+    parser.add_argument("--merge", default="nms", choices=["nms", "wbf"], help="tile merge")
+    parser.add_argument(
+        "--device", default="cpu", type=str, help="device to run on, eg. cpu or cuda"
+    )
+    parser.add_argument("--fp16", action="store_true", help="run the fp16 model")
+    parser.add_argument("--iters", type=int, default=3, help="timed iterations")
+    parser.add_argument(
+        "opts",
+        help="Modify config options using the command-line",
+        default=None,
+        nargs=argparse.REMAINDER,
+    )
+    return parser
+
+
+def timeit(func, device, iters):
+    func()
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+    start = time.perf_counter()
+    for _ in range(iters):
+        func()
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+    return (time.perf_counter() - start) / iters
+
+
+@logger.catch
+def main():
+    args = make_parser().parse_args()
+    logger.info("args: {}".format(args))
+    exp = get_exp(args.exp_file, args.name)
+    exp.merge(args.opts)
+    if args.tsize is not None:
+        exp.test_size = (args.tsize, args.tsize)
+
+    model = exp.get_model()
+    if args.ckpt is not None:
+        ckpt = torch.load(args.ckpt, map_location="cpu")
+        model.load_state_dict(ckpt.get("model", ckpt))
+    model = fuse_model(model.eval()).to(args.device)
+    dtype = torch.float16 if args.fp16 else torch.float32
+    model = model.to(dtype)
+    device = torch.device(args.device)
+    torch.set_grad_enabled(False)
+
+    for width in [int(s) for s in args.sizes.split(",")]:
+        img = np.random.randint(0, 255, (width * 3 // 4, width, 3), dtype=np.uint8)
+        tiles, tile_info = tile_image(img, exp.test_size, args.overlap)
+        tiles = torch.from_numpy(tiles).to(device, dtype)
+
+        def batched():
+            outputs = model(tiles)
+            merge_tiles(
+                outputs, tile_info, exp.num_classes, exp.test_conf, exp.nmsthre, args.merge
+            )
+
+        def looped():
+            outputs = torch.cat([model(tile[None]) for tile in tiles])
+            merge_tiles(
+                outputs, tile_info, exp.num_classes, exp.test_conf, exp.nmsthre, args.merge
+            )
+
+        batched_time = timeit(batched, device, args.iters)
+        looped_time = timeit(looped, device, args.iters)
+        logger.info(
+            "{}x{}: {:>3} tiles, batched {:.1f} ms ({:.1f} tiles/s), "
+            "looped {:.1f} ms ({:.1f} tiles/s), speedup {:.2f}x".format(
+                width, img.shape[0], len(tiles),
+                1000 * batched_time, len(tiles) / batched_time,
+                1000 * looped_time, len(tiles) / looped_time,
+                looped_time / batched_time,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -11,10 +11,23 @@ import cv2
 
 import torch
 
-from yolox.data.data_augment import ValTransform
+from yolox.data.data_augment import ValTransform, preproc_batch, rect_input_size
 from yolox.data.datasets import COCO_CLASSES
 from yolox.exp import get_exp
-from yolox.utils import fuse_model, get_model_info, postprocess, vis
+from yolox.utils import (
+    BoxTracker,
+    DetectionScheduler,
+    fuse_model,
+    get_model_info,
+    get_ort_model,
+    load_cached_model,
+    merge_tiles,
+    postprocess,
+    roi_input_size,
+    roi_region,
+    tile_image,
+    vis
+)
 
 IMAGE_EXT = [".jpg", ".jpeg", ".webp", ".bmp", ".png"]
 
@@ -83,6 +96,96 @@ def make_parser():
         action="store_true",
         help="Using TensorRT model for testing.",
     )
+    parser.add_argument(
+        "--onnx", default=None, type=str, help="run this onnx model with onnxruntime"
+    )
+    parser.add_argument(
+        "--decode_in_inference",
+        action="store_true",
+        help="the onnx model was exported with decode_in_inference",
+    )
+    parser.add_argument(
+        "--ort-opt-level",
+        default="all",
+        choices=["disable", "basic", "extended", "all"],
+        help="onnxruntime graph optimization level",
+    )
+    parser.add_argument("--ort-threads", default=0, type=int, help="onnxruntime intra op threads")
+    parser.add_argument(
+        "--ort-inter-threads", default=0, type=int, help="onnxruntime inter op threads"
+    )
+    parser.add_argument(
+        "--ort-parallel", action="store_true", help="onnxruntime parallel execution mode"
+    )
+    parser.add_argument(
+        "--ort-cache", default=None, type=str, help="file caching the optimized onnx graph"
+    )
+    parser.add_argument(
+        "--model-cache",
+        action="store_true",
+        help="load the fused and traced model from the cache, building it on first use",
+    )
+    parser.add_argument(
+        "--rect",
+        action="store_true",
+        help="letterbox to the smallest multiple of 32 rectangle instead of the square tsize",
+    )
+    parser.add_argument(
+        "--tile",
+        action="store_true",
+        help="detect on overlapping tiles of the test size, for high resolution images",
+    )
+    parser.add_argument(
+        "--tile-overlap", default=0.2, type=float, help="min overlap of neighbouring tiles"
+    )
+    parser.add_argument(
+        "--tile-merge",
+        default="nms",
+        choices=["nms", "wbf"],
+        help="merge detections across tiles with nms or weighted box fusion",
+    )
+    parser.add_argument(
+        "--tile-full",
+        action="store_true",
+        help="also detect on the whole image resized to the test size",
+    )
+    parser.add_argument(
+        "--track",
+        action="store_true",
+        help="video/webcam: run the detector on some frames only and track boxes in between",
+    )
+    parser.add_argument(
+        "--detect-interval", default=5, type=int, help="max frames between two detections"
+    )
+    parser.add_argument(
+        "--motion-thre",
+        default=0.05,
+        type=float,
+        help="detect when the frame moved more than this since the last detection",
+    )
+    parser.add_argument(
+        "--track-conf",
+        default=0.3,
+        type=float,
+        help="detect when the confidence of a track drops below this",
+    )
+    parser.add_argument(
+        "--roi",
+        action="store_true",
+        help="video/webcam: detect on a crop around the previous detections, at a smaller size",
+    )
+    parser.add_argument(
+        "--roi-margin",
+        default=0.5,
+        type=float,
+        help="the crop is the union of the previous detections grown by this on each side",
+    )
+    parser.add_argument(
+        "--roi-interval",
+        default=30,
+        type=int,
+        help="max frames between two detections on the full frame, for new objects",
+    )
     return parser
 
 
@@ -108,6 +211,18 @@ class Predictor(object):
         device="cpu",
         fp16=False,
         legacy=False,
+        rect=False,
+        tile=False,
+        tile_overlap=0.2,
+        tile_merge="nms",
+        tile_full=False,
+        track=False,
+        detect_interval=5,
+        motion_thre=0.05,
+        track_conf=0.3,
+        roi=False,
+        roi_margin=0.5,
+        roi_interval=30,
     ):
         self.model = model
         self.cls_names = cls_names
@@ -118,7 +233,25 @@ class Predictor(object):
         self.test_size = exp.test_size
         self.device = device
         self.fp16 = fp16
+        self.legacy = legacy
         self.preproc = ValTransform(legacy=legacy)
+        self.rect = rect
+        self.tile = tile
+        self.tile_overlap = tile_overlap
+        self.tile_merge = tile_merge
+        self.tile_full = tile_full
+        # letterbox buffer reused across frames
+        self.input_buffer = None
+        self.tracker = None
+        if track:
+            self.tracker = BoxTracker()
+            self.scheduler = DetectionScheduler(detect_interval, motion_thre, track_conf)
+        self.roi = roi
+        self.roi_margin = roi_margin
+        self.roi_interval = roi_interval
+        # detections of the previous frame, in image coordinates
+        self.roi_boxes = None
+        self.frames_since_full = 0
         if trt_file is not None:
             from torch2trt import TRTModule
 
@@ -141,12 +274,26 @@ class Predictor(object):
         img_info["height"] = height
         img_info["width"] = width
         img_info["raw_img"] = img
+        if self.tile:
+            return self.tiled_inference(img, img_info)
+        if self.roi:
+            return self.roi_inference(img, img_info)
 
         ratio = min(self.test_size[0] / img.shape[0], self.test_size[1] / img.shape[1])
         img_info["ratio"] = ratio
-
-        img, _ = self.preproc(img, None, self.test_size)
-        img = torch.from_numpy(img).unsqueeze(0)
+        if self.rect:
+            # same ratio, less padding
+            return self.forward(img, rect_input_size(img.shape, self.test_size)), img_info
+        return self.forward(img, self.test_size), img_info
+
+    def forward(self, img, input_size):
+        """Letterbox a BGR image to `input_size` and detect on it."""
+        if self.legacy:
+            img, _ = self.preproc(img, None, input_size)
+            img = torch.from_numpy(img).unsqueeze(0)
+        else:
+            self.input_buffer, _ = preproc_batch([img], input_size, out=self.input_buffer)
+            img = torch.from_numpy(self.input_buffer)
         img = img.float()
         if self.device == "gpu":
             img = img.cuda()
@@ -163,7 +310,81 @@ class Predictor(object):
                 self.nmsthre, class_agnostic=True
             )
             logger.info("Infer time: {:.4f}s".format(time.time() - t0))
-        return outputs, img_info
+        return outputs
+
+    def roi_inference(self, img, img_info):
+        # boxes are mapped back to the image below
+        img_info["ratio"] = 1.0
+        output = None
+        if self.roi_boxes is not None and self.frames_since_full < self.roi_interval:
+            x0, y0, x1, y1 = roi_region(self.roi_boxes, img.shape[:2], self.roi_margin)
+            input_size = roi_input_size((y1 - y0, x1 - x0), img.shape[:2], self.test_size)
+            output = self.forward(img[y0:y1, x0:x1], input_size)[0]
+            if output is not None:
+                ratio = min(input_size[0] / (y1 - y0), input_size[1] / (x1 - x0))
+                output[:, :4] /= ratio
+                output[:, :4] += output.new_tensor([x0, y0, x0, y0])
+            self.frames_since_full += 1
+
+        if output is None:
+            # no previous detections, a miss in the crop or time to look for new objects
+            ratio = min(self.test_size[0] / img.shape[0], self.test_size[1] / img.shape[1])
+            output = self.forward(img, self.test_size)[0]
+            if output is not None:
+                output[:, :4] /= ratio
+            self.frames_since_full = 0
+        self.roi_boxes = None if output is None else output[:, :4]
+        return [output], img_info
+
+    def tiled_inference(self, img, img_info):
+        # boxes are mapped back to the image by `merge_tiles`
+        img_info["ratio"] = 1.0
+        self.input_buffer, tile_info = tile_image(
+            img, self.test_size, self.tile_overlap, self.tile_full, out=self.input_buffer
+        )
+        tiles = torch.from_numpy(self.input_buffer).float()
+        if self.device == "gpu":
+            tiles = tiles.cuda()
+            if self.fp16:
+                tiles = tiles.half()  # to FP16
+
+        with torch.no_grad():
+            t0 = time.time()
+            # all the tiles in one batch
+            outputs = self.model(tiles)
+            if self.decoder is not None:
+                outputs = self.decoder(outputs, dtype=outputs.type())
+            outputs = merge_tiles(
+                outputs, tile_info, self.num_classes, self.confthre, self.nmsthre,
+                merge=self.tile_merge, class_agnostic=True,
+            )
+            logger.info("Infer time of {} tiles: {:.4f}s".format(len(tiles), time.time() - t0))
+        return [outputs], img_info
+
+    def track_inference(self, frame):
+        """
+        Propagate the tracks to the new video frame, and run the detector on it if the
+        scheduler asks for it.
+
+        Returns:
+            np.ndarray: ``[M, 7]`` (x1, y1, x2, y2, confidence, class_pred, track_id)
+            of the tracks, in image coordinates.
+        """
+        tracks = self.tracker.predict()
+        if self.scheduler.need_detection(frame, self.tracker):
+            outputs, img_info = self.inference(frame)
+            detections = outputs[0]
+            if detections is not None:
+                detections = detections.cpu().clone()
+                detections[:, :4] /= img_info["ratio"]
+            tracks = self.tracker.update(detections)
+        return tracks
+
+    def visual_tracks(self, tracks, frame, cls_conf=0.35):
+        return vis(
+            frame, tracks[:, :4], tracks[:, 4], tracks[:, 5], cls_conf, self.cls_names,
+            track_ids=tracks[:, 6],
+        )
 
     def visual(self, output, img_info, cls_conf=0.35):
         ratio = img_info["ratio"]
@@ -227,8 +448,12 @@ def imageflow_demo(predictor, vis_folder, current_time, args):
     while True:
         ret_val, frame = cap.read()
         if ret_val:
-            outputs, img_info = predictor.inference(frame)
-            result_frame = predictor.visual(outputs[0], img_info, predictor.confthre)
+            if predictor.tracker is not None:
+                tracks = predictor.track_inference(frame)
+                result_frame = predictor.visual_tracks(tracks, frame, predictor.confthre)
+            else:
+                outputs, img_info = predictor.inference(frame)
+                result_frame = predictor.visual(outputs[0], img_info, predictor.confthre)
             if args.save_result:
                 vid_writer.write(result_frame)
             else:
@@ -239,6 +464,13 @@ def imageflow_demo(predictor, vis_folder, current_time, args):
                 break
         else:
             break
+    if predictor.tracker is not None:
+        scheduler = predictor.scheduler
+        logger.info("detector ran on {} of {} frames ({:.1f}%)".format(
+            scheduler.num_detections,
+            scheduler.num_frames,
+            100 * scheduler.num_detections / max(scheduler.num_frames, 1),
+        ))
 
 
 def main(exp, args):
@@ -265,46 +497,75 @@ def main(exp, args):
     if args.tsize is not None:
         exp.test_size = (args.tsize, args.tsize)
 
-    model = exp.get_model()
-    logger.info("Model Summary: {}".format(get_model_info(model, exp.test_size)))
-
-    if args.device == "gpu":
-        model.cuda()
-        if args.fp16:
-            model.half()  # to FP16
-    model.eval()
-
-    if not args.trt:
-        if args.ckpt is None:
-            ckpt_file = os.path.join(file_name, "best_ckpt.pth")
-        else:
-            ckpt_file = args.ckpt
-        logger.info("loading checkpoint")
-        ckpt = torch.load(ckpt_file, map_location="cpu")
-        # load the model state dict
-        model.load_state_dict(ckpt["model"])
-        logger.info("loaded checkpoint done.")
-
-    if args.fuse:
-        logger.info("\tFusing model...")
-        model = fuse_model(model)
-
-    if args.trt:
-        assert not args.fuse, "TensorRT model is not support model fusing!"
-        trt_file = os.path.join(file_name, "model_trt.pth")
-        assert os.path.exists(
-            trt_file
-        ), "TensorRT model is not found!\n Run python3 tools/trt.py first!"
-        model.head.decode_in_inference = False
-        decoder = model.head.decode_outputs
-        logger.info("Using TensorRT to inference")
-    else:
+    if args.model_cache:
+        assert not args.trt and args.onnx is None, "model cache only holds pytorch models!"
+        assert not args.roi and not args.rect, "the cached model is traced at tsize!"
+        ckpt_file = args.ckpt or os.path.join(file_name, "best_ckpt.pth")
+        t0 = time.time()
+        model, cached = load_cached_model(
+            exp,
+            ckpt_file,
+            fuse=args.fuse,
+            device="cuda" if args.device == "gpu" else "cpu",
+            half=args.device == "gpu" and args.fp16,
+        )
+        logger.info("{} model in {:.2f}s".format(
+            "loaded cached" if cached else "built and cached", time.time() - t0
+        ))
         trt_file = None
         decoder = None
+    else:
+        model = exp.get_model()
+        logger.info("Model Summary: {}".format(get_model_info(model, exp.test_size)))
+
+        if args.device == "gpu":
+            model.cuda()
+            if args.fp16:
+                model.half()  # to FP16
+        model.eval()
+
+        if not args.trt and args.onnx is None:
+            if args.ckpt is None:
+                ckpt_file = os.path.join(file_name, "best_ckpt.pth")
+            else:
+                ckpt_file = args.ckpt
+            logger.info("loading checkpoint")
+            ckpt = torch.load(ckpt_file, map_location="cpu")
+            # load the model state dict
+            model.load_state_dict(ckpt["model"])
+            logger.info("loaded checkpoint done.")
+
+        if args.fuse:
+            logger.info("\tFusing model...")
+            model = fuse_model(model)
+
+        if args.trt:
+            assert not args.fuse, "TensorRT model is not support model fusing!"
+            assert not args.tile, "TensorRT model is built for a batch of one image!"
+            assert not args.roi and not args.rect, "TensorRT model is built for a fixed input size!"
+            trt_file = os.path.join(file_name, "model_trt.pth")
+            assert os.path.exists(
+                trt_file
+            ), "TensorRT model is not found!\n Run python3 tools/trt.py first!"
+            model.head.decode_in_inference = False
+            decoder = model.head.decode_outputs
+            logger.info("Using TensorRT to inference")
+        elif args.onnx is not None:
+            assert not args.fuse, "onnx model is not support model fusing!"
+            assert not args.roi and not args.rect, "onnx model is exported for a fixed input size!"
+            trt_file = None
+            model, decoder = get_ort_model(model, exp, args)
+            logger.info("Using onnxruntime to inference")
+        else:
+            trt_file = None
+            decoder = None
 
     predictor = Predictor(
         model, exp, COCO_CLASSES, trt_file, decoder,
-        args.device, args.fp16, args.legacy,
+        args.device, args.fp16, args.legacy, args.rect,
+        args.tile, args.tile_overlap, args.tile_merge, args.tile_full,
+        args.track, args.detect_interval, args.motion_thre, args.track_conf,
+        args.roi, args.roi_margin, args.roi_interval,
     )
     current_time = time.localtime()
     if args.demo == "image":
@@ -5,6 +5,7 @@
 import argparse
 import os
 import random
+import time
 import warnings
 from loguru import logger
 
@@ -14,12 +15,15 @@ from torch.nn.parallel import DistributedDataParallel as DDP
 
 from yolox.core import launch
 from yolox.exp import get_exp
+from yolox.models.network_blocks import InputNorm
 from yolox.utils import (
     configure_module,
     configure_nccl,
     fuse_model,
     get_local_rank,
     get_model_info,
+    get_ort_model,
+    load_cached_model,
     setup_logger
 )
 
@@ -89,6 +93,16 @@ def make_parser():
         action="store_true",
         help="To be compatible with older versions",
     )
+    parser.add_argument(
+        "--model-cache",
+        action="store_true",
+        help="load the fused and traced model from the cache, building it on first use",
+    )
+    parser.add_argument(
+        "--rect",
+        action="store_true",
+        help="batch images of similar aspect ratio at the smallest rectangle holding them",
+    )
     parser.add_argument(
         "--test",
         dest="test",
@@ -103,6 +117,30 @@ def make_parser():
         action="store_true",
         help="speed test only.",
     )
+    parser.add_argument(
+        "--onnx", default=None, type=str, help="run this onnx model with onnxruntime"
+    )
+    parser.add_argument(
+        "--decode_in_inference",
+        action="store_true",
+        help="the onnx model was exported with decode_in_inference",
+    )
+    parser.add_argument(
+        "--ort-opt-level",
+        default="all",
+        choices=["disable", "basic", "extended", "all"],
+        help="onnxruntime graph optimization level",
+    )
+    parser.add_argument("--ort-threads", default=0, type=int, help="onnxruntime intra op threads")
+    parser.add_argument(
+        "--ort-inter-threads", default=0, type=int, help="onnxruntime inter op threads"
+    )
+    parser.add_argument(
+        "--ort-parallel", action="store_true", help="onnxruntime parallel execution mode"
+    )
+    parser.add_argument(
+        "--ort-cache", default=None, type=str, help="file caching the optimized onnx graph"
+    )
     parser.add_argument(
         "opts",
         help="Modify config options using the command-line",
@@ -144,54 +182,85 @@ def main(exp, args, num_gpu):
         exp.nmsthre = args.nms
     if args.tsize is not None:
         exp.test_size = (args.tsize, args.tsize)
-
-    model = exp.get_model()
-    logger.info("Model Summary: {}".format(get_model_info(model, exp.test_size)))
-    logger.info("Model Structure:\n{}".format(str(model)))
+    if args.rect:
+        assert not args.trt and args.onnx is None, "rect eval needs a dynamic input size!"
+        exp.eval_rect = True
 
     evaluator = exp.get_evaluator(args.batch_size, is_distributed, args.test, args.legacy)
     evaluator.per_class_AP = True
     evaluator.per_class_AR = True
 
-    torch.cuda.set_device(rank)
-    model.cuda(rank)
-    model.eval()
-
-    if not args.speed and not args.trt:
-        if args.ckpt is None:
-            ckpt_file = os.path.join(file_name, "best_ckpt.pth")
-        else:
-            ckpt_file = args.ckpt
-        logger.info("loading checkpoint from {}".format(ckpt_file))
-        loc = "cuda:{}".format(rank)
-        ckpt = torch.load(ckpt_file, map_location=loc)
-        model.load_state_dict(ckpt["model"])
-        logger.info("loaded checkpoint done.")
-
-    if is_distributed:
-        model = DDP(model, device_ids=[rank])
-
-    if args.fuse:
-        logger.info("\tFusing model...")
-        model = fuse_model(model)
-
-    if args.trt:
-        assert (
-            not args.fuse and not is_distributed and args.batch_size == 1
-        ), "TensorRT model is not support model fusing and distributed inferencing!"
-        trt_file = os.path.join(file_name, "model_trt.pth")
-        assert os.path.exists(
-            trt_file
-        ), "TensorRT model is not found!\n Run tools/trt.py first!"
-        model.head.decode_in_inference = False
-        decoder = model.head.decode_outputs
-    else:
+    if args.model_cache:
+        assert not is_distributed and not args.trt and args.onnx is None and not args.speed, \
+            "model cache only holds the pytorch model of a checkpoint, on a single device!"
+        assert not args.rect, "the cached model is traced at tsize!"
+        assert not args.legacy, "the cached model has no legacy input normalization!"
+        ckpt_file = args.ckpt or os.path.join(file_name, "best_ckpt.pth")
+        t0 = time.time()
+        device = torch.device("cuda", rank)
+        model, cached = load_cached_model(
+            exp, ckpt_file, fuse=args.fuse, device=device, half=args.fp16
+        )
+        logger.info("{} model in {:.2f}s".format(
+            "loaded cached" if cached else "built and cached", time.time() - t0
+        ))
         trt_file = None
         decoder = None
+    else:
+        device = None
+        model = exp.get_model()
+        if args.legacy and exp.data_dtype == "uint8":
+            # uint8 images are normalized on the device instead of in ValTransform
+            model.input_norm = InputNorm(legacy=True)
+        logger.info("Model Summary: {}".format(get_model_info(model, exp.test_size)))
+        logger.info("Model Structure:\n{}".format(str(model)))
+
+        if args.onnx is None:
+            torch.cuda.set_device(rank)
+            model.cuda(rank)
+        model.eval()
+
+        if not args.speed and not args.trt and args.onnx is None:
+            if args.ckpt is None:
+                ckpt_file = os.path.join(file_name, "best_ckpt.pth")
+            else:
+                ckpt_file = args.ckpt
+            logger.info("loading checkpoint from {}".format(ckpt_file))
+            loc = "cuda:{}".format(rank)
+            ckpt = torch.load(ckpt_file, map_location=loc)
+            model.load_state_dict(ckpt["model"])
+            logger.info("loaded checkpoint done.")
+
+        if is_distributed:
+            model = DDP(model, device_ids=[rank])
+
+        if args.fuse:
+            logger.info("\tFusing model...")
+            model = fuse_model(model)
+
+        if args.trt:
+            assert (
+                not args.fuse and not is_distributed and args.batch_size == 1
+            ), "TensorRT model is not support model fusing and distributed inferencing!"
+            trt_file = os.path.join(file_name, "model_trt.pth")
+            assert os.path.exists(
+                trt_file
+            ), "TensorRT model is not found!\n Run tools/trt.py first!"
+            model.head.decode_in_inference = False
+            decoder = model.head.decode_outputs
+        elif args.onnx is not None:
+            assert (
+                not args.fuse and not is_distributed and not args.fp16
+            ), "onnx model is not support model fusing, fp16 and distributed inferencing!"
+            trt_file = None
+            model, decoder = get_ort_model(model, exp, args)
+        else:
+            trt_file = None
+            decoder = None
 
     # start evaluate
     *_, summary = evaluator.evaluate(
-        model, is_distributed, args.fp16, trt_file, decoder, exp.test_size
+        model, is_distributed, args.fp16, trt_file, decoder, exp.test_size, device=device
     )
     logger.info("\n" + summary)
 
@@ -7,11 +7,10 @@ import os
 from loguru import logger
 
 import torch
-from torch import nn
 
 from yolox.exp import get_exp
-from yolox.models.network_blocks import SiLU
-from yolox.utils import replace_module
+from yolox.models.end2end import End2End
+from yolox.utils import fuse_model
 
 
 def make_parser():
@@ -54,6 +53,17 @@ def make_parser():
         action="store_true",
         help="decode in inference or not"
     )
+    parser.add_argument(
+        "--end2end",
+        action="store_true",
+        help="embed decode and NMS in the graph, output [B, max_det, 6] detections"
+    )
+    parser.add_argument("--max-det", default=100, type=int, help="detections kept by --end2end")
+    parser.add_argument("--conf", default=0.3, type=float, help="score threshold of --end2end")
+    parser.add_argument("--nms", default=0.45, type=float, help="nms threshold of --end2end")
+    parser.add_argument(
+        "--pre-nms-topk", default=1000, type=int, help="anchors kept before nms by --end2end"
+    )
 
     return parser
 
@@ -82,8 +92,12 @@ def main():
     if "model" in ckpt:
         ckpt = ckpt["model"]
     model.load_state_dict(ckpt)
-    model = replace_module(model, nn.SiLU, SiLU)
+    model = fuse_model(model, export=True)
     model.head.decode_in_inference = args.decode_in_inference
+    if args.end2end:
+        model = End2End(
+            model, args.max_det, args.conf, args.nms, pre_nms_topk=args.pre_nms_topk
+        )
 
     logger.info("loading checkpoint done.")
     dummy_input = torch.randn(args.batch_size, 3, exp.test_size[0], exp.test_size[1])
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import argparse
+from loguru import logger
+
+import torch
+
+from yolox.exp import get_exp
+from yolox.utils import PROFILE_CACHE_DIR, format_profile, fuse_model, profile_model
+
+
+def make_parser():
+    parser = argparse.ArgumentParser("YOLOX model profiler")
+    parser.add_argument("-n", "--name", type=str, default=None, help="model name")
+    parser.add_argument(
+        "-f",
+        "--exp_file",
+        default=None,
+        type=str,
+        help="experiment description file",
+    )
+    parser.add_argument("--tsize", default=None, type=int, help="test img size")
+    parser.add_argument(
+        "--batch-sizes", default="1", type=str, help="comma separated batch sizes to profile"
+    )
+    parser.add_argument(
+        "--device", default="cpu", type=str, help="device to run on, eg. cpu or cuda"
+    )
+    parser.add_argument("--fp16", action="store_true", help="profile the fp16 model")
+    parser.add_argument("--fuse", action="store_true", help="profile the fused model")
+    parser.add_argument("--iters", type=int, default=10, help="timed iterations")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed iterations")
+    parser.add_argument("--no-cache", action="store_true", help="profile even if cached")
+    parser.add_argument(
+        "opts",
+        help="Modify config options using the command-line",
+        default=None,
+        nargs=argparse.REMAINDER,
+    )
+    return parser
+
+
+@logger.catch
+def main():
+    args = make_parser().parse_args()
+    exp = get_exp(args.exp_file, args.name)
+    exp.merge(args.opts)
+    if args.tsize is not None:
+        exp.test_size = (args.tsize, args.tsize)
+
+    model = exp.get_model().to(args.device).eval()
+    if args.fuse:
+        model = fuse_model(model)
+    if args.fp16:
+        model = model.half()
+
+    torch.set_grad_enabled(False)
+    profile = profile_model(
+        model,
+        exp.test_size,
+        batch_sizes=[int(b) for b in args.batch_sizes.split(",")],
+        iters=args.iters,
+        warmup=args.warmup,
+        cache_dir=None if args.no_cache else PROFILE_CACHE_DIR,
+    )
+    logger.info("input size {}, device {}\n{}".format(
+        exp.test_size, args.device, format_profile(profile)
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import argparse
+import copy
+import os
+import time
+from loguru import logger
+
+import torch
+
+from yolox.exp import get_exp
+from yolox.utils import (
+    bn_gamma_importance,
+    bn_taylor_importance,
+    get_model_info,
+    get_pruned_channels,
+    keep_bn_stats,
+    prune_channels
+)
+
+EXP_TEMPLATE = '''#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Generated by tools/prune.py: {ratio:.0%} of the hidden channels of {source} removed
+# by {importance} importance. Fine-tune it with
+#   python tools/train.py -f {exp_file} -c {ckpt_file}
+
+from yolox.exp import get_exp
+from yolox.utils import apply_pruned_channels
+
+BaseExp = type(get_exp({base_file}, {base_name}))
+
+
+class Exp(BaseExp):
+    def __init__(self):
+        super().__init__()
+        self.exp_name = "{exp_name}"
+        # [in_channels, out_channels, groups] of the pruned convs
+        self.pruned_channels = {channels}
+
+    def get_model(self):
+        if getattr(self, "model", None) is None:
+            apply_pruned_channels(super().get_model(), self.pruned_channels)
+        return self.model
+'''
+
+
+def make_parser():
+    parser = argparse.ArgumentParser("YOLOX channel pruning")
+    parser.add_argument("-expn", "--experiment-name", type=str, default=None)
+    parser.add_argument("-n", "--name", type=str, default=None, help="model name")
+    parser.add_argument(
+        "-f",
+        "--exp_file",
+        default=None,
+        type=str,
+        help="experiment description file",
+    )
+    parser.add_argument("-c", "--ckpt", default=None, type=str, help="ckpt path")
+    parser.add_argument(
+        "--ratio", default=0.3, type=float, help="fraction of the hidden channels to remove"
+    )
+    parser.add_argument(
+        "--importance",
+        default="bn",
+        choices=["bn", "taylor"],
+        help="rank channels by batchnorm gamma or by taylor expansion of the training loss",
+    )
+    parser.add_argument(
+        "--taylor-iters", default=32, type=int, help="training batches to estimate taylor on"
+    )
+    parser.add_argument("-b", "--batch-size", type=int, default=8, help="batch size of taylor")
+    parser.add_argument(
+        "--divisor", default=8, type=int, help="round the kept channels to a multiple of it"
+    )
+    parser.add_argument("--iters", type=int, default=50, help="iterations to measure latency")
+    parser.add_argument(
+        "opts",
+        help="Modify config options using the command-line",
+        default=None,
+        nargs=argparse.REMAINDER,
+    )
+    return parser
+
+
+def quote(value):
+    return "None" if value is None else '"{}"'.format(value)
+
+
+def taylor_importance(model, exp, args):
+    model.train()
+    model.zero_grad()
+    exp.data_num_workers = 0
+    loader = exp.get_data_loader(args.batch_size, is_distributed=False, no_aug=True)
+    with keep_bn_stats(model):
+        for i, (inps, targets, _, _) in enumerate(loader):
+            if i == args.taylor_iters:
+                break
+            targets.requires_grad = False
+            inps, targets = exp.preprocess(inps, targets, exp.input_size)
+            model(inps, targets)["total_loss"].backward()
+    importance = bn_taylor_importance(model)
+    model.zero_grad()
+    return importance
+
+
+def measure_latency(model, exp, iters):
+    x = torch.randn(1, 3, exp.test_size[0], exp.test_size[1])
+    with torch.no_grad():
+        for _ in range(5):
+            model(x)
+        start = time.perf_counter()
+        for _ in range(iters):
+            model(x)
+    return 1000 * (time.perf_counter() - start) / iters
+
+
+@logger.catch
+def main():
+    args = make_parser().parse_args()
+    logger.info("args value: {}".format(args))
+    exp = get_exp(args.exp_file, args.name)
+    exp.merge(args.opts)
+
+    if not args.experiment_name:
+        args.experiment_name = exp.exp_name
+    file_name = os.path.join(exp.output_dir, args.experiment_name)
+    pruned_name = "{}_pruned".format(args.experiment_name)
+    pruned_dir = os.path.join(exp.output_dir, pruned_name)
+    os.makedirs(pruned_dir, exist_ok=True)
+
+    model = exp.get_model()
+    if args.ckpt is None:
+        ckpt_file = os.path.join(file_name, "best_ckpt.pth")
+    else:
+        ckpt_file = args.ckpt
+    ckpt = torch.load(ckpt_file, map_location="cpu")
+    if "model" in ckpt:
+        ckpt = ckpt["model"]
+    model.load_state_dict(ckpt)
+    logger.info("loading checkpoint done.")
+
+    if args.importance == "taylor":
+        importance = taylor_importance(model, exp, args)
+    else:
+        importance = bn_gamma_importance(model)
+    model.eval()
+    origin = copy.deepcopy(model)
+    prune_channels(model, importance, args.ratio, args.divisor)
+    channels = get_pruned_channels(model, origin)
+    logger.info("pruned {} convs".format(len(channels)))
+
+    pruned_ckpt = os.path.join(pruned_dir, "pruned_ckpt.pth")
+    pruned_exp = os.path.join(pruned_dir, "{}.py".format(pruned_name))
+    torch.save({"model": model.state_dict()}, pruned_ckpt)
+    with open(pruned_exp, "w") as f:
+        f.write(EXP_TEMPLATE.format(
+            ratio=args.ratio,
+            source=args.exp_file or args.name,
+            importance=args.importance,
+            exp_file=pruned_exp,
+            ckpt_file=pruned_ckpt,
+            base_file=quote(args.exp_file and os.path.abspath(args.exp_file)),
+            base_name=quote(args.name),
+            exp_name=pruned_name,
+            channels="{{\n{}        }}".format("".join(
+                "            \"{}\": {},\n".format(k, v) for k, v in channels.items()
+            )),
+        ))
+    logger.info("generated pruned exp {} and checkpoint {}".format(pruned_exp, pruned_ckpt))
+
+    for name, variant in (("origin", origin), ("pruned", model)):
+        logger.info("{}: {}, cpu latency {:.2f} ms".format(
+            name,
+            get_model_info(variant, exp.test_size),
+            measure_latency(variant, exp, args.iters),
+        ))
+
+
+if __name__ == "__main__":
+    main()
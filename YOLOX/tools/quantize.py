@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import argparse
+import copy
+import os
+import time
+from loguru import logger
+
+import numpy as np
+
+import torch
+from torch import nn
+
+from yolox.exp import get_exp
+from yolox.models.network_blocks import SiLU
+from yolox.utils import ORTModel, replace_module
+
+# 1x1 prediction convs of the head, the most sensitive layers to quantization
+FLOAT_MODULES = ("head.cls_preds", "head.reg_preds", "head.obj_preds")
+
+
+def make_parser():
+    parser = argparse.ArgumentParser("YOLOX post-training int8 quantization")
+    parser.add_argument("-expn", "--experiment-name", type=str, default=None)
+    parser.add_argument("-n", "--name", type=str, default=None, help="model name")
+    parser.add_argument(
+        "-f",
+        "--exp_file",
+        default=None,
+        type=str,
+        help="experiment description file",
+    )
+    parser.add_argument("-c", "--ckpt", default=None, type=str, help="ckpt path")
+    parser.add_argument(
+        "--calib-images", default=100, type=int, help="number of eval images to calibrate on"
+    )
+    parser.add_argument("-b", "--batch-size", type=int, default=1, help="batch size of eval")
+    parser.add_argument("--iters", type=int, default=50, help="iterations to measure latency")
+    parser.add_argument("-o", "--opset", default=13, type=int, help="onnx opset version")
+    parser.add_argument(
+        "--no-eval", action="store_true", help="only report latency, skip the AP evaluation"
+    )
+    parser.add_argument(
+        "opts",
+        help="Modify config options using the command-line",
+        default=None,
+        nargs=argparse.REMAINDER,
+    )
+    return parser
+
+
+def calibration_images(exp, num_images):
+    dataset = exp.get_eval_dataset()
+    num_images = min(num_images, len(dataset))
+    for i in range(num_images):
+        img = dataset[i][0]
+        yield np.ascontiguousarray(img[None], dtype=np.float32)
+
+
+def export_onnx(model, exp, onnx_file, opset):
+    dummy_input = torch.randn(1, 3, exp.test_size[0], exp.test_size[1])
+    torch.onnx.export(
+        model,
+        dummy_input,
+        onnx_file,
+        input_names=["images"],
+        output_names=["output"],
+        dynamic_axes={"images": {0: "batch"}, "output": {0: "batch"}},
+        opset_version=opset,
+    )
+
+
+def quantize_onnx(exp, args, onnx_file, int8_file):
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        QuantFormat,
+        QuantType,
+        quantize_static
+    )
+
+    class DataReader(CalibrationDataReader):
+        def __init__(self):
+            self.images = calibration_images(exp, args.calib_images)
+
+        def get_next(self):
+            img = next(self.images, None)
+            return None if img is None else {"images": img}
+
+    # find the nodes of the float modules by the names of their weights
+    graph = onnx.load(onnx_file).graph
+    initializers = {init.name for init in graph.initializer}
+    float_nodes = [
+        node.name for node in graph.node
+        if any(name in initializers and name.startswith(FLOAT_MODULES) for name in node.input)
+    ]
+    logger.info("keep {} nodes in float: {}".format(len(float_nodes), float_nodes))
+
+    quantize_static(
+        onnx_file,
+        int8_file,
+        DataReader(),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        nodes_to_exclude=float_nodes,
+    )
+
+
+def quantize_fx(model, exp, args):
+    """
+    Quantize the backbone and the head convs with FX graph mode and fbgemm.
+    The head is not FX traceable as a whole, so each of its branches is quantized
+    on its own and the prediction convs stay in float.
+    """
+    from torch.ao.quantization import QConfigMapping, get_default_qconfig
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    torch.backends.quantized.engine = "fbgemm"
+    qconfig_mapping = QConfigMapping().set_global(get_default_qconfig("fbgemm"))
+    model = copy.deepcopy(model).eval()
+    example = torch.randn(1, 3, exp.test_size[0], exp.test_size[1])
+
+    model.backbone = prepare_fx(model.backbone, qconfig_mapping, (example,))
+    head = model.head
+    for branches in (head.stems, head.cls_convs, head.reg_convs):
+        for i in range(len(branches)):
+            # example inputs are only used for shape propagation, so any tensor works
+            branches[i] = prepare_fx(branches[i], qconfig_mapping, (example,))
+
+    with torch.no_grad():
+        for img in calibration_images(exp, args.calib_images):
+            model(torch.from_numpy(img))
+
+    model.backbone = convert_fx(model.backbone)
+    for branches in (head.stems, head.cls_convs, head.reg_convs):
+        for i in range(len(branches)):
+            branches[i] = convert_fx(branches[i])
+    return model
+
+
+def measure_latency(model, exp, iters):
+    x = torch.randn(1, 3, exp.test_size[0], exp.test_size[1])
+    with torch.no_grad():
+        for _ in range(5):
+            model(x)
+        start = time.perf_counter()
+        for _ in range(iters):
+            model(x)
+    return 1000 * (time.perf_counter() - start) / iters
+
+
+@logger.catch
+def main():
+    args = make_parser().parse_args()
+    logger.info("args value: {}".format(args))
+    exp = get_exp(args.exp_file, args.name)
+    exp.merge(args.opts)
+
+    if not args.experiment_name:
+        args.experiment_name = exp.exp_name
+    file_name = os.path.join(exp.output_dir, args.experiment_name)
+    os.makedirs(file_name, exist_ok=True)
+
+    model = exp.get_model()
+    if args.ckpt is None:
+        ckpt_file = os.path.join(file_name, "best_ckpt.pth")
+    else:
+        ckpt_file = args.ckpt
+    ckpt = torch.load(ckpt_file, map_location="cpu")
+    model.eval()
+    if "model" in ckpt:
+        ckpt = ckpt["model"]
+    model.load_state_dict(ckpt)
+    model = replace_module(model, nn.SiLU, SiLU)
+    logger.info("loading checkpoint done.")
+
+    onnx_file = os.path.join(file_name, "model_fp32.onnx")
+    int8_file = os.path.join(file_name, "model_int8.onnx")
+    fx_file = os.path.join(file_name, "model_fx_int8.pt")
+
+    export_onnx(model, exp, onnx_file, args.opset)
+    quantize_onnx(exp, args, onnx_file, int8_file)
+    logger.info("generated int8 onnx model named {}".format(int8_file))
+
+    fx_model = quantize_fx(model, exp, args)
+    dummy_input = torch.randn(1, 3, exp.test_size[0], exp.test_size[1])
+    with torch.no_grad():
+        torch.jit.save(torch.jit.trace(fx_model, dummy_input), fx_file)
+    logger.info("generated fx int8 torchscript model named {}".format(fx_file))
+
+    models = {
+        "pytorch fp32": model,
+        "pytorch fx int8": fx_model,
+        "onnxruntime fp32": ORTModel(onnx_file, providers=["CPUExecutionProvider"]),
+        "onnxruntime int8": ORTModel(int8_file, providers=["CPUExecutionProvider"]),
+    }
+    evaluator = None if args.no_eval else exp.get_evaluator(args.batch_size, False)
+    results = []
+    for name, variant in models.items():
+        latency = measure_latency(variant, exp, args.iters)
+        ap50_95 = ap50 = float("nan")
+        if evaluator is not None:
+            ap50_95, ap50, _ = evaluator.evaluate(variant, False, False)
+        results.append((name, latency, ap50_95, ap50))
+
+    base_ap = results[0][2]
+    for name, latency, ap50_95, ap50 in results:
+        logger.info(
+            "{:<18}: cpu latency {:.2f} ms, AP50_95 {:.4f} ({:+.4f}), AP50 {:.4f}".format(
+                name, latency, ap50_95, ap50_95 - base_ap, ap50
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import argparse
+import copy
+import os
+import sys
+import tempfile
+import time
+from loguru import logger
+
+import cv2
+import numpy as np
+
+import torch
+from torch import nn
+
+from yolox.data.data_augment import preproc
+from yolox.exp import get_exp
+from yolox.models.network_blocks import SiLU
+from yolox.utils import bboxes_iou, fuse_model, postprocess, replace_module
+
+IMAGE_EXT = [".jpg", ".jpeg", ".webp", ".bmp", ".png"]
+
+
+def make_parser():
+    parser = argparse.ArgumentParser("YOLOX export parity and latency check")
+    parser.add_argument("-expn", "--experiment-name", type=str, default=None)
+    parser.add_argument("-n", "--name", type=str, default=None, help="model name")
+    parser.add_argument(
+        "-f",
+        "--exp_file",
+        default=None,
+        type=str,
+        help="experiment description file",
+    )
+    parser.add_argument("-c", "--ckpt", default=None, type=str, help="ckpt path")
+    parser.add_argument("--path", required=True, help="folder of images to verify on")
+    parser.add_argument(
+        "--onnx", default=None, type=str, help="onnx model to verify, exported if not given"
+    )
+    parser.add_argument(
+        "--torchscript",
+        default=None,
+        type=str,
+        help="torchscript model to verify, traced if not given",
+    )
+    parser.add_argument("--tsize", default=None, type=int, help="test img size")
+    parser.add_argument("--conf", default=0.3, type=float, help="test conf")
+    parser.add_argument("--nms", default=0.45, type=float, help="test nms threshold")
+    parser.add_argument(
+        "--atol", default=1e-2, type=float, help="max abs diff allowed on the raw head output"
+    )
+    parser.add_argument(
+        "--iou-thr", default=0.9, type=float, help="iou for a detection to match the reference"
+    )
+    parser.add_argument(
+        "--max-unmatched",
+        default=0.0,
+        type=float,
+        help="fraction of reference detections allowed to be missed, and of detections "
+        "allowed to match no reference detection",
+    )
+    parser.add_argument("--warmup", default=5, type=int, help="untimed runs per backend")
+    parser.add_argument("--repeat", default=3, type=int, help="timed runs per image")
+    parser.add_argument(
+        "opts",
+        help="Modify config options using the command-line",
+        default=None,
+        nargs=argparse.REMAINDER,
+    )
+    return parser
+
+
+def get_image_list(path):
+    image_names = []
+    for maindir, subdir, file_name_list in os.walk(path):
+        for filename in file_name_list:
+            apath = os.path.join(maindir, filename)
+            ext = os.path.splitext(apath)[1]
+            if ext in IMAGE_EXT:
+                image_names.append(apath)
+    return sorted(image_names)
+
+
+def onnx_backend(onnx_file):
+    import onnxruntime
+
+    session = onnxruntime.InferenceSession(onnx_file, providers=["CPUExecutionProvider"])
+    input_name = session.get_inputs()[0].name
+
+    def run(x):
+        return torch.from_numpy(session.run(None, {input_name: x.numpy()})[0])
+    return run
+
+
+def torch_backend(model):
+    def run(x):
+        with torch.no_grad():
+            return model(x)
+    return run
+
+
+def detect(output, exp, args):
+    # postprocess writes the boxes in place, keep the raw output for the diff
+    return postprocess(output.clone(), exp.num_classes, args.conf, args.nms)[0]
+
+
+def match_detections(ref, dets, iou_thr):
+    """
+    Return the number of reference detections matched by a same class detection, and the
+    number of detections matching a same class reference detection.
+    """
+    if ref is None or dets is None:
+        return 0, 0
+    ious = bboxes_iou(ref[:, :4], dets[:, :4])
+    ious[ref[:, 6:7] != dets[:, 6].unsqueeze(0)] = 0
+    matches = ious >= iou_thr
+    return int(matches.any(dim=1).sum()), int(matches.any(dim=0).sum())
+
+
+def build_backends(model, exp, args, tmp_dir):
+    dummy_input = torch.randn(1, 3, exp.test_size[0], exp.test_size[1])
+
+    onnx_file = args.onnx
+    if onnx_file is None:
+        onnx_file = os.path.join(tmp_dir, "model.onnx")
+        torch.onnx.export(
+            replace_module(copy.deepcopy(model), nn.SiLU, SiLU),
+            dummy_input,
+            onnx_file,
+            input_names=["images"],
+            output_names=["output"],
+            opset_version=11,
+        )
+
+    if args.torchscript is None:
+        with torch.no_grad():
+            script_model = torch.jit.trace(model, dummy_input)
+    else:
+        script_model = torch.jit.load(args.torchscript, map_location="cpu")
+
+    return {
+        "pytorch": torch_backend(model),
+        "pytorch fused": torch_backend(fuse_model(copy.deepcopy(model))),
+        "onnxruntime": onnx_backend(onnx_file),
+        "torchscript": torch_backend(script_model),
+    }
+
+
+# errors are logged and re-raised, so that a broken export fails the check with a non zero exit
+@logger.catch(reraise=True)
+def main():
+    args = make_parser().parse_args()
+    logger.info("args value: {}".format(args))
+    exp = get_exp(args.exp_file, args.name)
+    exp.merge(args.opts)
+    if args.tsize is not None:
+        exp.test_size = (args.tsize, args.tsize)
+
+    if not args.experiment_name:
+        args.experiment_name = exp.exp_name
+
+    model = exp.get_model()
+    if args.ckpt is None:
+        file_name = os.path.join(exp.output_dir, args.experiment_name)
+        ckpt_file = os.path.join(file_name, "best_ckpt.pth")
+    else:
+        ckpt_file = args.ckpt
+    ckpt = torch.load(ckpt_file, map_location="cpu")
+    model.eval()
+    if "model" in ckpt:
+        ckpt = ckpt["model"]
+    model.load_state_dict(ckpt)
+    model.head.decode_in_inference = True
+    logger.info("loading checkpoint done.")
+
+    images = []
+    for image_name in get_image_list(args.path):
+        img, _ = preproc(cv2.imread(image_name), exp.test_size)
+        images.append(torch.from_numpy(img).unsqueeze(0))
+    assert len(images) > 0, "no image found in {}".format(args.path)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        backends = build_backends(model, exp, args, tmp_dir)
+        results = {name: {"outputs": [], "latency": []} for name in backends}
+        for name, run in backends.items():
+            for _ in range(args.warmup):
+                run(images[0])
+            for img in images:
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    output = run(img)
+                    results[name]["latency"].append(1000 * (time.perf_counter() - start))
+                results[name]["outputs"].append(output)
+
+    ref_outputs = results["pytorch"]["outputs"]
+    ref_dets = [detect(o, exp, args) for o in ref_outputs]
+    num_ref_dets = sum(len(d) for d in ref_dets if d is not None)
+    passed = True
+    for name, result in results.items():
+        max_diff = max(
+            (o - ref).abs().max().item() for o, ref in zip(result["outputs"], ref_outputs)
+        )
+        dets = [detect(o, exp, args) for o in result["outputs"]]
+        num_dets = sum(len(d) for d in dets if d is not None)
+        matches = [match_detections(r, d, args.iou_thr) for r, d in zip(ref_dets, dets)]
+        matched = sum(m[0] for m in matches)
+        # detections of the export which are not in the reference, eg. spurious boxes
+        extra = num_dets - sum(m[1] for m in matches)
+        missed_ratio = 1 - matched / num_ref_dets if num_ref_dets else 0.0
+        extra_ratio = extra / num_dets if num_dets else 0.0
+        p50, p90, p99 = np.percentile(result["latency"], [50, 90, 99])
+        ok = (
+            max_diff <= args.atol
+            and missed_ratio <= args.max_unmatched
+            and extra_ratio <= args.max_unmatched
+        )
+        passed &= ok
+        logger.info(
+            "{:<14}: max abs diff {:.2e}, matched dets {}/{}, extra dets {}/{}, "
+            "latency p50 {:.2f} ms, p90 {:.2f} ms, p99 {:.2f} ms{}".format(
+                name, max_diff, matched, num_ref_dets, extra, num_dets,
+                p50, p90, p99, "" if ok else ", FAILED",
+            )
+        )
+
+    if not passed:
+        logger.error("export parity check failed")
+        sys.exit(1)
+    logger.info("export parity check passed")
+
+
+if __name__ == "__main__":
+    main()
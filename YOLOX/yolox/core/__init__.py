@@ -2,5 +2,10 @@
 # -*- coding:utf-8 -*-
 # Copyright (c) Megvii, Inc. and its affiliates.
 
-from .launch import launch
-from .trainer import Trainer
+from yolox.utils.lazy_import import lazy_attach
+
+__getattr__, __dir__, __all__ = lazy_attach(__name__, {
+    "distill_trainer": ["DistillTrainer"],
+    "launch": ["launch"],
+    "trainer": ["Trainer"],
+})
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import hashlib
+import os
+from loguru import logger
+
+import numpy as np
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.nn.parallel import DistributedDataParallel as DDP
+
+from yolox.data import AsyncPrefetcher, DataLoader
+from yolox.utils import file_digest, is_parallel, wait_for_the_master
+
+from .trainer import Trainer
+
+
+def register_distill_hooks(model, store):
+    """Keep the PAFPN outputs and the obj/cls logits of every forward of `model` in `store`."""
+    def save(key):
+        def hook(module, inputs, output):
+            store[key] = output
+        return hook
+
+    model.backbone.register_forward_hook(save("fpn"))
+    for k in range(len(model.head.cls_preds)):
+        model.head.obj_preds[k].register_forward_hook(save(("obj", k)))
+        model.head.cls_preds[k].register_forward_hook(save(("cls", k)))
+
+
+def head_predictions(store):
+    """[batch, n_anchors_all, 1 + n_cls] obj/cls logits, in the anchor order of the head."""
+    num_levels = len(store["fpn"])
+    preds = [
+        torch.cat([store["obj", k], store["cls", k]], 1).flatten(start_dim=2)
+        for k in range(num_levels)
+    ]
+    return torch.cat(preds, 2).permute(0, 2, 1)
+
+
+class FeatureAdapters(nn.ModuleList):
+    """1x1 convs mapping the PAFPN features of the student to the channels of the teacher."""
+
+    def __init__(self, in_channels, out_channels):
+        super().__init__([nn.Conv2d(i, o, 1) for i, o in zip(in_channels, out_channels)])
+
+    def forward(self, features):
+        return [adapter(feat) for adapter, feat in zip(self, features)]
+
+
+class IndexedDataset(torch.utils.data.Dataset):
+    """
+    Dataset returning the index of each sample in place of its image id, which can repeat
+    across the parts of a concat dataset. Other attributes are those of `dataset`.
+    """
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, index):
+        img, target, img_info, _ = self.dataset[index]
+        # batch samplers of the mosaic datasets pass (mosaic, index, input_dim)
+        idx = index[1] if isinstance(index, tuple) else index
+        return img, target, img_info, np.array([idx])
+
+    def __getattr__(self, name):
+        if name == "dataset":
+            raise AttributeError(name)
+        return getattr(self.dataset, name)
+
+
+class DistillTrainer(Trainer):
+    """
+    Trainer distilling the frozen teacher of `exp` (see `Exp.get_teacher`) into its model.
+    On top of the detection losses, the model learns to imitate the PAFPN features of the
+    teacher through 1x1 adapter convs, and the soft obj/cls predictions of the teacher.
+    With `exp.distill_cache`, the teacher predictions of the no aug epochs are computed
+    once into a memory-mapped file and read back by dataset index instead of running the
+    teacher.
+    """
+
+    def resume_train(self, model):
+        self.teacher = self.exp.get_teacher().to(self.device)
+        self.teacher_store = {}
+        register_distill_hooks(self.teacher, self.teacher_store)
+        self.teacher_cache = None
+
+        # the adapters must be in the optimizer before its state is resumed
+        self.adapters = FeatureAdapters(
+            [stem.conv.in_channels for stem in model.head.stems],
+            [stem.conv.in_channels for stem in self.teacher.head.stems],
+        ).to(self.device)
+        self.optimizer.add_param_group({"params": list(self.adapters.parameters())})
+
+        model = super().resume_train(model)
+        adapters_file = os.path.join(self.file_name, "distill_adapters.pth")
+        if self.args.resume and os.path.exists(adapters_file):
+            self.adapters.load_state_dict(torch.load(adapters_file, map_location=self.device))
+        return model
+
+    def before_train(self):
+        super().before_train()
+        # after EMA creation, so that the EMA copy does not carry the hooks
+        self.student_store = {}
+        model = self.model.module if is_parallel(self.model) else self.model
+        register_distill_hooks(model, self.student_store)
+        if self.is_distributed:
+            # the adapters are trained along the model, their gradients are averaged the same way
+            device_ids = [self.local_rank] if torch.cuda.is_available() else None
+            self.adapters = DDP(self.adapters, device_ids=device_ids)
+
+    def before_epoch(self):
+        super().before_epoch()
+        in_no_aug = self.no_aug or self.epoch + 1 >= self.max_epoch - self.exp.no_aug_epochs
+        if self.exp.distill_cache and in_no_aug and self.teacher_cache is None:
+            self.use_teacher_cache()
+
+    def save_ckpt(self, ckpt_name, update_best_ckpt=False, ap=None):
+        super().save_ckpt(ckpt_name, update_best_ckpt, ap)
+        if self.rank == 0:
+            adapters = self.adapters.module if is_parallel(self.adapters) else self.adapters
+            torch.save(
+                adapters.state_dict(), os.path.join(self.file_name, "distill_adapters.pth")
+            )
+
+    def use_teacher_cache(self):
+        logger.info("--->No flip, hsv and multiscale now, read teacher outputs from cache!")
+        dataset = self.train_loader.dataset
+        dataset.preproc.flip_prob = 0.0
+        dataset.preproc.hsv_prob = 0.0
+        size = self.exp.input_size
+        self.exp.random_size = (size[0] // 32, size[0] // 32)
+        self.input_size = size
+        batch_sampler = self.train_loader.batch_sampler
+        if batch_sampler.multiscale_sizes is not None:
+            batch_sampler.multiscale_sizes = [size]
+        # the new iterator continues the stream of batches at the start of this epoch
+        batch_sampler.set_start(self.epoch * self.max_iter)
+
+        # workers only see the new transform once they are started again
+        self.prefetcher.close()
+        self.train_loader = DataLoader(
+            IndexedDataset(dataset),
+            batch_sampler=batch_sampler,
+            num_workers=self.train_loader.num_workers,
+            pin_memory=self.train_loader.pin_memory,
+            collate_fn=self.train_loader.collate_fn,
+            worker_init_fn=self.train_loader.worker_init_fn,
+        )
+
+        # another teacher, checkpoint or input size gets its own cache instead of stale outputs
+        key = self.teacher_cache_key()
+        cache_file = os.path.join(self.file_name, "teacher_outputs_{}.npy".format(key))
+        num_anchors = sum((size[0] // s) * (size[1] // s) for s in self.teacher.head.strides)
+        shape = (len(dataset), num_anchors, 1 + self.exp.num_classes)
+        with wait_for_the_master():
+            if not os.path.exists(cache_file) or np.load(cache_file, mmap_mode="r").shape != shape:
+                self.build_teacher_cache(cache_file, shape)
+        # row i holds the outputs of sample i of the dataset
+        self.teacher_cache = np.load(cache_file, mmap_mode="r")
+
+        self.prefetcher = AsyncPrefetcher(
+            self.train_loader,
+            self.device,
+            depth=self.exp.prefetch_depth,
+            preprocess=self.preprocess if self.exp.prefetch_preprocess else None,
+        )
+
+    def teacher_cache_key(self):
+        """Short hash of the teacher exp, the content of its checkpoint and the input size."""
+        teacher_exp = self.exp.teacher_exp
+        if os.path.isfile(teacher_exp):
+            teacher_exp = file_digest(teacher_exp)
+        key = [teacher_exp, file_digest(self.exp.teacher_ckpt), tuple(self.exp.input_size)]
+        return hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+
+    def build_teacher_cache(self, cache_file, shape):
+        logger.info("caching teacher outputs of {} images to {}".format(shape[0], cache_file))
+        input_size = tuple(self.exp.input_size)
+        loader = torch.utils.data.DataLoader(
+            self.train_loader.dataset,
+            batch_size=self.args.batch_size,
+            # the input size is explicit, the dataset may keep the last multiscale one
+            sampler=[(False, i, input_size) for i in range(shape[0])],
+            num_workers=self.exp.data_num_workers,
+        )
+        # written aside and moved in place once complete
+        tmp_file = "{}.{}.tmp".format(cache_file, os.getpid())
+        outputs = np.lib.format.open_memmap(tmp_file, mode="w+", dtype=np.float16, shape=shape)
+        row = 0
+        for inps, _, _, _ in loader:
+            inps = inps.to(self.device, self.data_type)
+            with torch.no_grad(), torch.cuda.amp.autocast(enabled=self.amp_training):
+                self.teacher(inps)
+            outputs[row:row + len(inps)] = head_predictions(self.teacher_store).cpu().numpy()
+            row += len(inps)
+        outputs.flush()
+        del outputs
+        os.replace(tmp_file, cache_file)
+
+    def compute_loss(self, inps, targets):
+        outputs = super().compute_loss(inps, targets)
+        preds = head_predictions(self.student_store)
+
+        if self.teacher_cache is not None:
+            rows = self.prefetcher.img_ids.view(-1).numpy()
+            teacher_preds = torch.from_numpy(self.teacher_cache[rows]).to(preds)
+            assert teacher_preds.shape == preds.shape, \
+                "cached teacher outputs are {}, expect {}".format(teacher_preds.shape, preds.shape)
+            feat_loss = preds.new_zeros(())
+        else:
+            with torch.no_grad():
+                self.teacher(inps)
+            teacher_preds = head_predictions(self.teacher_store)
+            feat_loss = sum(
+                F.mse_loss(feat, teacher_feat)
+                for feat, teacher_feat in zip(
+                    self.adapters(self.student_store["fpn"]), self.teacher_store["fpn"]
+                )
+            )
+
+        # soft labels, cls only matters where the teacher sees an object
+        soft_targets = teacher_preds.sigmoid()
+        obj_loss = F.binary_cross_entropy_with_logits(preds[..., :1], soft_targets[..., :1])
+        cls_loss = F.binary_cross_entropy_with_logits(
+            preds[..., 1:], soft_targets[..., 1:], reduction="none"
+        ).mean(dim=-1, keepdim=True)
+        obj_weight = soft_targets[..., :1]
+        cls_loss = (cls_loss * obj_weight).sum() / obj_weight.sum().clamp(min=1e-6)
+
+        outputs["distill_feat_loss"] = self.exp.distill_feat_weight * feat_loss
+        outputs["distill_soft_loss"] = self.exp.distill_soft_weight * (obj_loss + cls_loss)
+        outputs["total_loss"] = (
+            outputs["total_loss"] + outputs["distill_feat_loss"] + outputs["distill_soft_loss"]
+        )
+        return outputs
@@ -3,6 +3,7 @@
 
 import datetime
 import os
+import random
 import time
 from loguru import logger
 
@@ -10,7 +11,7 @@ import torch
 from torch.nn.parallel import DistributedDataParallel as DDP
 from torch.utils.tensorboard import SummaryWriter
 
-from yolox.data import DataPrefetcher
+from yolox.data import AsyncPrefetcher, SampleCache
 from yolox.exp import Exp
 from yolox.utils import (
     MeterBuffer,
@@ -30,7 +31,8 @@ from yolox.utils import (
     occupy_mem,
     save_checkpoint,
     setup_logger,
-    synchronize
+    synchronize,
+    wait_for_the_master
 )
 
 
@@ -48,8 +50,10 @@ class Trainer:
         self.is_distributed = get_world_size() > 1
         self.rank = get_rank()
         self.local_rank = get_local_rank()
-        self.device = "cuda:{}".format(self.local_rank)
+        self.device = "cuda:{}".format(self.local_rank) if torch.cuda.is_available() else "cpu"
         self.use_model_ema = exp.ema
+        # (state, updates) of the EMA of a resumed checkpoint
+        self.resume_ema = None
         self.save_history_ckpt = exp.save_history_ckpt
 
         # data/dataloader related attr
@@ -97,14 +101,15 @@ class Trainer:
         iter_start_time = time.time()
 
         inps, targets = self.prefetcher.next()
-        inps = inps.to(self.data_type)
-        targets = targets.to(self.data_type)
-        targets.requires_grad = False
-        inps, targets = self.exp.preprocess(inps, targets, self.input_size)
+        if self.exp.multiscale_in_worker:
+            # only for logging, batches already come at their training size
+            self.input_size = tuple(inps.shape[2:])
+        if not self.exp.prefetch_preprocess:
+            inps, targets = self.preprocess(inps, targets)
         data_end_time = time.time()
 
         with torch.cuda.amp.autocast(enabled=self.amp_training):
-            outputs = self.model(inps, targets)
+            outputs = self.compute_loss(inps, targets)
 
         loss = outputs["total_loss"]
 
@@ -124,16 +129,30 @@ class Trainer:
         self.meter.update(
             iter_time=iter_end_time - iter_start_time,
             data_time=data_end_time - iter_start_time,
+            prefetch_wait_time=self.prefetcher.wait_time,
             lr=lr,
             **outputs,
         )
 
+    def compute_loss(self, inps, targets):
+        """Return the dict of losses of a batch, "total_loss" is the one optimized."""
+        return self.model(inps, targets)
+
+    def preprocess(self, inps, targets):
+        inps = inps.to(self.data_type)
+        targets = targets.to(self.data_type)
+        targets.requires_grad = False
+        if self.exp.multiscale_in_worker:
+            return inps, targets
+        return self.exp.preprocess(inps, targets, self.input_size)
+
     def before_train(self):
         logger.info("args: {}".format(self.args))
         logger.info("exp value:\n{}".format(self.exp))
 
         # model related init
-        torch.cuda.set_device(self.local_rank)
+        if torch.cuda.is_available():
+            torch.cuda.set_device(self.local_rank)
         model = self.exp.get_model()
         logger.info(
             "Model Summary: {}".format(get_model_info(model, self.exp.test_size))
@@ -154,8 +173,25 @@ class Trainer:
             no_aug=self.no_aug,
             cache_img=self.args.cache,
         )
+        if self.start_batch is None:
+            # checkpoints of older versions only have the epoch
+            self.start_batch = self.start_epoch * len(self.train_loader)
+        # continue the stream of batches where the checkpoint left it
+        self.train_loader.batch_sampler.set_start(self.start_batch)
+        if self.exp.no_aug_cache:
+            # set before the workers start, it is built at the start of the no aug epochs
+            self.train_loader.dataset.sample_cache = SampleCache(
+                os.path.join(self.file_name, "no_aug_cache"),
+                self.exp.input_size,
+                max_labels=self.train_loader.dataset.preproc.max_labels,
+            )
         logger.info("init prefetcher, this might take one minute or less...")
-        self.prefetcher = DataPrefetcher(self.train_loader)
+        self.prefetcher = AsyncPrefetcher(
+            self.train_loader,
+            self.device,
+            depth=self.exp.prefetch_depth,
+            preprocess=self.preprocess if self.exp.prefetch_preprocess else None,
+        )
         # max_iter means iters per epoch
         self.max_iter = len(self.train_loader)
 
@@ -166,11 +202,16 @@ class Trainer:
             occupy_mem(self.local_rank)
 
         if self.is_distributed:
-            model = DDP(model, device_ids=[self.local_rank], broadcast_buffers=False)
+            device_ids = [self.local_rank] if torch.cuda.is_available() else None
+            model = DDP(model, device_ids=device_ids, broadcast_buffers=False)
 
         if self.use_model_ema:
             self.ema_model = ModelEMA(model, 0.9998)
-            self.ema_model.updates = self.max_iter * self.start_epoch
+            if self.resume_ema is not None:
+                ema_state, self.ema_model.updates = self.resume_ema
+                self.ema_model.ema.load_state_dict(ema_state)
+            else:
+                self.ema_model.updates = self.max_iter * self.start_epoch
 
         self.model = model
 
@@ -218,6 +259,10 @@ class Trainer:
         logger.info("---> start train epoch{}".format(self.epoch + 1))
 
         if self.epoch + 1 == self.max_epoch - self.exp.no_aug_epochs or self.no_aug:
+            if self.exp.no_aug_cache:
+                # before closing mosaic, so that every no aug sample is read from the cache
+                with wait_for_the_master():
+                    self.train_loader.dataset.build_sample_cache()
             logger.info("--->No mosaic aug now!")
             self.train_loader.close_mosaic()
             logger.info("--->Add additional L1 loss now!")
@@ -299,7 +344,7 @@ class Trainer:
             self.meter.clear_meters()
 
         # random resizing
-        if (self.progress_in_iter + 1) % 10 == 0:
+        if not self.exp.multiscale_in_worker and (self.progress_in_iter + 1) % 10 == 0:
             self.input_size = self.exp.random_resize(
                 self.train_loader, self.epoch, self.rank, self.is_distributed
             )
@@ -317,9 +362,16 @@ class Trainer:
                 ckpt_file = self.args.ckpt
 
             ckpt = torch.load(ckpt_file, map_location=self.device)
-            # resume the model/optimizer state dict
-            model.load_state_dict(ckpt["model"])
+            # resume the model/optimizer state dict, "model" holds the EMA weights when EMA is
+            # used and older checkpoints have no raw weights, the EMA is then restarted from them
+            if "train_model" in ckpt:
+                model.load_state_dict(ckpt["train_model"])
+                self.resume_ema = (ckpt["model"], ckpt["ema_updates"])
+            else:
+                model.load_state_dict(ckpt["model"])
             self.optimizer.load_state_dict(ckpt["optimizer"])
+            if "scaler" in ckpt:
+                self.scaler.load_state_dict(ckpt["scaler"])
             self.best_ap = ckpt.pop("best_ap", 0)
             # resume the training states variables
             start_epoch = (
@@ -328,6 +380,10 @@ class Trainer:
                 else ckpt["start_epoch"]
             )
             self.start_epoch = start_epoch
+            self.start_batch = ckpt.get("train_batches") if self.args.start_epoch is None else None
+            if "rng_state" in ckpt:
+                random.setstate(ckpt["rng_state"]["python"])
+                torch.set_rng_state(ckpt["rng_state"]["torch"].cpu())
             logger.info(
                 "loaded checkpoint '{}' (epoch {})".format(
                     self.args.resume, self.start_epoch
@@ -340,6 +396,7 @@ class Trainer:
                 ckpt = torch.load(ckpt_file, map_location=self.device)["model"]
                 model = load_ckpt(model, ckpt)
             self.start_epoch = 0
+            self.start_batch = 0
 
         return model
 
@@ -402,11 +459,25 @@ class Trainer:
             logger.info("Save weights to {}".format(self.file_name))
             ckpt_state = {
                 "start_epoch": self.epoch + 1,
+                # weights to evaluate and deploy, the EMA ones when EMA is used
                 "model": save_model.state_dict(),
                 "optimizer": self.optimizer.state_dict(),
+                "scaler": self.scaler.state_dict(),
                 "best_ap": self.best_ap,
                 "curr_ap": ap,
+                # batches of the epochs before `start_epoch` and state of the main process
+                # random draws (e.g. multiscale sizes), to resume exactly where it stopped
+                "train_batches": (self.epoch + 1) * self.max_iter,
+                "rng_state": {
+                    "python": random.getstate(),
+                    "torch": torch.get_rng_state(),
+                },
             }
+            if self.use_model_ema:
+                # raw weights and EMA progress, so that a resumed run continues both
+                model = self.model.module if is_parallel(self.model) else self.model
+                ckpt_state["train_model"] = model.state_dict()
+                ckpt_state["ema_updates"] = self.ema_model.updates
             save_checkpoint(
                 ckpt_state,
                 update_best_ckpt,
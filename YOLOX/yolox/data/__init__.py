@@ -2,8 +2,20 @@
 # -*- coding:utf-8 -*-
 # Copyright (c) Megvii, Inc. and its affiliates.
 
-from .data_augment import TrainTransform, ValTransform
-from .data_prefetcher import DataPrefetcher
-from .dataloading import DataLoader, get_yolox_datadir, worker_init_reset_seed
-from .datasets import *
-from .samplers import InfiniteSampler, YoloBatchSampler
+from yolox.utils.lazy_import import lazy_attach
+
+__getattr__, __dir__, __all__ = lazy_attach(__name__, {
+    "batch_pool": ["BatchPool"],
+    "data_augment": ["TrainTransform", "ValTransform"],
+    "data_prefetcher": ["AsyncPrefetcher", "DataPrefetcher"],
+    "dataloading": [
+        "DataLoader", "get_yolox_datadir", "trim_labels_collate", "worker_init_reset_seed",
+    ],
+    "datasets": [
+        "COCODataset", "COCO_CLASSES", "CacheDataset", "ConcatDataset", "Dataset",
+        "MixConcatDataset", "MosaicDetection", "SampleCache", "VOCDetection",
+    ],
+    "samplers": [
+        "GroupedBatchSampler", "InfiniteSampler", "RectBatchSampler", "YoloBatchSampler",
+    ],
+})
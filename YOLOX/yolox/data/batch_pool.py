@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import multiprocessing
+import queue
+
+import numpy as np
+
+import torch
+from torch.utils.data.dataloader import default_collate
+
+__all__ = ["BatchPool"]
+
+
+class BatchPool:
+    """
+    Fixed set of batch buffers in shared memory, page-locked when CUDA is available, that
+    dataloader workers collate their samples straight into. Use it as the `collate_fn` of
+    :class:`yolox.data.DataLoader` with `pin_memory=False`.
+
+    With the default collate, each batch is stacked into a new shared memory tensor by the
+    worker, mapped by the main process and copied again into pinned memory by the pin
+    memory thread. With the pool, a worker takes a free slot, copies its samples into it
+    and only sends the slot index through the worker queue. The loader yields views of the
+    slot, which the host to device copy reads directly. A slot is handed back to the
+    workers by :meth:`release` once the prefetcher is done with its batch.
+
+    Samples are (img, padded_labels, img_info, img_id) as produced by
+    :class:`TrainTransform`. Batches are contiguous views of the beginning of a slot, so
+    that any input size up to `img_size` fits, e.g. for multiscale resizing in the workers.
+
+    Every loader iterator gets a new generation of the slots, with its own queue of free
+    slots: the workers of a previous iterator, which may still be waiting for a slot or be
+    terminated while taking one, and the slots its prefetcher still releases, do not touch
+    the slots of the new iterator. Only the latest iterator of the loader can be used, and
+    the loader must not have persistent workers. There must be enough slots for every batch
+    in flight, otherwise workers wait on each other: `num_workers * prefetch_factor`
+    batches in the dataloader, plus those of the prefetcher (its `depth + 2`).
+
+    Args:
+        num_slots (int): number of batch buffers.
+        batch_size (int): max batch size.
+        img_size (tuple): max (height, width) of the images.
+        max_labels (int): max number of labels of a sample.
+        dtype (torch.dtype): dtype of the images.
+        trim_labels (bool): pad labels only up to the largest number of labels in the
+            batch, like :func:`trim_labels_collate`.
+        pin (bool, optional): page-lock the buffers. Defaults to whether CUDA is available.
+    """
+
+    # seconds a worker waits for a free slot before checking that its generation is alive
+    wait_interval = 1.0
+
+    def __init__(
+        self, num_slots, batch_size, img_size, max_labels=120, dtype=torch.float32,
+        trim_labels=False, pin=None,
+    ):
+        self.num_slots = num_slots
+        self.batch_size = batch_size
+        self.img_size = tuple(img_size)
+        self.max_labels = max_labels
+        self.trim_labels = trim_labels
+        # flat, so that a batch smaller than the buffer is still a contiguous view
+        self.images = torch.empty(
+            (num_slots, batch_size * 3 * img_size[0] * img_size[1]), dtype=dtype
+        ).share_memory_()
+        self.labels = torch.zeros(
+            (num_slots, batch_size * max_labels * 5), dtype=torch.float32
+        ).share_memory_()
+
+        self.pinned = torch.cuda.is_available() if pin is None else pin
+        if self.pinned:
+            # pinned in place, a pin_memory() copy would not be shared with the workers
+            for buffer in (self.images, self.labels):
+                cudart = torch.cuda.cudart()
+                ret = cudart.cudaHostRegister(
+                    buffer.data_ptr(), buffer.numel() * buffer.element_size(), 0
+                )
+                assert int(ret) == 0, "cudaHostRegister failed with error {}".format(ret)
+
+        self.generation = 0
+        self.free_slots = None
+        self.closed = None
+        self.reset()
+
+    def reset(self):
+        """
+        Start a new generation with all the slots free, when a new loader iterator starts.
+        The previous generation is closed, so that its workers stop waiting for slots.
+        """
+        if self.closed is not None:
+            self.closed.set()
+        self.generation += 1
+        self.free_slots = multiprocessing.Queue()
+        self.closed = multiprocessing.Event()
+        for slot in range(self.num_slots):
+            self.free_slots.put(slot)
+
+    def close(self, generation):
+        """Close `generation` if it is the current one, e.g. when its prefetcher is closed."""
+        if generation == self.generation:
+            self.closed.set()
+
+    def _take_slot(self):
+        while True:
+            try:
+                return self.free_slots.get(timeout=self.wait_interval)
+            except queue.Empty:
+                if self.closed.is_set():
+                    raise RuntimeError(
+                        "batch pool generation {} is closed".format(self.generation)
+                    )
+
+    def __call__(self, batch):
+        """Collate `batch` into a free slot, blocking until there is one. Runs in the workers."""
+        img_shape = tuple(batch[0][0].shape)
+        assert len(batch) <= self.batch_size, "batch of {} does not fit a slot of {}".format(
+            len(batch), self.batch_size
+        )
+        assert img_shape[0] == 3 and img_shape[1] <= self.img_size[0] \
+            and img_shape[2] <= self.img_size[1], \
+            "image of shape {} does not fit a slot of size {}".format(img_shape, self.img_size)
+        if self.trim_labels:
+            num_labels = max(int((item[1].sum(axis=1) > 0).sum()) for item in batch)
+            num_labels = max(num_labels, 1)
+        else:
+            num_labels = batch[0][1].shape[0]
+
+        slot = self._take_slot()
+        images, labels = self._views(slot, len(batch), img_shape, num_labels)
+        images, labels = images.numpy(), labels.numpy()
+        for i, item in enumerate(batch):
+            images[i] = item[0]
+            labels[i] = item[1][:num_labels]
+        # only these few bytes go through the worker queue
+        return (slot, len(batch), img_shape, num_labels, *default_collate(
+            [item[2:] for item in batch]
+        ))
+
+    def _views(self, slot, batch_size, img_shape, num_labels):
+        images = self.images[slot, :batch_size * int(np.prod(img_shape))]
+        labels = self.labels[slot, :batch_size * num_labels * 5]
+        return (
+            images.view(batch_size, *img_shape),
+            labels.view(batch_size, num_labels, 5),
+        )
+
+    def unpack(self, loader_iter):
+        """Turn the slots yielded by a loader iterator into (imgs, labels, img_info, img_ids)."""
+        for slot, batch_size, img_shape, num_labels, *others in loader_iter:
+            yield (*self._views(slot, batch_size, img_shape, num_labels), *others)
+
+    def slot_of(self, images):
+        """Slot of a batch of images yielded by :meth:`unpack`."""
+        offset = images.data_ptr() - self.images.data_ptr()
+        return offset // (self.images.stride(0) * self.images.element_size())
+
+    def release(self, slot, event=None, generation=None):
+        """
+        Hand `slot` back to the workers, once `event` (e.g. recorded after the host to
+        device copy of its batch) completed.
+
+        Args:
+            slot (int): slot of the batch.
+            event (torch.cuda.Event, optional): event to wait for.
+            generation (int, optional): generation the batch was collated in, the slot is
+                dropped if it is not the current one. Defaults to the current one.
+        """
+        if event is not None:
+            event.synchronize()
+        if generation is None or generation == self.generation:
+            self.free_slots.put(slot)
@@ -10,32 +10,42 @@ http://arxiv.org/abs/1512.02325
 """
 
 import math
-import random
 
 import cv2
 import numpy as np
 
-from yolox.utils import xyxy2cxcywh
+from yolox.utils import global_rng, roi_input_size, xyxy_to_cxcywh
 
 
-def augment_hsv(img, hgain=5, sgain=30, vgain=30):
-    hsv_augs = np.random.uniform(-1, 1, 3) * [hgain, sgain, vgain]  # random gains
-    hsv_augs *= np.random.randint(0, 2, 3)  # random selection of h, s, v
+_LUT_RANGE = np.arange(256, dtype=np.int16)
+
+
+def augment_hsv(img, hgain=5, sgain=30, vgain=30, rng=None):
+    rng = global_rng() if rng is None else rng
+    hsv_augs = rng.uniform(-1, 1, 3) * [hgain, sgain, vgain]  # random gains
+    hsv_augs *= rng.integers(0, 2, 3)  # random selection of h, s, v
     hsv_augs = hsv_augs.astype(np.int16)
-    img_hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV).astype(np.int16)
+    if not hsv_augs.any():
+        return
 
-    img_hsv[..., 0] = (img_hsv[..., 0] + hsv_augs[0]) % 180
-    img_hsv[..., 1] = np.clip(img_hsv[..., 1] + hsv_augs[1], 0, 255)
-    img_hsv[..., 2] = np.clip(img_hsv[..., 2] + hsv_augs[2], 0, 255)
+    # the shifts of the 256 possible values of each channel, applied in a single uint8
+    # pass instead of int16 copies of the whole image
+    lut = np.empty((1, 256, 3), dtype=np.uint8)
+    lut[0, :, 0] = (_LUT_RANGE + hsv_augs[0]) % 180
+    lut[0, :, 1] = np.clip(_LUT_RANGE + hsv_augs[1], 0, 255)
+    lut[0, :, 2] = np.clip(_LUT_RANGE + hsv_augs[2], 0, 255)
 
-    cv2.cvtColor(img_hsv.astype(img.dtype), cv2.COLOR_HSV2BGR, dst=img)  # no return needed
+    img_hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    cv2.LUT(img_hsv, lut, dst=img_hsv)
+    cv2.cvtColor(img_hsv, cv2.COLOR_HSV2BGR, dst=img)  # no return needed
 
 
-def get_aug_params(value, center=0):
+def get_aug_params(value, center=0, rng=None):
+    rng = global_rng() if rng is None else rng
     if isinstance(value, float):
-        return random.uniform(center - value, center + value)
+        return rng.uniform(center - value, center + value)
     elif len(value) == 2:
-        return random.uniform(value[0], value[1])
+        return rng.uniform(value[0], value[1])
     else:
         raise ValueError(
             "Affine params should be either a sequence containing two values\
@@ -49,12 +59,14 @@ def get_affine_matrix(
     translate=0.1,
     scales=0.1,
     shear=10,
+    rng=None,
 ):
     twidth, theight = target_size
+    rng = global_rng() if rng is None else rng
 
     # Rotation and Scale
-    angle = get_aug_params(degrees)
-    scale = get_aug_params(scales, center=1.0)
+    angle = get_aug_params(degrees, rng=rng)
+    scale = get_aug_params(scales, center=1.0, rng=rng)
 
     if scale <= 0.0:
         raise ValueError("Argument scale should be positive")
@@ -63,15 +75,15 @@ def get_affine_matrix(
 
     M = np.ones([2, 3])
     # Shear
-    shear_x = math.tan(get_aug_params(shear) * math.pi / 180)
-    shear_y = math.tan(get_aug_params(shear) * math.pi / 180)
+    shear_x = math.tan(get_aug_params(shear, rng=rng) * math.pi / 180)
+    shear_y = math.tan(get_aug_params(shear, rng=rng) * math.pi / 180)
 
     M[0] = R[0] + shear_y * R[1]
     M[1] = R[1] + shear_x * R[0]
 
     # Translation
-    translation_x = get_aug_params(translate) * twidth  # x translation (pixels)
-    translation_y = get_aug_params(translate) * theight  # y translation (pixels)
+    translation_x = get_aug_params(translate, rng=rng) * twidth  # x translation (pixels)
+    translation_y = get_aug_params(translate, rng=rng) * theight  # y translation (pixels)
 
     M[0, 2] = translation_x
     M[1, 2] = translation_y
@@ -119,8 +131,9 @@ def random_affine(
     translate=0.1,
     scales=0.1,
     shear=10,
+    rng=None,
 ):
-    M, scale = get_affine_matrix(target_size, degrees, translate, scales, shear)
+    M, scale = get_affine_matrix(target_size, degrees, translate, scales, shear, rng=rng)
 
     img = cv2.warpAffine(img, M, dsize=target_size, borderValue=(114, 114, 114))
 
@@ -131,19 +144,15 @@ def random_affine(
     return img, targets
 
 
-def _mirror(image, boxes, prob=0.5):
-    _, width, _ = image.shape
-    if random.random() < prob:
-        image = image[:, ::-1]
-        boxes[:, 0::2] = width - boxes[:, 2::-2]
-    return image, boxes
+def preproc(img, input_size, swap=(2, 0, 1), dtype=np.float32, flip=False):
+    if len(img.shape) == 3 and tuple(swap) == (2, 0, 1):
+        padded_img, ratios = preproc_batch([img], input_size, dtype=dtype, flips=[flip])
+        return padded_img[0], ratios[0]
 
-
-def preproc(img, input_size, swap=(2, 0, 1)):
     if len(img.shape) == 3:
-        padded_img = np.ones((input_size[0], input_size[1], 3), dtype=np.uint8) * 114
+        padded_img = np.full((input_size[0], input_size[1], 3), 114, dtype=np.uint8)
     else:
-        padded_img = np.ones(input_size, dtype=np.uint8) * 114
+        padded_img = np.full(input_size, 114, dtype=np.uint8)
 
     r = min(input_size[0] / img.shape[0], input_size[1] / img.shape[1])
     resized_img = cv2.resize(
@@ -151,62 +160,125 @@ def preproc(img, input_size, swap=(2, 0, 1)):
         (int(img.shape[1] * r), int(img.shape[0] * r)),
         interpolation=cv2.INTER_LINEAR,
     ).astype(np.uint8)
+    if flip:
+        cv2.flip(resized_img, 1, dst=resized_img)
     padded_img[: int(img.shape[0] * r), : int(img.shape[1] * r)] = resized_img
 
     padded_img = padded_img.transpose(swap)
-    padded_img = np.ascontiguousarray(padded_img, dtype=np.float32)
+    padded_img = np.ascontiguousarray(padded_img, dtype=dtype)
     return padded_img, r
 
 
+def preproc_batch(imgs, input_size, out=None, fill=114, dtype=np.float32, flips=None):
+    """
+    Letterbox a list of BGR images into one `[B, 3, H, W]` array.
+
+    Every image is resized with the same ratio rule as :func:`preproc` and its
+    channels are split straight into the CHW slot of the output, so the padded
+    HWC copy and the transpose of :func:`preproc` are never materialized.
+    Only the padding area is written with `fill`.
+
+    Args:
+        imgs (list of np.ndarray): HWC uint8 images, they may differ in shape.
+        input_size (tuple): (height, width) of the letterboxed images.
+        out (np.ndarray, optional): buffer of shape `[N, 3, H, W]` with `N >= len(imgs)`
+            to write into. It is returned as is (sliced to `len(imgs)`) so callers could
+            keep it and pass it again to avoid reallocation. Defaults to None.
+        fill (int): value of the padding area. Default value: 114.
+        dtype (np.dtype): dtype of the output if `out` is not given. Default value: np.float32.
+        flips (list of bool, optional): mirror the images horizontally. The resized
+            image is flipped in place, which matches resizing a flipped view of the image
+            up to the rounding of the interpolation weights (one level at a few pixels),
+            without the strided copy of the source it takes.
+
+    Returns:
+        np.ndarray: letterboxed images of shape `[len(imgs), 3, H, W]`.
+        list: resize ratio of every image.
+    """
+    batch_size = len(imgs)
+    shape = (3, input_size[0], input_size[1])
+    if out is None or out.shape[0] < batch_size or out.shape[1:] != shape:
+        out = np.empty((batch_size, *shape), dtype=dtype)
+    out = out[:batch_size]
+    # uint8 planes are split in place, other dtypes go through a uint8 scratch
+    # so that the cast is a single contiguous pass.
+    scratch = None if out.dtype == np.uint8 else np.empty(shape, dtype=np.uint8)
+
+    ratios = []
+    for i, img in enumerate(imgs):
+        r = min(input_size[0] / img.shape[0], input_size[1] / img.shape[1])
+        h, w = int(img.shape[0] * r), int(img.shape[1] * r)
+        resized_img = cv2.resize(img, (w, h), interpolation=cv2.INTER_LINEAR)
+        if flips is not None and flips[i]:
+            cv2.flip(resized_img, 1, dst=resized_img)
+
+        dst = out[i] if scratch is None else scratch
+        cv2.split(resized_img, [dst[c, :h, :w] for c in range(3)])
+        dst[:, h:, :] = fill
+        dst[:, :h, w:] = fill
+        if scratch is not None:
+            np.copyto(out[i], scratch, casting="unsafe")
+        ratios.append(r)
+
+    return out, ratios
+
+
+def rect_input_size(img_shape, test_size, stride=32):
+    """
+    Smallest `stride` aligned (height, width) holding an image of shape `img_shape`
+    resized with the ratio it is letterboxed into `test_size` with. Letterboxing the
+    image to it instead of `test_size` leaves out most of the square padding, and keeps
+    the ratio, so boxes are mapped back to the image the same way.
+    """
+    return roi_input_size(img_shape[:2], img_shape[:2], test_size, stride)
+
+
 class TrainTransform:
-    def __init__(self, max_labels=50, flip_prob=0.5, hsv_prob=1.0):
+    def __init__(self, max_labels=50, flip_prob=0.5, hsv_prob=1.0, dtype=np.float32):
+        """
+        Args:
+            max_labels (int): number of rows the labels are padded to.
+            flip_prob (float): probability of horizontal flip.
+            hsv_prob (float): probability of hsv augmentation.
+            dtype (np.dtype): dtype of the output image. Use uint8 to move 4x less data
+                through the dataloader, the image is cast to float on the device.
+                Default value: np.float32.
+        """
         self.max_labels = max_labels
         self.flip_prob = flip_prob
         self.hsv_prob = hsv_prob
-
-    def __call__(self, image, targets, input_dim):
-        boxes = targets[:, :4].copy()
-        labels = targets[:, 4].copy()
-        if len(boxes) == 0:
-            targets = np.zeros((self.max_labels, 5), dtype=np.float32)
-            image, r_o = preproc(image, input_dim)
-            return image, targets
-
-        image_o = image.copy()
-        targets_o = targets.copy()
-        height_o, width_o, _ = image_o.shape
-        boxes_o = targets_o[:, :4]
-        labels_o = targets_o[:, 4]
-        # bbox_o: [xyxy] to [c_x,c_y,w,h]
-        boxes_o = xyxy2cxcywh(boxes_o)
-
-        if random.random() < self.hsv_prob:
-            augment_hsv(image)
-        image_t, boxes = _mirror(image, boxes, self.flip_prob)
-        height, width, _ = image_t.shape
-        image_t, r_ = preproc(image_t, input_dim)
-        # boxes [xyxy] 2 [cx,cy,w,h]
-        boxes = xyxy2cxcywh(boxes)
-        boxes *= r_
-
+        self.dtype = dtype
+
+    def __call__(self, image, targets, input_dim, rng=None):
+        """
+        Args:
+            rng (np.random.Generator, optional): generator of the random augmentations,
+                e.g. the counter-based one of the sample. Defaults to :func:`global_rng`.
+        """
+        rng = global_rng() if rng is None else rng
+        height, width = image.shape[:2]
+        r = min(input_dim[0] / height, input_dim[1] / width)
+        # boxes [xyxy] 2 [cx,cy,w,h], at the scale of the letterboxed image
+        boxes = targets[:, :4] * r
+        xyxy_to_cxcywh(boxes, out=boxes)
+        labels = targets[:, 4]
+
+        # samples without a box left once resized are letterboxed without augmentation
+        flip = False
         mask_b = np.minimum(boxes[:, 2], boxes[:, 3]) > 1
-        boxes_t = boxes[mask_b]
-        labels_t = labels[mask_b]
-
-        if len(boxes_t) == 0:
-            image_t, r_o = preproc(image_o, input_dim)
-            boxes_o *= r_o
-            boxes_t = boxes_o
-            labels_t = labels_o
-
-        labels_t = np.expand_dims(labels_t, 1)
-
-        targets_t = np.hstack((labels_t, boxes_t))
-        padded_labels = np.zeros((self.max_labels, 5))
-        padded_labels[range(len(targets_t))[: self.max_labels]] = targets_t[
-            : self.max_labels
-        ]
-        padded_labels = np.ascontiguousarray(padded_labels, dtype=np.float32)
+        if mask_b.any():
+            if rng.random() < self.hsv_prob:
+                augment_hsv(image, rng=rng)
+            flip = rng.random() < self.flip_prob
+            if flip:
+                boxes[:, 0] = width * r - boxes[:, 0]
+            boxes, labels = boxes[mask_b], labels[mask_b]
+        image_t, _ = preproc(image, input_dim, dtype=self.dtype, flip=flip)
+
+        num_labels = min(len(boxes), self.max_labels)
+        padded_labels = np.zeros((self.max_labels, 5), dtype=np.float32)
+        padded_labels[:num_labels, 0] = labels[:num_labels]
+        padded_labels[:num_labels, 1:] = boxes[:num_labels]
         return image_t, padded_labels
 
 
@@ -222,20 +294,25 @@ class ValTransform:
         rgb_means ((int,int,int)): average RGB of the dataset
             (104,117,123)
         swap ((int,int,int)): final order of channels
+        legacy (bool): apply the RGB mean/std normalization of older versions.
+        dtype (np.dtype): dtype of the output image. With uint8, the legacy
+            normalization can't be applied here and is left to `InputNorm`
+            on the model input.
 
     Returns:
         transform (transform) : callable transform to be applied to test/val
         data
     """
 
-    def __init__(self, swap=(2, 0, 1), legacy=False):
+    def __init__(self, swap=(2, 0, 1), legacy=False, dtype=np.float32):
         self.swap = swap
         self.legacy = legacy
+        self.dtype = dtype
 
     # assume input is cv2 img for now
     def __call__(self, img, res, input_size):
-        img, _ = preproc(img, input_size, self.swap)
-        if self.legacy:
+        img, _ = preproc(img, input_size, self.swap, dtype=self.dtype)
+        if self.legacy and np.issubdtype(self.dtype, np.floating):
             img = img[::-1, :, :].copy()
             img /= 255.0
             img -= np.array([0.485, 0.456, 0.406]).reshape(3, 1, 1)
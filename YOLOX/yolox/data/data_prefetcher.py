@@ -2,6 +2,10 @@
 # -*- coding:utf-8 -*-
 # Copyright (c) Megvii, Inc. and its affiliates.
 
+import queue
+import threading
+import time
+
 import torch
 
 
@@ -14,10 +18,14 @@ class DataPrefetcher:
     """
 
     def __init__(self, loader):
+        self.batch_pool = getattr(loader, "batch_pool", None)
         self.loader = iter(loader)
+        # slots of this iterator, released slots of an older one are dropped by the pool
+        self.generation = getattr(self.batch_pool, "generation", None)
         self.stream = torch.cuda.Stream()
         self.input_cuda = self._input_cuda_for_image
         self.record_stream = DataPrefetcher._record_stream_for_image
+        self.next_slot = None
         self.preload()
 
     def preload(self):
@@ -28,14 +36,23 @@ class DataPrefetcher:
             self.next_target = None
             return
 
+        if self.batch_pool is not None:
+            self.next_slot = self.batch_pool.slot_of(self.next_input)
         with torch.cuda.stream(self.stream):
             self.input_cuda()
             self.next_target = self.next_target.cuda(non_blocking=True)
+            if self.next_slot is not None:
+                self.next_copied = torch.cuda.Event()
+                self.next_copied.record(self.stream)
 
     def next(self):
         torch.cuda.current_stream().wait_stream(self.stream)
         input = self.next_input
         target = self.next_target
+        if self.next_slot is not None:
+            # the batch is on the device, its slot can be collated into again
+            self.batch_pool.release(self.next_slot, self.next_copied, self.generation)
+            self.next_slot = None
         if input is not None:
             self.record_stream(input)
         if target is not None:
@@ -49,3 +66,126 @@ class DataPrefetcher:
     @staticmethod
     def _record_stream_for_image(input):
         input.record_stream(torch.cuda.current_stream())
+
+
+class AsyncPrefetcher:
+    """
+    Device-agnostic prefetcher with a lookahead of several batches.
+
+    A background thread pulls batches from the loader, copies them to `device` and
+    optionally runs `preprocess` on them, so that host to device copies and batch level
+    preprocessing (e.g. the multiscale `interpolate` of `Exp.preprocess`) overlap with
+    the training step. On CUDA the work is issued on a side stream and synchronized
+    through events, on CPU the thread alone provides the overlap.
+
+    When the loader collates into a :class:`BatchPool`, the slot of a batch is released
+    on the following `next`, when the training step is done with the batch, or on `close`.
+
+    Args:
+        loader (iterable): dataloader yielding (inputs, targets, img_info, img_id).
+        device (str or torch.device): device batches are moved to.
+        depth (int): max number of ready batches waiting in the queue. Default value: 2.
+        preprocess (callable, optional): function called as `preprocess(inputs, targets)`
+            on the device batch, returning new (inputs, targets). Defaults to None.
+
+    Attributes:
+        wait_time (float): seconds the consumer blocked on the queue in the last `next`.
+        img_ids (Tensor): image ids of the batch returned by the last `next`, on the cpu.
+    """
+
+    def __init__(self, loader, device, depth=2, preprocess=None):
+        assert depth >= 1, "depth of prefetcher should be at least 1"
+        self.batch_pool = getattr(loader, "batch_pool", None)
+        self.loader = iter(loader)
+        self.generation = getattr(self.batch_pool, "generation", None)
+        self.device = torch.device(device)
+        self.preprocess = preprocess
+        self.wait_time = 0.0
+        self.img_ids = None
+        self.held_slot = None
+        self.closed = False
+        self.queue = queue.Queue(maxsize=depth)
+        self.stream = torch.cuda.Stream(self.device) if self.device.type == "cuda" else None
+        self.thread = threading.Thread(target=self._produce, daemon=True)
+        self.thread.start()
+
+    def _produce(self):
+        if self.stream is not None:
+            torch.cuda.set_device(self.device)
+        while not self.closed:
+            try:
+                inputs, targets, _, img_ids = next(self.loader)
+                slot = None if self.batch_pool is None else self.batch_pool.slot_of(inputs)
+                event = None
+                if self.stream is not None:
+                    with torch.cuda.stream(self.stream):
+                        inputs, targets = self._to_device(inputs, targets)
+                        event = torch.cuda.Event()
+                        event.record(self.stream)
+                else:
+                    inputs, targets = self._to_device(inputs, targets)
+                self.queue.put((inputs, targets, img_ids, event, slot))
+            except StopIteration:
+                self.queue.put(None)
+                return
+            except Exception as e:
+                # re-raised in the consumer thread
+                self.queue.put(e)
+                return
+
+    def _to_device(self, inputs, targets):
+        inputs = inputs.to(self.device, non_blocking=True)
+        targets = targets.to(self.device, non_blocking=True)
+        if self.preprocess is not None:
+            inputs, targets = self.preprocess(inputs, targets)
+        return inputs, targets
+
+    def next(self):
+        self._release_held_slot()
+
+        start = time.time()
+        item = self.queue.get()
+        self.wait_time = time.time() - start
+
+        if item is None:
+            return None, None
+        if isinstance(item, Exception):
+            raise item
+
+        inputs, targets, self.img_ids, event, slot = item
+        if slot is not None:
+            self.held_slot = (slot, event, self.generation)
+        if event is not None:
+            current_stream = torch.cuda.current_stream()
+            current_stream.wait_event(event)
+            inputs.record_stream(current_stream)
+            targets.record_stream(current_stream)
+        return inputs, targets
+
+    def _release_held_slot(self):
+        if self.held_slot is not None:
+            self.batch_pool.release(*self.held_slot)
+            self.held_slot = None
+
+    def _release(self, item):
+        if isinstance(item, tuple) and item[4] is not None:
+            self.batch_pool.release(item[4], item[3], self.generation)
+
+    def close(self):
+        """
+        Stop the background thread, so that the loader and its workers can be released.
+        The slots of the batches held or queued are released, as the thread may be waiting
+        for workers which wait for a free slot, and the generation of the slots is closed.
+        """
+        self.closed = True
+        self._release_held_slot()
+        while self.thread.is_alive():
+            try:
+                self._release(self.queue.get(timeout=0.1))
+            except queue.Empty:
+                pass
+        while not self.queue.empty():
+            self._release(self.queue.get_nowait())
+        if self.batch_pool is not None:
+            self.batch_pool.close(self.generation)
+        self.loader = None
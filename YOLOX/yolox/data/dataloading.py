@@ -4,7 +4,6 @@
 
 import os
 import random
-import uuid
 
 import numpy as np
 
@@ -12,6 +11,7 @@ import torch
 from torch.utils.data.dataloader import DataLoader as torchDataLoader
 from torch.utils.data.dataloader import default_collate
 
+from .batch_pool import BatchPool
 from .samplers import YoloBatchSampler
 
 
@@ -88,6 +88,19 @@ class DataLoader(torchDataLoader):
     def close_mosaic(self):
         self.batch_sampler.mosaic = False
 
+    @property
+    def batch_pool(self):
+        """The :class:`BatchPool` the workers collate into, if any."""
+        return self.collate_fn if isinstance(self.collate_fn, BatchPool) else None
+
+    def __iter__(self):
+        if self.batch_pool is None:
+            return super().__iter__()
+        # workers keep the slot queue of the generation they were started with
+        assert not self.persistent_workers, "batch pool needs new workers for every iterator"
+        self.batch_pool.reset()
+        return self.batch_pool.unpack(super().__iter__())
+
 
 def list_collate(batch):
     """
@@ -106,8 +119,21 @@ def list_collate(batch):
     return items
 
 
+def trim_labels_collate(batch):
+    """
+    Function that collates (img, padded_labels, ...) samples like the default collate,
+    but pads the labels only up to the largest number of labels in the batch rather than
+    the fixed `max_labels` of :class:`TrainTransform`, which puts valid labels first.
+    """
+    num_labels = max(int((item[1].sum(axis=1) > 0).sum()) for item in batch)
+    num_labels = max(num_labels, 1)
+    return default_collate([(item[0], item[1][:num_labels], *item[2:]) for item in batch])
+
+
 def worker_init_reset_seed(worker_id):
-    seed = uuid.uuid4().int % 2**32
+    # the seed torch gives the worker differs across workers and iterators, and only
+    # depends on the torch seed of the main process, so that seeded runs are reproducible
+    seed = torch.initial_seed() % 2**32
     random.seed(seed)
     torch.set_rng_state(torch.manual_seed(seed).get_state())
     np.random.seed(seed)
@@ -2,8 +2,13 @@
 # -*- coding:utf-8 -*-
 # Copyright (c) Megvii, Inc. and its affiliates.
 
-from .coco import COCODataset
-from .coco_classes import COCO_CLASSES
-from .datasets_wrapper import CacheDataset, ConcatDataset, Dataset, MixConcatDataset
-from .mosaicdetection import MosaicDetection
-from .voc import VOCDetection
+from yolox.utils.lazy_import import lazy_attach
+
+__getattr__, __dir__, __all__ = lazy_attach(__name__, {
+    "coco": ["COCODataset"],
+    "coco_classes": ["COCO_CLASSES"],
+    "datasets_wrapper": ["CacheDataset", "ConcatDataset", "Dataset", "MixConcatDataset"],
+    "mosaicdetection": ["MosaicDetection"],
+    "sample_cache": ["SampleCache"],
+    "voc": ["VOCDetection"],
+})
@@ -18,6 +18,8 @@ import numpy as np
 from torch.utils.data.dataset import ConcatDataset as torchConcatDataset
 from torch.utils.data.dataset import Dataset as torchDataset
 
+from yolox.utils import counter_rng, global_rng
+
 
 class ConcatDataset(torchConcatDataset):
     def __init__(self, datasets):
@@ -64,7 +66,7 @@ class MixConcatDataset(torchConcatDataset):
         else:
             sample_idx = idx - self.cumulative_sizes[dataset_idx - 1]
         if not isinstance(index, int):
-            index = (index[0], sample_idx, index[2])
+            index = (index[0], sample_idx, *index[2:])
 
         return self.datasets[dataset_idx][index]
 
@@ -96,11 +98,21 @@ class Dataset(torchDataset):
             return self._input_dim
         return self.__input_dim
 
+    def sample_rng(self):
+        """
+        Generator of the random augmentations of the current sample: the counter-based
+        generator of its key if the sampler gives one, see :func:`yolox.utils.counter_rng`.
+        """
+        key = getattr(self, "_rng_key", None)
+        return global_rng() if key is None else counter_rng(*key)
+
     @staticmethod
     def mosaic_getitem(getitem_fn):
         """
         Decorator method that needs to be used around the ``__getitem__`` method. |br|
-        This decorator enables the closing mosaic
+        This decorator enables the closing mosaic, and on the fly resizing when the index
+        is a (mosaic, index, input_dim) tuple. A (mosaic, index, input_dim, rng_key) tuple
+        also sets the key of :meth:`sample_rng`, `input_dim` may then be None.
 
         Example:
             >>> class CustomSet(ln.data.Dataset):
@@ -113,8 +125,13 @@ class Dataset(torchDataset):
 
         @wraps(getitem_fn)
         def wrapper(self, index):
+            self._rng_key = None
             if not isinstance(index, int):
                 self.enable_mosaic = index[0]
+                if len(index) > 2 and index[2] is not None:
+                    self._input_dim = index[2]
+                if len(index) > 3:
+                    self._rng_key = index[3]
                 index = index[1]
 
             ret_val = getitem_fn(self, index)
@@ -2,12 +2,10 @@
 # -*- coding:utf-8 -*-
 # Copyright (c) Megvii, Inc. and its affiliates.
 
-import random
-
 import cv2
 import numpy as np
 
-from yolox.utils import adjust_box_anns, get_local_rank
+from yolox.utils import get_local_rank, scale_boxes
 
 from ..data_augment import random_affine
 from .datasets_wrapper import Dataset
@@ -41,7 +39,7 @@ class MosaicDetection(Dataset):
         self, dataset, img_size, mosaic=True, preproc=None,
         degrees=10.0, translate=0.1, mosaic_scale=(0.5, 1.5),
         mixup_scale=(0.5, 1.5), shear=2.0, enable_mixup=True,
-        mosaic_prob=1.0, mixup_prob=1.0, *args
+        mosaic_prob=1.0, mixup_prob=1.0, sample_cache=None, *args
     ):
         """
 
@@ -56,6 +54,8 @@ class MosaicDetection(Dataset):
             mixup_scale (tuple):
             shear (float):
             enable_mixup (bool):
+            sample_cache (SampleCache, optional): store the samples without mosaic are read
+                from once it is built, see :meth:`build_sample_cache`.
             *args(tuple) : Additional arguments for mixup random sampler.
         """
         super().__init__(img_size, mosaic=mosaic)
@@ -70,6 +70,7 @@ class MosaicDetection(Dataset):
         self.enable_mixup = enable_mixup
         self.mosaic_prob = mosaic_prob
         self.mixup_prob = mixup_prob
+        self.sample_cache = sample_cache
         self.local_rank = get_local_rank()
 
     def __len__(self):
@@ -77,17 +78,18 @@ class MosaicDetection(Dataset):
 
     @Dataset.mosaic_getitem
     def __getitem__(self, idx):
-        if self.enable_mosaic and random.random() < self.mosaic_prob:
+        rng = self.sample_rng()
+        if self.enable_mosaic and rng.random() < self.mosaic_prob:
             mosaic_labels = []
-            input_dim = self._dataset.input_dim
+            input_dim = self.input_dim
             input_h, input_w = input_dim[0], input_dim[1]
 
             # yc, xc = s, s  # mosaic center x, y
-            yc = int(random.uniform(0.5 * input_h, 1.5 * input_h))
-            xc = int(random.uniform(0.5 * input_w, 1.5 * input_w))
+            yc = int(rng.uniform(0.5 * input_h, 1.5 * input_h))
+            xc = int(rng.uniform(0.5 * input_w, 1.5 * input_w))
 
             # 3 additional image indices
-            indices = [idx] + [random.randint(0, len(self._dataset) - 1) for _ in range(3)]
+            indices = [idx] + [int(i) for i in rng.integers(0, len(self._dataset), 3)]
 
             for i_mosaic, index in enumerate(indices):
                 img, _labels, _, img_id = self._dataset.pull_item(index)
@@ -133,6 +135,7 @@ class MosaicDetection(Dataset):
                 translate=self.translate,
                 scales=self.scale,
                 shear=self.shear,
+                rng=rng,
             )
 
             # -----------------------------------------------------------------
@@ -141,10 +144,14 @@ class MosaicDetection(Dataset):
             if (
                 self.enable_mixup
                 and not len(mosaic_labels) == 0
-                and random.random() < self.mixup_prob
+                and rng.random() < self.mixup_prob
             ):
-                mosaic_img, mosaic_labels = self.mixup(mosaic_img, mosaic_labels, self.input_dim)
-            mix_img, padded_labels = self.preproc(mosaic_img, mosaic_labels, self.input_dim)
+                mosaic_img, mosaic_labels = self.mixup(
+                    mosaic_img, mosaic_labels, self.input_dim, rng=rng
+                )
+            mix_img, padded_labels = self.preproc(
+                mosaic_img, mosaic_labels, self.input_dim, rng=rng
+            )
             img_info = (mix_img.shape[1], mix_img.shape[0])
 
             # -----------------------------------------------------------------
@@ -153,18 +160,31 @@ class MosaicDetection(Dataset):
             # -----------------------------------------------------------------
             return mix_img, padded_labels, img_info, img_id
 
+        elif self.sample_cache is not None and self.sample_cache.ready(len(self)):
+            return self.sample_cache.get(
+                idx, self.input_dim, self.preproc.flip_prob, rng, self.preproc.dtype
+            )
+
         else:
             self._dataset._input_dim = self.input_dim
             img, label, img_info, img_id = self._dataset.pull_item(idx)
-            img, label = self.preproc(img, label, self.input_dim)
+            img, label = self.preproc(img, label, self.input_dim, rng=rng)
             return img, label, img_info, img_id
 
-    def mixup(self, origin_img, origin_labels, input_dim):
-        jit_factor = random.uniform(*self.mixup_scale)
-        FLIP = random.uniform(0, 1) > 0.5
+    def build_sample_cache(self):
+        """
+        Render the samples without mosaic into `sample_cache`, e.g. before the no aug
+        epochs. Workers read them from it as soon as it is complete.
+        """
+        self.sample_cache.build(self._dataset)
+
+    def mixup(self, origin_img, origin_labels, input_dim, rng=None):
+        rng = self.sample_rng() if rng is None else rng
+        jit_factor = rng.uniform(*self.mixup_scale)
+        FLIP = rng.uniform(0, 1) > 0.5
         cp_labels = []
         while len(cp_labels) == 0:
-            cp_index = random.randint(0, self.__len__() - 1)
+            cp_index = int(rng.integers(0, self.__len__()))
             cp_labels = self._dataset.load_anno(cp_index)
         img, cp_labels, _, _ = self._dataset.pull_item(cp_index)
 
@@ -202,15 +222,15 @@ class MosaicDetection(Dataset):
 
         x_offset, y_offset = 0, 0
         if padded_img.shape[0] > target_h:
-            y_offset = random.randint(0, padded_img.shape[0] - target_h - 1)
+            y_offset = int(rng.integers(0, padded_img.shape[0] - target_h))
         if padded_img.shape[1] > target_w:
-            x_offset = random.randint(0, padded_img.shape[1] - target_w - 1)
+            x_offset = int(rng.integers(0, padded_img.shape[1] - target_w))
         padded_cropped_img = padded_img[
             y_offset: y_offset + target_h, x_offset: x_offset + target_w
         ]
 
-        cp_bboxes_origin_np = adjust_box_anns(
-            cp_labels[:, :4].copy(), cp_scale_ratio, 0, 0, origin_w, origin_h
+        cp_bboxes_origin_np = scale_boxes(
+            cp_labels, cp_scale_ratio, clip=(origin_w, origin_h)
         )
         if FLIP:
             cp_bboxes_origin_np[:, 0::2] = (
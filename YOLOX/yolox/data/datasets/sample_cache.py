@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii, Inc. and its affiliates.
+
+import os
+from functools import partial
+from multiprocessing.pool import ThreadPool
+from loguru import logger
+from tqdm import tqdm
+
+import cv2
+import numpy as np
+
+from ..data_augment import TrainTransform
+
+__all__ = ["SampleCache"]
+
+
+class SampleCache:
+    """
+    Memory-mapped store of the samples of the no aug epochs: images letterboxed to
+    `img_size` as uint8 CHW arrays, with their padded labels, as :class:`TrainTransform`
+    produces them without flip and hsv augmentation. Once built, workers only copy a
+    sample out of the store and flip it, instead of decoding, resizing and letterboxing
+    the image. HSV augmentation is not applied to cached samples.
+
+    The store is `cache_dir/{images,labels,infos,sizes}.npy`, `sizes.npy` is written last
+    and marks a complete store. The arrays are only mapped on first use in each process,
+    so that the store can be built after the dataloader workers started.
+
+    Args:
+        cache_dir (str): directory of the store.
+        img_size (tuple): (height, width) the images are letterboxed to.
+        max_labels (int): number of rows the labels are padded to.
+    """
+
+    names = ("images", "labels", "infos", "sizes")
+
+    def __init__(self, cache_dir, img_size, max_labels=120):
+        self.cache_dir = cache_dir
+        self.img_size = tuple(img_size)
+        self.max_labels = max_labels
+        self.arrays = None
+
+    def __getstate__(self):
+        # maps are opened again by each worker, instead of being pickled as copies
+        state = self.__dict__.copy()
+        state["arrays"] = None
+        return state
+
+    def _file(self, name):
+        return os.path.join(self.cache_dir, name + ".npy")
+
+    def _shapes(self, num_imgs):
+        return {
+            "images": (num_imgs, 3, *self.img_size),
+            "labels": (num_imgs, self.max_labels, 5),
+            "infos": (num_imgs, 3),
+            "sizes": (num_imgs, 2),
+        }
+
+    def ready(self, num_imgs):
+        """Whether a complete store of `num_imgs` samples exists, mapping it if so."""
+        if self.arrays is None and os.path.exists(self._file("sizes")):
+            arrays = {name: np.load(self._file(name), mmap_mode="r") for name in self.names}
+            shapes = self._shapes(num_imgs)
+            if all(arrays[name].shape == shapes[name] for name in self.names):
+                self.arrays = arrays
+        return self.arrays is not None
+
+    def build(self, dataset, num_threads=None):
+        """
+        Render every sample of `dataset` into the store, unless it is already complete.
+
+        Args:
+            dataset (Dataset): dataset with `pull_item`, e.g. :class:`COCODataset`.
+            num_threads (int, optional): rendering threads. Defaults to the cpu count.
+        """
+        num_imgs = len(dataset)
+        if self.ready(num_imgs):
+            logger.info("Found no aug sample cache at {}".format(self.cache_dir))
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_files = {name: "{}.{}.npy".format(self._file(name)[:-4], os.getpid())
+                     for name in self.names}
+        dtypes = {"images": np.uint8, "labels": np.float32, "infos": np.int64, "sizes": np.int32}
+        arrays = {
+            name: np.lib.format.open_memmap(tmp_files[name], "w+", dtypes[name], shape)
+            for name, shape in self._shapes(num_imgs).items()
+        }
+
+        transform = TrainTransform(self.max_labels, flip_prob=0.0, hsv_prob=0.0, dtype=np.uint8)
+        num_threads = num_threads or min(8, max(1, os.cpu_count() - 1))
+        with ThreadPool(num_threads) as pool:
+            renders = pool.imap(
+                partial(self._render, dataset, transform, arrays), range(num_imgs)
+            )
+            for _ in tqdm(renders, total=num_imgs, desc="Caching no aug samples"):
+                pass
+
+        for name in self.names:
+            arrays[name].flush()
+            del arrays[name]
+            os.replace(tmp_files[name], self._file(name))
+        self.ready(num_imgs)
+
+    def _render(self, dataset, transform, arrays, index):
+        img, labels, img_info, img_id = dataset.pull_item(index)
+        height, width = img.shape[:2]
+        r = min(self.img_size[0] / height, self.img_size[1] / width)
+        arrays["images"][index], arrays["labels"][index] = transform(img, labels, self.img_size)
+        arrays["infos"][index] = (*img_info[:2], int(np.asarray(img_id).reshape(-1)[0]))
+        arrays["sizes"][index] = (int(height * r), int(width * r))
+
+    def get(self, index, input_dim, flip_prob, rng, dtype=np.float32):
+        """
+        Sample `index` of a :meth:`ready` store, as returned by :class:`MosaicDetection`.
+
+        Args:
+            index (int): sample index.
+            input_dim (tuple): (height, width) of the output image. Images are resized
+                to it from the store, e.g. for multiscale training in the workers.
+            flip_prob (float): probability of horizontal flip.
+            rng (np.random.Generator): generator of the flip.
+            dtype (np.dtype): dtype of the output image.
+
+        Returns:
+            tuple: img, padded_labels, img_info, img_id.
+        """
+        img = np.array(self.arrays["images"][index])
+        labels = np.array(self.arrays["labels"][index])
+        height, width = self.arrays["sizes"][index]
+        if rng.random() < flip_prob:
+            # only the image is mirrored, padding stays on the right like for TrainTransform
+            img[:, :height, :width] = img[:, :height, width - 1::-1]
+            valid = labels[:, 3] > 0
+            labels[valid, 1] = width - labels[valid, 1]
+
+        if tuple(input_dim) != self.img_size:
+            img = cv2.resize(
+                img.transpose(1, 2, 0), (input_dim[1], input_dim[0]),
+                interpolation=cv2.INTER_LINEAR,
+            ).transpose(2, 0, 1)
+            labels[:, 1::2] *= input_dim[1] / self.img_size[1]
+            labels[:, 2::2] *= input_dim[0] / self.img_size[0]
+
+        info = self.arrays["infos"][index]
+        img_info = (int(info[0]), int(info[1]))
+        return np.ascontiguousarray(img, dtype=dtype), labels, img_info, np.array([info[2]])
@@ -5,26 +5,156 @@
 import itertools
 from typing import Optional
 
-import torch
 import torch.distributed as dist
 from torch.utils.data.sampler import BatchSampler as torchBatchSampler
 from torch.utils.data.sampler import Sampler
 
+from yolox.utils import counter_rng
+
+from .data_augment import rect_input_size
+
+# `counter_rng` streams of the sampling, the augmentations use the default stream 0
+SIZE_STREAM, POOL_STREAM, SHUFFLE_STREAM = 1, 2, 3
+
 
 class YoloBatchSampler(torchBatchSampler):
     """
     This batch sampler will generate mini-batches of (mosaic, index) tuples from another sampler.
     It works just like the :class:`torch.utils.data.sampler.BatchSampler`,
     but it will turn on/off the mosaic aug.
+    If `multiscale_sizes` is given, it generates (mosaic, index, input_dim) tuples instead,
+    where `input_dim` is drawn from `multiscale_sizes` every `size_interval` batches,
+    so that workers produce images at the training size directly.
+    If `sample_keys` is True, it generates (mosaic, index, input_dim, rng_key) tuples,
+    `input_dim` being None without `multiscale_sizes`, where `rng_key` is the
+    (seed, batch index, position in the batch, index) key of the counter-based generator
+    of the augmentations of the sample, see :meth:`yolox.data.Dataset.sample_rng`.
+
+    Every random choice only depends on `seed` and the batch index, so that
+    :meth:`set_start` resumes the exact stream of batches of a previous run.
     """
 
-    def __init__(self, *args, mosaic=True, **kwargs):
+    def __init__(
+        self, *args, mosaic=True, multiscale_sizes=None, size_interval=10, seed=0,
+        sample_keys=False, **kwargs
+    ):
         super().__init__(*args, **kwargs)
         self.mosaic = mosaic
+        self.multiscale_sizes = multiscale_sizes
+        self.size_interval = size_interval
+        # same seed on every rank keeps the sizes of a step identical across ranks
+        self.seed = seed
+        self.sample_keys = sample_keys
+        self.start = 0
+
+    def set_start(self, start):
+        """
+        Start the next iterations at batch `start` of the stream, e.g. the number of
+        batches of the checkpoint training resumes from. Requires a sampler with
+        `set_start`, such as :class:`InfiniteSampler`.
+        """
+        self.start = start
 
     def __iter__(self):
-        for batch in super().__iter__():
-            yield [(self.mosaic, idx) for idx in batch]
+        for batch_idx, batch in enumerate(self._index_batches(), self.start):
+            input_dim = None
+            if self.multiscale_sizes is not None:
+                size_rng = counter_rng(
+                    self.seed, batch_idx // self.size_interval, stream=SIZE_STREAM
+                )
+                input_dim = self.multiscale_sizes[size_rng.integers(len(self.multiscale_sizes))]
+            if self.sample_keys:
+                yield [
+                    (self.mosaic, idx, input_dim, (self.seed, batch_idx, i, idx))
+                    for i, idx in enumerate(batch)
+                ]
+            elif input_dim is not None:
+                yield [(self.mosaic, idx, input_dim) for idx in batch]
+            else:
+                yield [(self.mosaic, idx) for idx in batch]
+
+    def _index_batches(self):
+        self._set_sampler_start(self.start * self.batch_size)
+        return super().__iter__()
+
+    def _set_sampler_start(self, start):
+        if hasattr(self.sampler, "set_start"):
+            self.sampler.set_start(start)
+        else:
+            assert start == 0, "{} can not start at {}".format(type(self.sampler).__name__, start)
+
+
+class GroupedBatchSampler(YoloBatchSampler):
+    """
+    A :class:`YoloBatchSampler` that puts images with a similar number of ground truths
+    into the same batch, so that labels only need padding up to a close batch maximum
+    (see :func:`yolox.data.trim_labels_collate`) and a few crowded images do not set
+    the label assignment cost of the whole batch.
+    Indices are drawn from the sampler `pool_size` batches at a time, sorted by
+    `num_labels` and split into batches, which are then yielded in random order.
+    """
+
+    def __init__(self, *args, num_labels, pool_size=16, seed=0, **kwargs):
+        super().__init__(*args, seed=seed, **kwargs)
+        self.num_labels = num_labels
+        self.pool_size = pool_size
+
+    def _index_batches(self):
+        # the pool of the start batch is split again, and its earlier batches skipped
+        pool_idx, skip = divmod(self.start, self.pool_size)
+        self._set_sampler_start(pool_idx * self.pool_size * self.batch_size)
+        pool = []
+        for idx in self.sampler:
+            pool.append(idx)
+            if len(pool) == self.batch_size * self.pool_size:
+                yield from self._split_pool(pool, pool_idx)[skip:]
+                pool_idx, skip, pool = pool_idx + 1, 0, []
+        if pool:
+            yield from self._split_pool(pool, pool_idx)[skip:]
+
+    def _split_pool(self, pool, pool_idx):
+        pool.sort(key=lambda idx: self.num_labels[idx])
+        batches = [pool[i:i + self.batch_size] for i in range(0, len(pool), self.batch_size)]
+        if self.drop_last and len(batches[-1]) < self.batch_size:
+            batches.pop()
+        order = counter_rng(self.seed, pool_idx, stream=POOL_STREAM).permutation(len(batches))
+        return [batches[i] for i in order]
+
+
+class RectBatchSampler(YoloBatchSampler):
+    """
+    A :class:`YoloBatchSampler` for evaluation, which puts images of similar aspect ratio
+    into the same batch and yields (False, index, input_dim) tuples, where `input_dim`
+    is the smallest `stride` aligned rectangle holding every image of the batch resized
+    with the ratio of `test_size` (see :func:`yolox.data.data_augment.rect_input_size`),
+    so that workers letterbox the images to it instead of the square `test_size`.
+    """
+
+    def __init__(self, *args, img_shapes, test_size, stride=32, **kwargs):
+        super().__init__(*args, mosaic=False, **kwargs)
+        self.img_shapes = img_shapes
+        self.test_size = test_size
+        self.stride = stride
+
+    def __iter__(self):
+        for batch in self._index_batches():
+            sizes = [
+                rect_input_size(self.img_shapes[idx], self.test_size, self.stride)
+                for idx in batch
+            ]
+            input_dim = (max(s[0] for s in sizes), max(s[1] for s in sizes))
+            yield [(False, idx, input_dim) for idx in batch]
+
+    def _index_batches(self):
+        indices = sorted(
+            self.sampler, key=lambda idx: self.img_shapes[idx][1] / self.img_shapes[idx][0]
+        )
+        batches = [
+            indices[i:i + self.batch_size] for i in range(0, len(indices), self.batch_size)
+        ]
+        if self.drop_last and batches and len(batches[-1]) < self.batch_size:
+            batches.pop()
+        return batches
 
 
 class InfiniteSampler(Sampler):
@@ -66,20 +196,28 @@ class InfiniteSampler(Sampler):
             self._rank = rank
             self._world_size = world_size
 
+        self._start = 0
+
+    def set_start(self, start):
+        """Start the next iterations at the `start`-th index of the stream of this rank."""
+        self._start = start
+
     def __iter__(self):
-        start = self._rank
+        start = self._start * self._world_size + self._rank
+        first_pass = start // self._size
         yield from itertools.islice(
-            self._infinite_indices(), start, None, self._world_size
+            self._infinite_indices(first_pass), start - first_pass * self._size, None,
+            self._world_size,
         )
 
-    def _infinite_indices(self):
-        g = torch.Generator()
-        g.manual_seed(self._seed)
-        while True:
+    def _infinite_indices(self, first_pass=0):
+        # every pass has its own generator, so that any of them can be started from
+        for pass_idx in itertools.count(first_pass):
             if self._shuffle:
-                yield from torch.randperm(self._size, generator=g)
+                rng = counter_rng(self._seed, pass_idx, stream=SHUFFLE_STREAM)
+                yield from rng.permutation(self._size).tolist()
             else:
-                yield from torch.arange(self._size)
+                yield from range(self._size)
 
     def __len__(self):
         return self._size // self._world_size
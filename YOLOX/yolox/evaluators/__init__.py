@@ -2,5 +2,9 @@
 # -*- coding:utf-8 -*-
 # Copyright (c) Megvii, Inc. and its affiliates.
 
-from .coco_evaluator import COCOEvaluator
-from .voc_evaluator import VOCEvaluator
+from yolox.utils.lazy_import import lazy_attach
+
+__getattr__, __dir__, __all__ = lazy_attach(__name__, {
+    "coco_evaluator": ["COCOEvaluator"],
+    "voc_evaluator": ["VOCEvaluator"],
+})
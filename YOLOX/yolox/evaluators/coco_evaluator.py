@@ -24,7 +24,7 @@ from yolox.utils import (
     postprocess,
     synchronize,
     time_synchronized,
-    xyxy2xywh
+    xyxy_to_xywh
 )
 
 
@@ -115,7 +115,7 @@ class COCOEvaluator:
 
     def evaluate(
         self, model, distributed=False, half=False, trt_file=None,
-        decoder=None, test_size=None, return_outputs=False
+        decoder=None, test_size=None, return_outputs=False, device=None
     ):
         """
         COCO average precision (AP) Evaluation. Iterate inference on the test dataset
@@ -125,6 +125,9 @@ class COCOEvaluator:
 
         Args:
             model : model to evaluate.
+            device (torch.device): device of the inputs, for models without parameters
+                running on an accelerator, eg. frozen TorchScript modules. By default,
+                the one of the model parameters, or cpu.
 
         Returns:
             ap50_95 (float) : COCO AP of IoU=50:95
@@ -132,7 +135,11 @@ class COCOEvaluator:
             summary (sr): summary info of evaluation.
         """
         # TODO half to amp_test
-        tensor_type = torch.cuda.HalfTensor if half else torch.cuda.FloatTensor
+        data_type = torch.float16 if half else torch.float32
+        # models without parameters (eg. onnxruntime or quantized wrappers) run on cpu
+        if device is None:
+            param = next(model.parameters(), None)
+            device = param.device if param is not None else torch.device("cpu")
         model = model.eval()
         if half:
             model = model.half()
@@ -159,7 +166,8 @@ class COCOEvaluator:
             progress_bar(self.dataloader)
         ):
             with torch.no_grad():
-                imgs = imgs.type(tensor_type)
+                # copy before casting so that uint8 batches cross PCIe as uint8
+                imgs = imgs.to(device, non_blocking=True).to(data_type)
 
                 # skip the last iters since batchsize might be not enough for batch inference
                 is_time_record = cur_iter < len(self.dataloader) - 1
@@ -186,7 +194,7 @@ class COCOEvaluator:
             data_list.extend(data_list_elem)
             output_data.update(image_wise_data)
 
-        statistics = torch.cuda.FloatTensor([inference_time, nms_time, n_samples])
+        statistics = torch.tensor([inference_time, nms_time, n_samples], device=device)
         if distributed:
             # different process/device might have different speed,
             # to make sure the process will not be stucked, sync func is used here.
@@ -235,7 +243,7 @@ class COCOEvaluator:
                 }
             })
 
-            bboxes = xyxy2xywh(bboxes)
+            xyxy_to_xywh(bboxes, out=bboxes)
 
             for ind in range(bboxes.shape[0]):
                 label = self.dataloader.dataset.class_ids[int(cls[ind])]
@@ -264,8 +272,10 @@ class COCOEvaluator:
         nms_time = statistics[1].item()
         n_samples = statistics[2].item()
 
-        a_infer_time = 1000 * inference_time / (n_samples * self.dataloader.batch_size)
-        a_nms_time = 1000 * nms_time / (n_samples * self.dataloader.batch_size)
+        # the loader may have a batch sampler only, eg. with eval_rect
+        batch_size = self.dataloader.batch_sampler.batch_size
+        a_infer_time = 1000 * inference_time / (n_samples * batch_size)
+        a_nms_time = 1000 * nms_time / (n_samples * batch_size)
 
         time_info = ", ".join(
             [
@@ -40,7 +40,7 @@ class VOCEvaluator:
 
     def evaluate(
         self, model, distributed=False, half=False, trt_file=None,
-        decoder=None, test_size=None, return_outputs=False,
+        decoder=None, test_size=None, return_outputs=False, device=None
     ):
         """
         VOC average precision (AP) Evaluation. Iterate inference on the test dataset
@@ -50,6 +50,9 @@ class VOCEvaluator:
 
         Args:
             model : model to evaluate.
+            device (torch.device): device of the inputs, for models without parameters
+                running on an accelerator, eg. frozen TorchScript modules. By default,
+                the one of the model parameters, or cpu.
 
         Returns:
             ap50_95 (float) : COCO style AP of IoU=50:95
@@ -57,7 +60,11 @@ class VOCEvaluator:
             summary (sr): summary info of evaluation.
         """
         # TODO half to amp_test
-        tensor_type = torch.cuda.HalfTensor if half else torch.cuda.FloatTensor
+        data_type = torch.float16 if half else torch.float32
+        # models without parameters (eg. onnxruntime or quantized wrappers) run on cpu
+        if device is None:
+            param = next(model.parameters(), None)
+            device = param.device if param is not None else torch.device("cpu")
         model = model.eval()
         if half:
             model = model.half()
@@ -81,7 +88,8 @@ class VOCEvaluator:
 
         for cur_iter, (imgs, _, info_imgs, ids) in enumerate(progress_bar(self.dataloader)):
             with torch.no_grad():
-                imgs = imgs.type(tensor_type)
+                # copy before casting so that uint8 batches cross PCIe as uint8
+                imgs = imgs.to(device, non_blocking=True).to(data_type)
 
                 # skip the last iters since batchsize might be not enough for batch inference
                 is_time_record = cur_iter < len(self.dataloader) - 1
@@ -105,7 +113,7 @@ class VOCEvaluator:
 
             data_list.update(self.convert_to_voc_format(outputs, info_imgs, ids))
 
-        statistics = torch.cuda.FloatTensor([inference_time, nms_time, n_samples])
+        statistics = torch.tensor([inference_time, nms_time, n_samples], device=device)
         if distributed:
             data_list = gather(data_list, dst=0)
             data_list = ChainMap(*data_list)
@@ -147,8 +155,10 @@ class VOCEvaluator:
         nms_time = statistics[1].item()
         n_samples = statistics[2].item()
 
-        a_infer_time = 1000 * inference_time / (n_samples * self.dataloader.batch_size)
-        a_nms_time = 1000 * nms_time / (n_samples * self.dataloader.batch_size)
+        # the loader may have a batch sampler only, eg. with eval_rect
+        batch_size = self.dataloader.batch_sampler.batch_size
+        a_infer_time = 1000 * inference_time / (n_samples * batch_size)
+        a_nms_time = 1000 * nms_time / (n_samples * batch_size)
 
         time_info = ", ".join(
             [
@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
 # Copyright (c) Megvii Inc. All rights reserved.
 
-from .base_exp import BaseExp
-from .build import get_exp
-from .yolox_base import Exp, check_exp_value
+from yolox.utils.lazy_import import lazy_attach
+
+__getattr__, __dir__, __all__ = lazy_attach(__name__, {
+    "base_exp": ["BaseExp"],
+    "build": ["get_exp"],
+    "yolox_base": ["Exp", "check_exp_value"],
+})
@@ -5,7 +5,6 @@ import ast
 import pprint
 from abc import ABCMeta, abstractmethod
 from typing import Dict, List, Tuple
-from tabulate import tabulate
 
 import torch
 from torch.nn import Module
@@ -56,6 +55,8 @@ class BaseExp(metaclass=ABCMeta):
         pass
 
     def __repr__(self):
+        from tabulate import tabulate
+
         table_header = ["keys", "values"]
         exp_table = [
             (str(k), pprint.pformat(v))
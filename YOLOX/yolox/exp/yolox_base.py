@@ -45,6 +45,25 @@ class Exp(BaseExp):
         self.val_ann = "instances_val2017.json"
         # name of annotation file for testing
         self.test_ann = "instances_test2017.json"
+        # dtype of images produced by the dataloader. "uint8" moves 4x less data through
+        # worker IPC, pinned memory and host to device copy, images are cast on the device.
+        self.data_dtype = "float32"
+        # number of batches the prefetcher moves to the device ahead of the training step
+        self.prefetch_depth = 2
+        # run `preprocess` (multiscale resize) in the prefetcher thread instead of the
+        # training step. The new size then takes effect a few batches later.
+        self.prefetch_preprocess = False
+        # pick the multiscale size in the batch sampler so that workers resize images
+        # directly to it, instead of interpolating whole batches on the training device.
+        self.multiscale_in_worker = False
+        # batch images with a similar number of ground truths together and pad labels
+        # to the batch maximum only. Mosaic merges other images in, so this mostly helps
+        # the no aug epochs and datasets with a wide spread of object counts.
+        self.group_by_num_labels = False
+        # workers collate batches straight into a pool of shared, pinned buffers reused
+        # across iterations, instead of new shared tensors that are then copied to pinned
+        # memory in the main process.
+        self.pinned_batch_pool = False
 
         # --------------- transform config ----------------- #
         # prob of applying mosaic aug
@@ -80,6 +99,9 @@ class Exp(BaseExp):
         self.scheduler = "yoloxwarmcos"
         # last #epoch to close augmention like mosaic
         self.no_aug_epochs = 15
+        # render the letterboxed samples of the no aug epochs once into a memory-mapped
+        # cache in the output dir, workers then only read and flip them. No hsv aug then.
+        self.no_aug_cache = False
         # apply EMA during training
         self.ema = True
 
@@ -99,6 +121,23 @@ class Exp(BaseExp):
         # name of experiment
         self.exp_name = os.path.split(os.path.realpath(__file__))[1].split(".")[0]
 
+        # --------------  distillation config ------------------ #
+        # exp file or model name of a trained teacher, e.g. "yolox-l". If set, the model is
+        # trained with `DistillTrainer` to also imitate the teacher.
+        self.teacher_exp = None
+        # checkpoint of the teacher
+        self.teacher_ckpt = None
+        # weight of the loss between the PAFPN features of the model, mapped to the
+        # teacher channels by 1x1 convs, and the PAFPN features of the teacher
+        self.distill_feat_weight = 1.0
+        # weight of the loss between the obj/cls predictions and the soft ones of the teacher
+        self.distill_soft_weight = 1.0
+        # precompute the teacher predictions of the no aug epochs into a memory-mapped file,
+        # so that the teacher does not run in them. Flip, hsv and multiscale are turned off
+        # in those epochs so that an image always gives the same input, and the feature
+        # loss is skipped since only the predictions are stored.
+        self.distill_cache = False
+
         # -----------------  testing config ------------------ #
         # output image size during evaluation/test
         self.test_size = (640, 640)
@@ -107,6 +146,9 @@ class Exp(BaseExp):
         self.test_conf = 0.01
         # nms threshold
         self.nmsthre = 0.65
+        # evaluate batches of images of similar aspect ratio, letterboxed to the smallest
+        # multiple of 32 rectangle holding them instead of the square test_size
+        self.eval_rect = False
 
     def get_model(self):
         from yolox.models import YOLOX, YOLOPAFPN, YOLOXHead
@@ -146,7 +188,8 @@ class Exp(BaseExp):
             preproc=TrainTransform(
                 max_labels=50,
                 flip_prob=self.flip_prob,
-                hsv_prob=self.hsv_prob
+                hsv_prob=self.hsv_prob,
+                dtype=self.data_dtype,
             ),
             cache=cache,
             cache_type=cache_type,
@@ -164,10 +207,13 @@ class Exp(BaseExp):
         """
         from yolox.data import (
             TrainTransform,
+            BatchPool,
             YoloBatchSampler,
+            GroupedBatchSampler,
             DataLoader,
             InfiniteSampler,
             MosaicDetection,
+            trim_labels_collate,
             worker_init_reset_seed,
         )
         from yolox.utils import wait_for_the_master
@@ -180,6 +226,10 @@ class Exp(BaseExp):
                     "cache_img must be None if you didn't create self.dataset before launch"
                 self.dataset = self.get_dataset(cache=False, cache_type=cache_img)
 
+        num_labels = None
+        if self.group_by_num_labels:
+            num_labels = [len(self.dataset.load_anno(i)) for i in range(len(self.dataset))]
+
         self.dataset = MosaicDetection(
             dataset=self.dataset,
             mosaic=not no_aug,
@@ -187,7 +237,8 @@ class Exp(BaseExp):
             preproc=TrainTransform(
                 max_labels=120,
                 flip_prob=self.flip_prob,
-                hsv_prob=self.hsv_prob),
+                hsv_prob=self.hsv_prob,
+                dtype=self.data_dtype),
             degrees=self.degrees,
             translate=self.translate,
             mosaic_scale=self.mosaic_scale,
@@ -203,15 +254,38 @@ class Exp(BaseExp):
 
         sampler = InfiniteSampler(len(self.dataset), seed=self.seed if self.seed else 0)
 
-        batch_sampler = YoloBatchSampler(
+        batch_sampler_kwargs = dict(
             sampler=sampler,
             batch_size=batch_size,
             drop_last=False,
             mosaic=not no_aug,
+            multiscale_sizes=self.get_multiscale_sizes() if self.multiscale_in_worker else None,
+            seed=self.seed if self.seed else 0,
+            # counter-based augmentations, so that resumed trainings see the same samples
+            sample_keys=True,
         )
+        if num_labels is not None:
+            batch_sampler = GroupedBatchSampler(num_labels=num_labels, **batch_sampler_kwargs)
+        else:
+            batch_sampler = YoloBatchSampler(**batch_sampler_kwargs)
 
         dataloader_kwargs = {"num_workers": self.data_num_workers, "pin_memory": True}
         dataloader_kwargs["batch_sampler"] = batch_sampler
+        if num_labels is not None:
+            dataloader_kwargs["collate_fn"] = trim_labels_collate
+        if self.pinned_batch_pool:
+            sizes = self.get_multiscale_sizes() if self.multiscale_in_worker else [self.input_size]
+            # every batch in flight: 2 prefetched per worker, plus those of the prefetcher
+            num_slots = 2 * max(self.data_num_workers, 1) + self.prefetch_depth + 2
+            dataloader_kwargs["collate_fn"] = BatchPool(
+                num_slots,
+                batch_size,
+                (max(size[0] for size in sizes), max(size[1] for size in sizes)),
+                max_labels=120,
+                dtype=getattr(torch, self.data_dtype),
+                trim_labels=num_labels is not None,
+            )
+            dataloader_kwargs["pin_memory"] = False
 
         # Make sure each process has different random seed, especially for 'fork' method.
         # Check https://github.com/pytorch/pytorch/issues/63311 for more details.
@@ -221,17 +295,26 @@ class Exp(BaseExp):
 
         return train_loader
 
+    def get_multiscale_sizes(self):
+        """All the (height, width) sizes multiscale training picks from."""
+        size_factor = self.input_size[1] * 1.0 / self.input_size[0]
+        if not hasattr(self, 'random_size'):
+            min_size = int(self.input_size[0] / 32) - self.multiscale_range
+            max_size = int(self.input_size[0] / 32) + self.multiscale_range
+            self.random_size = (min_size, max_size)
+        return [
+            (int(32 * size), 32 * int(size * size_factor))
+            for size in range(self.random_size[0], self.random_size[1] + 1)
+        ]
+
     def random_resize(self, data_loader, epoch, rank, is_distributed):
-        tensor = torch.LongTensor(2).cuda()
+        tensor = torch.LongTensor(2)
+        if torch.cuda.is_available():
+            tensor = tensor.cuda()
 
         if rank == 0:
-            size_factor = self.input_size[1] * 1.0 / self.input_size[0]
-            if not hasattr(self, 'random_size'):
-                min_size = int(self.input_size[0] / 32) - self.multiscale_range
-                max_size = int(self.input_size[0] / 32) + self.multiscale_range
-                self.random_size = (min_size, max_size)
-            size = random.randint(*self.random_size)
-            size = (int(32 * size), 32 * int(size * size_factor))
+            sizes = self.get_multiscale_sizes()
+            size = sizes[random.randint(0, len(sizes) - 1)]
             tensor[0] = size[0]
             tensor[1] = size[1]
 
@@ -306,10 +389,12 @@ class Exp(BaseExp):
             json_file=self.val_ann if not testdev else self.test_ann,
             name="val2017" if not testdev else "test2017",
             img_size=self.test_size,
-            preproc=ValTransform(legacy=legacy),
+            preproc=ValTransform(legacy=legacy, dtype=self.data_dtype),
         )
 
     def get_eval_loader(self, batch_size, is_distributed, **kwargs):
+        from yolox.data import RectBatchSampler
+
         valdataset = self.get_eval_dataset(**kwargs)
 
         if is_distributed:
@@ -323,9 +408,18 @@ class Exp(BaseExp):
         dataloader_kwargs = {
             "num_workers": self.data_num_workers,
             "pin_memory": True,
-            "sampler": sampler,
         }
-        dataloader_kwargs["batch_size"] = batch_size
+        if self.eval_rect:
+            dataloader_kwargs["batch_sampler"] = RectBatchSampler(
+                sampler,
+                batch_size,
+                drop_last=False,
+                img_shapes=[anno[1] for anno in valdataset.annotations],
+                test_size=self.test_size,
+            )
+        else:
+            dataloader_kwargs["sampler"] = sampler
+            dataloader_kwargs["batch_size"] = batch_size
         val_loader = torch.utils.data.DataLoader(valdataset, **dataloader_kwargs)
 
         return val_loader
@@ -343,9 +437,27 @@ class Exp(BaseExp):
             testdev=testdev,
         )
 
+    def get_teacher(self):
+        """Frozen teacher model of the distillation, in eval mode."""
+        from yolox.exp import get_exp
+
+        if os.path.isfile(self.teacher_exp):
+            teacher_exp = get_exp(self.teacher_exp, None)
+        else:
+            teacher_exp = get_exp(None, self.teacher_exp)
+        assert teacher_exp.num_classes == self.num_classes, \
+            "teacher has {} classes, expect {}".format(teacher_exp.num_classes, self.num_classes)
+        teacher = teacher_exp.get_model()
+        ckpt = torch.load(self.teacher_ckpt, map_location="cpu")
+        teacher.load_state_dict(ckpt["model"] if "model" in ckpt else ckpt)
+        return teacher.eval().requires_grad_(False)
+
     def get_trainer(self, args):
-        from yolox.core import Trainer
-        trainer = Trainer(self, args)
+        from yolox.core import DistillTrainer, Trainer
+        if self.teacher_exp is not None:
+            trainer = DistillTrainer(self, args)
+        else:
+            trainer = Trainer(self, args)
         # NOTE: trainer shouldn't be an attribute of exp object
         return trainer
 
@@ -2,10 +2,17 @@
 # -*- coding:utf-8 -*-
 # Copyright (c) Megvii Inc. All rights reserved.
 
-from .build import *
-from .darknet import CSPDarknet, Darknet
-from .losses import IOUloss
-from .yolo_fpn import YOLOFPN
-from .yolo_head import YOLOXHead
-from .yolo_pafpn import YOLOPAFPN
-from .yolox import YOLOX
+from yolox.utils.lazy_import import lazy_attach
+
+__getattr__, __dir__, __all__ = lazy_attach(__name__, {
+    "build": [
+        "create_yolox_model", "yolox_nano", "yolox_tiny", "yolox_s", "yolox_m", "yolox_l",
+        "yolox_x", "yolov3", "yolox_custom",
+    ],
+    "darknet": ["CSPDarknet", "Darknet"],
+    "losses": ["IOUloss"],
+    "yolo_fpn": ["YOLOFPN"],
+    "yolo_head": ["YOLOXHead"],
+    "yolo_pafpn": ["YOLOPAFPN"],
+    "yolox": ["YOLOX"],
+})
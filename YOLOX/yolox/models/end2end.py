@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii Inc. All rights reserved.
+
+import torch
+import torch.nn as nn
+import torchvision
+
+
+class ONNXNMS(torch.autograd.Function):
+    """
+    Class aware NMS, exported as a single ONNX ``NonMaxSuppression`` node.
+    Returns the [num_selected, 3] (batch_index, class_index, box_index) indices of the kept boxes.
+    """
+
+    @staticmethod
+    def forward(ctx, boxes, scores, max_output_per_class, iou_thr, score_thr):
+        # boxes: [B, N, 4] xyxy, scores: [B, C, N]
+        selected = []
+        for batch_idx in range(boxes.shape[0]):
+            cls_idx, box_idx = (scores[batch_idx] > score_thr).nonzero(as_tuple=True)
+            keep = torchvision.ops.batched_nms(
+                boxes[batch_idx, box_idx], scores[batch_idx, cls_idx, box_idx], cls_idx, iou_thr
+            )
+            batch_ids = torch.full_like(keep, batch_idx)
+            selected.append(torch.stack([batch_ids, cls_idx[keep], box_idx[keep]], dim=1))
+        return torch.cat(selected)
+
+    @staticmethod
+    def symbolic(g, boxes, scores, max_output_per_class, iou_thr, score_thr):
+        return g.op(
+            "NonMaxSuppression",
+            boxes,
+            scores,
+            g.op("Constant", value_t=torch.tensor([max_output_per_class], dtype=torch.long)),
+            g.op("Constant", value_t=torch.tensor([iou_thr], dtype=torch.float)),
+            g.op("Constant", value_t=torch.tensor([score_thr], dtype=torch.float)),
+        )
+
+
+class End2End(nn.Module):
+    """
+    Wrap a YOLOX model so that its output is the final detections, with score computation,
+    top-k pre-filtering and NMS running inside the exported graph.
+
+    The output is a fixed size [B, max_det, 6] tensor of (x1, y1, x2, y2, score, class),
+    sorted by score. Unused rows are all zeros.
+    """
+
+    def __init__(self, model, max_det=100, conf_thre=0.3, nms_thre=0.45, pre_nms_topk=1000):
+        super().__init__()
+        self.model = model
+        self.model.head.decode_in_inference = True
+        self.max_det = max_det
+        self.conf_thre = conf_thre
+        self.nms_thre = nms_thre
+        self.pre_nms_topk = pre_nms_topk
+
+    def forward(self, x):
+        outputs = self.model(x)
+        num_anchors, num_classes = outputs.shape[1], outputs.shape[2] - 5
+
+        boxes = torch.cat([
+            outputs[..., :2] - outputs[..., 2:4] / 2,
+            outputs[..., :2] + outputs[..., 2:4] / 2,
+        ], dim=-1)
+        scores = outputs[..., 4:5] * outputs[..., 5:]
+
+        # only keep the best anchors before NMS
+        topk = min(self.pre_nms_topk, num_anchors)
+        _, topk_idx = scores.max(dim=2)[0].topk(topk, dim=1)
+        boxes = boxes.gather(1, topk_idx.unsqueeze(-1).expand(-1, -1, 4))
+        scores = scores.gather(1, topk_idx.unsqueeze(-1).expand(-1, -1, num_classes))
+        scores = scores.transpose(1, 2).contiguous()
+
+        selected = ONNXNMS.apply(boxes, scores, self.max_det, self.nms_thre, self.conf_thre)
+
+        # scatter the kept boxes back into a dense mask, so that the rest stays static shaped
+        keep = torch.zeros_like(scores)
+        keep[selected[:, 0], selected[:, 1], selected[:, 2]] = 1.0
+        scores = (scores * keep).flatten(1)
+
+        det_scores, det_idx = scores.topk(min(self.max_det, scores.shape[1]), dim=1)
+        det_cls = torch.div(det_idx, topk, rounding_mode="floor")
+        det_boxes = boxes.gather(1, (det_idx - det_cls * topk).unsqueeze(-1).expand(-1, -1, 4))
+        dets = torch.cat([det_boxes, det_scores.unsqueeze(-1), det_cls.unsqueeze(-1).float()], -1)
+        return dets * (det_scores > 0).unsqueeze(-1).float()
@@ -14,6 +14,31 @@ class SiLU(nn.Module):
         return x * torch.sigmoid(x)
 
 
+class InputNorm(nn.Module):
+    """
+    Cast image batches to float on the device, the first op for uint8 data.
+
+    Args:
+        legacy (bool): also apply the BGR -> RGB flip and the ImageNet mean/std
+            normalization of `ValTransform(legacy=True)`. Default value: False.
+    """
+
+    def __init__(self, legacy=False):
+        super().__init__()
+        self.legacy = legacy
+        # buffers are not persistent so that checkpoints stay loadable in both modes
+        mean = torch.tensor([0.485, 0.456, 0.406]).view(1, 3, 1, 1) * 255
+        std = torch.tensor([0.229, 0.224, 0.225]).view(1, 3, 1, 1) * 255
+        self.register_buffer("mean", mean, persistent=False)
+        self.register_buffer("std", std, persistent=False)
+
+    def forward(self, x):
+        x = x.to(self.mean.dtype)
+        if self.legacy:
+            x = (x.flip(1) - self.mean) / self.std
+        return x
+
+
 def get_activation(name="silu", inplace=True):
     if name == "silu":
         module = nn.SiLU(inplace=inplace)
@@ -208,3 +233,7 @@ class Focus(nn.Module):
             dim=1,
         )
         return self.conv(x)
+
+    def fuseforward(self, x):
+        # slicing folded into the weights of a strided conv by `fuse_model`
+        return self.conv(x)
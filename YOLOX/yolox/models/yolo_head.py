@@ -9,7 +9,7 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
-from yolox.utils import bboxes_iou, cxcywh2xyxy, meshgrid, visualize_assign
+from yolox.utils import cxcywh_to_xyxy, meshgrid, pairwise_iou
 
 from .losses import IOUloss
 from .network_blocks import BaseConv, DWConv
@@ -121,6 +121,8 @@ class YOLOXHead(nn.Module):
                 )
             )
 
+        # reg_preds and obj_preds merged into a single conv per level by `fuse_model`
+        self.reg_obj_preds = None
         self.use_l1 = False
         self.l1_loss = nn.L1Loss(reduction="none")
         self.bcewithlog_loss = nn.BCEWithLogitsLoss(reduction="none")
@@ -157,8 +159,12 @@ class YOLOXHead(nn.Module):
             cls_output = self.cls_preds[k](cls_feat)
 
             reg_feat = reg_conv(reg_x)
-            reg_output = self.reg_preds[k](reg_feat)
-            obj_output = self.obj_preds[k](reg_feat)
+            if self.reg_obj_preds is not None:
+                reg_obj_output = self.reg_obj_preds[k](reg_feat)
+                reg_output, obj_output = reg_obj_output[:, :4], reg_obj_output[:, 4:]
+            else:
+                reg_output = self.reg_preds[k](reg_feat)
+                obj_output = self.obj_preds[k](reg_feat)
 
             if self.training:
                 output = torch.cat([reg_output, obj_output, cls_output], 1)
@@ -460,7 +466,9 @@ class YOLOXHead(nn.Module):
             gt_bboxes_per_image = gt_bboxes_per_image.cpu()
             bboxes_preds_per_image = bboxes_preds_per_image.cpu()
 
-        pair_wise_ious = bboxes_iou(gt_bboxes_per_image, bboxes_preds_per_image, False)
+        pair_wise_ious = pairwise_iou(
+            gt_bboxes_per_image, bboxes_preds_per_image, fmt="cxcywh"
+        )
 
         gt_cls_per_image = (
             F.one_hot(gt_classes.to(torch.int64), self.num_classes)
@@ -576,6 +584,8 @@ class YOLOXHead(nn.Module):
         return num_fg, gt_matched_classes, pred_ious_this_matching, matched_gt_inds
 
     def visualize_assign_result(self, xin, labels=None, imgs=None, save_prefix="assign_vis_"):
+        from yolox.utils import visualize_assign
+
         # original forward logic
         outputs, x_shifts, y_shifts, expanded_strides = [], [], [], []
         # TODO: use forward logic here.
@@ -590,8 +600,12 @@ class YOLOXHead(nn.Module):
             cls_feat = cls_conv(cls_x)
             cls_output = self.cls_preds[k](cls_feat)
             reg_feat = reg_conv(reg_x)
-            reg_output = self.reg_preds[k](reg_feat)
-            obj_output = self.obj_preds[k](reg_feat)
+            if self.reg_obj_preds is not None:
+                reg_obj_output = self.reg_obj_preds[k](reg_feat)
+                reg_output, obj_output = reg_obj_output[:, :4], reg_obj_output[:, 4:]
+            else:
+                reg_output = self.reg_preds[k](reg_feat)
+                obj_output = self.obj_preds[k](reg_feat)
 
             output = torch.cat([reg_output, obj_output, cls_output], 1)
             output, grid = self.get_output_and_grid(output, k, stride_this_level, xin[0].type())
@@ -635,7 +649,7 @@ class YOLOXHead(nn.Module):
                 ((y_shifts + 0.5) * expanded_strides).flatten()[fg_mask],
             ], 1)
 
-            xyxy_boxes = cxcywh2xyxy(gt_bboxes_per_image)
+            xyxy_boxes = cxcywh_to_xyxy(gt_bboxes_per_image)
             save_name = save_prefix + str(batch_idx) + ".png"
             img = visualize_assign(img, xyxy_boxes, coords, matched_gt_inds, save_name)
             logger.info(f"save img to {save_name}")
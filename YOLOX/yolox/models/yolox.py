@@ -24,8 +24,12 @@ class YOLOX(nn.Module):
 
         self.backbone = backbone
         self.head = head
+        # optional `InputNorm`, set it when feeding uint8 images
+        self.input_norm = None
 
     def forward(self, x, targets=None):
+        if self.input_norm is not None:
+            x = self.input_norm(x)
         # fpn output content features of [dark3, dark4, dark5]
         fpn_outs = self.backbone(x)
 
@@ -48,5 +52,7 @@ class YOLOX(nn.Module):
         return outputs
 
     def visualize(self, x, targets, save_prefix="assign_vis_"):
+        if self.input_norm is not None:
+            x = self.input_norm(x)
         fpn_outs = self.backbone(x)
         self.head.visualize_assign_result(fpn_outs, targets, x, save_prefix)
@@ -1,17 +1,54 @@
 #!/usr/bin/env python3
 # Copyright (c) Megvii Inc. All rights reserved.
 
-from .allreduce_norm import *
-from .boxes import *
-from .checkpoint import load_ckpt, save_checkpoint
-from .compat import meshgrid
-from .demo_utils import *
-from .dist import *
-from .ema import *
-from .logger import WandbLogger, setup_logger
-from .lr_scheduler import LRScheduler
-from .metric import *
-from .mlflow_logger import MlflowLogger
-from .model_utils import *
-from .setup_env import *
-from .visualize import *
+from .lazy_import import lazy_attach
+
+# submodules are only imported on first use of one of their attributes, so that
+# importing yolox.utils does not pull in cv2, torchvision, psutil or the loggers
+__getattr__, __dir__, __all__ = lazy_attach(__name__, {
+    "allreduce_norm": [
+        "get_async_norm_states", "pyobj2tensor", "tensor2pyobj", "all_reduce", "all_reduce_norm",
+    ],
+    "box_ops": [
+        "xyxy_to_cxcywh", "cxcywh_to_xyxy", "xyxy_to_xywh", "scale_boxes", "pairwise_iou",
+    ],
+    "boxes": [
+        "filter_box", "postprocess", "bboxes_iou", "matrix_iou", "adjust_box_anns", "xyxy2xywh",
+        "xyxy2cxcywh", "cxcywh2xyxy",
+    ],
+    "checkpoint": ["load_ckpt", "save_checkpoint"],
+    "compat": ["meshgrid"],
+    "demo_utils": [
+        "mkdir", "nms", "multiclass_nms", "demo_postprocess", "random_color", "visualize_assign",
+    ],
+    "dist": [
+        "get_num_devices", "wait_for_the_master", "is_main_process", "synchronize",
+        "get_world_size", "get_rank", "get_local_rank", "get_local_size", "time_synchronized",
+        "gather", "all_gather",
+    ],
+    "ema": ["ModelEMA", "is_parallel"],
+    "logger": ["WandbLogger", "setup_logger"],
+    "lr_scheduler": ["LRScheduler"],
+    "metric": [
+        "AverageMeter", "MeterBuffer", "get_total_and_free_memory_in_Mb", "occupy_mem",
+        "gpu_mem_usage", "mem_usage",
+    ],
+    "mlflow_logger": ["MlflowLogger"],
+    "model_cache": ["MODEL_CACHE_DIR", "file_digest", "model_cache_key", "load_cached_model"],
+    "model_profiler": ["PROFILE_CACHE_DIR", "profile_model", "format_profile"],
+    "model_utils": [
+        "fuse_conv_and_bn", "fuse_focus_conv", "merge_convs", "fuse_model", "get_model_info",
+        "replace_module", "freeze_module", "adjust_status",
+    ],
+    "ort_model": ["ORTModel", "get_ort_model"],
+    "pruning": [
+        "channel_groups", "bn_gamma_importance", "bn_taylor_importance", "keep_bn_stats",
+        "prune_channels", "get_pruned_channels", "apply_pruned_channels",
+    ],
+    "rng": ["counter_rng", "global_rng"],
+    "roi": ["roi_region", "roi_input_size"],
+    "setup_env": ["configure_nccl", "configure_module", "configure_omp"],
+    "tiling": ["tile_offsets", "tile_image", "merge_tiles", "weighted_box_fusion"],
+    "tracking": ["BoxTracker", "DetectionScheduler", "frame_motion"],
+    "visualize": ["vis"],
+})
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# Copyright (c) Megvii Inc. All rights reserved.
+
+import numpy as np
+
+import torch
+
+__all__ = [
+    "xyxy_to_cxcywh",
+    "cxcywh_to_xyxy",
+    "xyxy_to_xywh",
+    "scale_boxes",
+    "pairwise_iou",
+]
+
+IOU_MODES = ("iou", "giou", "diou")
+
+# Box kernels shared by numpy arrays and torch tensors. The conversions work on
+# pairs of columns instead of one column at a time, written straight into `out`,
+# and only read the columns of the input they have not written yet, so `out` may be
+# the input itself to convert in place.
+
+
+def _is_tensor(x):
+    return isinstance(x, torch.Tensor)
+
+
+def _empty(like, shape):
+    if _is_tensor(like):
+        return like.new_empty(shape)
+    return np.empty(shape, dtype=like.dtype)
+
+
+def _as_array_like(like, values):
+    if _is_tensor(like):
+        return torch.as_tensor(values, dtype=like.dtype, device=like.device)
+    return np.asarray(values, dtype=like.dtype)
+
+
+def _minimum(a, b):
+    return torch.minimum(a, b) if _is_tensor(a) else np.minimum(a, b)
+
+
+def _maximum(a, b):
+    return torch.maximum(a, b) if _is_tensor(a) else np.maximum(a, b)
+
+
+def _clip_(x, low=None, high=None):
+    """Clip `x` in place, `high` may be an array broadcasting against it."""
+    if _is_tensor(x):
+        if low is not None:
+            x.clamp_(min=low)
+        if high is not None:
+            torch.minimum(x, torch.as_tensor(high, dtype=x.dtype, device=x.device), out=x)
+    else:
+        np.clip(x, low, high, out=x)
+    return x
+
+
+def _sub(a, b, out):
+    return torch.sub(a, b, out=out) if _is_tensor(out) else np.subtract(a, b, out=out)
+
+
+def _add(a, b, out):
+    return torch.add(a, b, out=out) if _is_tensor(out) else np.add(a, b, out=out)
+
+
+def _output(boxes, out):
+    return _empty(boxes, (*boxes.shape[:-1], 4)) if out is None else out
+
+
+def xyxy_to_cxcywh(boxes, out=None):
+    """
+    Convert `[..., 4+]` boxes from (x1, y1, x2, y2) to (cx, cy, w, h).
+
+    Args:
+        boxes (np.ndarray or torch.Tensor): boxes, only the first 4 columns are read.
+        out (np.ndarray or torch.Tensor, optional): `[..., 4+]` output, whose first 4
+            columns are written. It may be `boxes`. Defaults to a new `[..., 4]` array.
+
+    Returns:
+        np.ndarray or torch.Tensor: `out`.
+    """
+    out = _output(boxes, out)
+    _sub(boxes[..., 2:4], boxes[..., 0:2], out[..., 2:4])
+    _add(boxes[..., 0:2], out[..., 2:4] * 0.5, out[..., 0:2])
+    return out
+
+
+def cxcywh_to_xyxy(boxes, out=None):
+    """
+    Convert `[..., 4+]` boxes from (cx, cy, w, h) to (x1, y1, x2, y2).
+    Same arguments as :func:`xyxy_to_cxcywh`.
+    """
+    out = _output(boxes, out)
+    _sub(boxes[..., 0:2], boxes[..., 2:4] * 0.5, out[..., 0:2])
+    _add(out[..., 0:2], boxes[..., 2:4], out[..., 2:4])
+    return out
+
+
+def xyxy_to_xywh(boxes, out=None):
+    """
+    Convert `[..., 4+]` boxes from (x1, y1, x2, y2) to (x1, y1, w, h), e.g. for COCO.
+    Same arguments as :func:`xyxy_to_cxcywh`.
+    """
+    out = _output(boxes, out)
+    _sub(boxes[..., 2:4], boxes[..., 0:2], out[..., 2:4])
+    if out is not boxes:
+        out[..., 0:2] = boxes[..., 0:2]
+    return out
+
+
+def scale_boxes(boxes, scale, offset=(0, 0), clip=None, out=None):
+    """
+    Map `[..., 4+]` xyxy boxes to `boxes * scale + offset` in one pass over the
+    coordinates, optionally clipped to an image.
+
+    Args:
+        boxes (np.ndarray or torch.Tensor): xyxy boxes, only the first 4 columns are read.
+        scale (float): scale of the coordinates.
+        offset (tuple): (x, y) offset added after scaling.
+        clip (tuple, optional): (width, height) the boxes are clipped to, from 0.
+        out (np.ndarray or torch.Tensor, optional): output, as for :func:`xyxy_to_cxcywh`.
+
+    Returns:
+        np.ndarray or torch.Tensor: `out`.
+    """
+    scaled = boxes[..., 0:4] * scale
+    scaled += _as_array_like(scaled, (*offset, *offset))
+    if clip is not None:
+        _clip_(scaled, 0, (*clip, *clip))
+    if out is None:
+        return scaled
+    out[..., 0:4] = scaled
+    return out
+
+
+def _as_floating(boxes):
+    if _is_tensor(boxes):
+        return boxes if boxes.is_floating_point() else boxes.float()
+    return boxes if np.issubdtype(boxes.dtype, np.floating) else boxes.astype(np.float32)
+
+
+def _corners(boxes):
+    # centered corners, unlike cxcywh_to_xyxy which adds the size to the top left
+    half = boxes[:, 2:4] * 0.5
+    return _concatenate([boxes[:, 0:2] - half, boxes[:, 0:2] + half])
+
+
+def _concatenate(columns):
+    return torch.cat(columns, 1) if _is_tensor(columns[0]) else np.concatenate(columns, 1)
+
+
+def pairwise_iou(boxes_a, boxes_b, fmt="xyxy", mode="iou", chunk_size=None, out=None):
+    """
+    IoU of every pair of boxes of `boxes_a` and `boxes_b`.
+
+    The intersection is computed one axis at a time and clamped at 0, so besides the
+    output only about four `[chunk_size, M]` temporaries are alive at once, instead of
+    the `[N, M, 2]` corners and overlap mask of a broadcast implementation.
+
+    Args:
+        boxes_a (np.ndarray or torch.Tensor): `[N, 4]` boxes.
+        boxes_b (np.ndarray or torch.Tensor): `[M, 4]` boxes, of the same kind as `boxes_a`.
+        fmt (str): "xyxy" or "cxcywh", the format of both box sets.
+        mode (str): "iou", "giou" (generalized IoU) or "diou" (distance IoU).
+        chunk_size (int, optional): rows of `boxes_a` processed per pass, to bound the
+            memory of the temporaries for large N x M. Defaults to all rows at once.
+        out (np.ndarray or torch.Tensor, optional): `[N, M]` output.
+
+    Returns:
+        np.ndarray or torch.Tensor: `[N, M]` ious.
+    """
+    if boxes_a.shape[-1] != 4 or boxes_b.shape[-1] != 4:
+        raise IndexError("expected [N, 4] boxes, got {} and {}".format(
+            tuple(boxes_a.shape), tuple(boxes_b.shape)
+        ))
+    if mode not in IOU_MODES:
+        raise ValueError("Unknown iou mode {}, expected one of {}".format(mode, IOU_MODES))
+    boxes_a, boxes_b = _as_floating(boxes_a), _as_floating(boxes_b)
+    if fmt == "cxcywh":
+        area_a = boxes_a[:, 2] * boxes_a[:, 3]
+        area_b = boxes_b[:, 2] * boxes_b[:, 3]
+        boxes_a, boxes_b = _corners(boxes_a), _corners(boxes_b)
+    elif fmt == "xyxy":
+        area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+        area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    else:
+        raise ValueError("Unknown box format {}".format(fmt))
+
+    num_a, num_b = boxes_a.shape[0], boxes_b.shape[0]
+    if out is None:
+        out = _empty(boxes_a, (num_a, num_b))
+    chunk_size = chunk_size or max(num_a, 1)
+    for start in range(0, num_a, chunk_size):
+        end = start + chunk_size
+        _pairwise_iou(
+            boxes_a[start:end], area_a[start:end], boxes_b, area_b, mode, out[start:end]
+        )
+    return out
+
+
+def _pairwise_iou(boxes_a, area_a, boxes_b, area_b, mode, out):
+    a, b = boxes_a[:, None], boxes_b
+
+    inter = _minimum(a[..., 2], b[:, 2])
+    inter -= _maximum(a[..., 0], b[:, 0])
+    _clip_(inter, 0)
+    height = _minimum(a[..., 3], b[:, 3])
+    height -= _maximum(a[..., 1], b[:, 1])
+    inter *= _clip_(height, 0)
+    union = area_a[:, None] + area_b
+    union -= inter
+    inter /= union
+    out[...] = inter
+    if mode == "iou":
+        return
+
+    # sides of the smallest box enclosing both boxes
+    width = _maximum(a[..., 2], b[:, 2])
+    width -= _minimum(a[..., 0], b[:, 0])
+    height = _maximum(a[..., 3], b[:, 3])
+    height -= _minimum(a[..., 1], b[:, 1])
+    if mode == "giou":
+        enclosing = width * height
+        penalty = enclosing - union
+        penalty /= _clip_(enclosing, 1e-16)
+    else:
+        # squared distance of the centers over the squared diagonal of the enclosing box
+        diagonal = width * width
+        diagonal += height * height
+        dx = (a[..., 0] + a[..., 2]) - (b[:, 0] + b[:, 2])
+        dy = (a[..., 1] + a[..., 3]) - (b[:, 1] + b[:, 3])
+        penalty = dx * dx
+        penalty += dy * dy
+        penalty /= _clip_(diagonal * 4, 1e-16)
+    out -= penalty
@@ -4,7 +4,8 @@
 import numpy as np
 
 import torch
-import torchvision
+
+from .box_ops import cxcywh_to_xyxy, pairwise_iou, scale_boxes, xyxy_to_cxcywh, xyxy_to_xywh
 
 __all__ = [
     "filter_box",
@@ -30,6 +31,9 @@ def filter_box(output, scale_range):
 
 
 def postprocess(prediction, num_classes, conf_thre=0.7, nms_thre=0.45, class_agnostic=False):
+    # torchvision takes seconds to import, the models do not need it
+    import torchvision
+
     box_corner = prediction.new(prediction.shape)
     box_corner[:, :, 0] = prediction[:, :, 0] - prediction[:, :, 2] / 2
     box_corner[:, :, 1] = prediction[:, :, 1] - prediction[:, :, 3] / 2
@@ -77,29 +81,7 @@ def postprocess(prediction, num_classes, conf_thre=0.7, nms_thre=0.45, class_agn
 
 
 def bboxes_iou(bboxes_a, bboxes_b, xyxy=True):
-    if bboxes_a.shape[1] != 4 or bboxes_b.shape[1] != 4:
-        raise IndexError
-
-    if xyxy:
-        tl = torch.max(bboxes_a[:, None, :2], bboxes_b[:, :2])
-        br = torch.min(bboxes_a[:, None, 2:], bboxes_b[:, 2:])
-        area_a = torch.prod(bboxes_a[:, 2:] - bboxes_a[:, :2], 1)
-        area_b = torch.prod(bboxes_b[:, 2:] - bboxes_b[:, :2], 1)
-    else:
-        tl = torch.max(
-            (bboxes_a[:, None, :2] - bboxes_a[:, None, 2:] / 2),
-            (bboxes_b[:, :2] - bboxes_b[:, 2:] / 2),
-        )
-        br = torch.min(
-            (bboxes_a[:, None, :2] + bboxes_a[:, None, 2:] / 2),
-            (bboxes_b[:, :2] + bboxes_b[:, 2:] / 2),
-        )
-
-        area_a = torch.prod(bboxes_a[:, 2:], 1)
-        area_b = torch.prod(bboxes_b[:, 2:], 1)
-    en = (tl < br).type(tl.type()).prod(dim=2)
-    area_i = torch.prod(br - tl, 2) * en  # * ((tl < br).all())
-    return area_i / (area_a[:, None] + area_b - area_i)
+    return pairwise_iou(bboxes_a, bboxes_b, "xyxy" if xyxy else "cxcywh")
 
 
 def matrix_iou(a, b):
@@ -115,29 +97,18 @@ def matrix_iou(a, b):
     return area_i / (area_a[:, np.newaxis] + area_b - area_i + 1e-12)
 
 
+# the conversions below modify their input in place, see box_ops for the out= versions
 def adjust_box_anns(bbox, scale_ratio, padw, padh, w_max, h_max):
-    bbox[:, 0::2] = np.clip(bbox[:, 0::2] * scale_ratio + padw, 0, w_max)
-    bbox[:, 1::2] = np.clip(bbox[:, 1::2] * scale_ratio + padh, 0, h_max)
-    return bbox
+    return scale_boxes(bbox, scale_ratio, (padw, padh), (w_max, h_max), out=bbox)
 
 
 def xyxy2xywh(bboxes):
-    bboxes[:, 2] = bboxes[:, 2] - bboxes[:, 0]
-    bboxes[:, 3] = bboxes[:, 3] - bboxes[:, 1]
-    return bboxes
+    return xyxy_to_xywh(bboxes, out=bboxes)
 
 
 def xyxy2cxcywh(bboxes):
-    bboxes[:, 2] = bboxes[:, 2] - bboxes[:, 0]
-    bboxes[:, 3] = bboxes[:, 3] - bboxes[:, 1]
-    bboxes[:, 0] = bboxes[:, 0] + bboxes[:, 2] * 0.5
-    bboxes[:, 1] = bboxes[:, 1] + bboxes[:, 3] * 0.5
-    return bboxes
+    return xyxy_to_cxcywh(bboxes, out=bboxes)
 
 
 def cxcywh2xyxy(bboxes):
-    bboxes[:, 0] = bboxes[:, 0] - bboxes[:, 2] * 0.5
-    bboxes[:, 1] = bboxes[:, 1] - bboxes[:, 3] * 0.5
-    bboxes[:, 2] = bboxes[:, 0] + bboxes[:, 2]
-    bboxes[:, 3] = bboxes[:, 1] + bboxes[:, 3]
-    return bboxes
+    return cxcywh_to_xyxy(bboxes, out=bboxes)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii Inc. All rights reserved.
+
+import importlib
+import sys
+
+__all__ = ["lazy_attach"]
+
+
+def lazy_attach(package, submodule_attrs):
+    """
+    Module level ``__getattr__`` and ``__dir__`` (PEP 562) of a package, which import the
+    submodule of an attribute on its first access instead of when the package is imported.
+    Use it in the ``__init__`` of the package as::
+
+        __getattr__, __dir__, __all__ = lazy_attach(__name__, {"boxes": ["postprocess"]})
+
+    Args:
+        package (str): ``__name__`` of the package.
+        submodule_attrs (dict): names of the attributes of the package by relative name of
+            the submodule defining them. Submodules are attributes of the package as well,
+            unless an attribute has the same name, like `yolox.core.launch`.
+
+    Returns:
+        tuple: ``__getattr__``, ``__dir__`` and ``__all__`` of the package.
+    """
+    attr_to_module = {
+        attr: module for module, attrs in submodule_attrs.items() for attr in attrs
+    }
+    __all__ = list(attr_to_module)
+
+    def __getattr__(name):
+        if name in attr_to_module:
+            module = importlib.import_module("." + attr_to_module[name], package)
+            value = getattr(module, name)
+            # later accesses are plain module attribute lookups. This also replaces the
+            # submodule of the same name, set on the package by its import.
+            setattr(sys.modules[package], name, value)
+            return value
+        if name in submodule_attrs:
+            return importlib.import_module("." + name, package)
+        raise AttributeError("module {!r} has no attribute {!r}".format(package, name))
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[package])) | set(__all__) | set(submodule_attrs))
+
+    return __getattr__, __dir__, __all__
@@ -49,6 +49,8 @@ def gpu_mem_usage():
     """
     Compute the GPU memory usage for the current device (MB).
     """
+    if not torch.cuda.is_available():
+        return 0.0
     mem_usage_bytes = torch.cuda.max_memory_allocated()
     return mem_usage_bytes / (1024 * 1024)
 
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii Inc. All rights reserved.
+
+import contextlib
+import functools
+import glob
+import hashlib
+import inspect
+import os
+import pprint
+
+import torch
+
+import yolox
+
+from .model_utils import fuse_model
+
+__all__ = ["MODEL_CACHE_DIR", "file_digest", "model_cache_key", "load_cached_model"]
+
+MODEL_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "yolox", "models")
+
+
+def file_digest(file_name):
+    """sha1 of the content of `file_name`, read by chunks."""
+    digest = hashlib.sha1()
+    with open(file_name, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _code_digest():
+    """sha1 of the yolox code which gets traced: the models and the fusing of their convs."""
+    from yolox import models
+
+    models_dir = os.path.dirname(models.__file__)
+    files = sorted(glob.glob(os.path.join(models_dir, "*.py")))
+    files.append(os.path.join(os.path.dirname(__file__), "model_utils.py"))
+    return hashlib.sha1("".join(file_digest(f) for f in files).encode()).hexdigest()
+
+
+def model_cache_key(exp, ckpt_file, fuse=True, device="cpu", half=False):
+    """
+    Key of the compiled model of an exp and checkpoint: hash of the source file of the
+    exp, its plain config values (so that command line opts are included), the checkpoint
+    content, the test size, the build options, the yolox version and model code, and the
+    torch version. Code the models import from elsewhere is not part of the key, clear
+    the cache by hand after changing it.
+    """
+    # thresholds only matter to postprocess, which runs outside of the model
+    config = {
+        k: v for k, v in vars(exp).items()
+        if not k.startswith("_") and k not in ("test_conf", "nmsthre")
+        and isinstance(v, (bool, int, float, str, tuple, list, dict))
+    }
+    key = [
+        file_digest(inspect.getfile(type(exp))),
+        pprint.pformat(config),
+        file_digest(ckpt_file),
+        tuple(exp.test_size),
+        fuse,
+        str(device),
+        half,
+        yolox.__version__,
+        _code_digest(),
+        torch.__version__,
+    ]
+    return hashlib.sha1(repr(key).encode()).hexdigest()
+
+
+def load_cached_model(exp, ckpt_file, fuse=True, device="cpu", half=False,
+                      cache_dir=MODEL_CACHE_DIR):
+    """
+    Load the eval model of `exp` with the weights of `ckpt_file` as a frozen TorchScript
+    module traced at `exp.test_size`, from `cache_dir` if a previous process stored it there.
+    Otherwise the eager model is built, loaded, fused, traced and frozen, and then stored so
+    that later processes skip all of it. Being traced, the module only runs at
+    `exp.test_size`, and being frozen, it has no parameters: its inputs must already be on
+    `device` and in fp16 if `half`.
+
+    Args:
+        exp (Exp): experiment of the model.
+        ckpt_file (str): checkpoint of the model.
+        fuse (bool): fuse the convs and batchnorms before tracing.
+        device (str or torch.device): device of the model.
+        half (bool): trace the fp16 model.
+        cache_dir (str): where to cache compiled models.
+
+    Returns:
+        torch.jit.ScriptModule: the model.
+        bool: whether it was loaded from the cache.
+    """
+    key = model_cache_key(exp, ckpt_file, fuse, device, half)
+    cache_file = os.path.join(cache_dir, "{}.pt".format(key))
+    if os.path.exists(cache_file):
+        return torch.jit.load(cache_file, map_location=device), True
+
+    model = exp.get_model()
+    ckpt = torch.load(ckpt_file, map_location="cpu")
+    model.load_state_dict(ckpt["model"] if "model" in ckpt else ckpt)
+    model = model.to(device).eval()
+    if fuse:
+        model = fuse_model(model)
+    if half:
+        model = model.half()
+
+    x = torch.zeros(
+        1, 3, exp.test_size[0], exp.test_size[1],
+        device=device, dtype=torch.float16 if half else torch.float32,
+    )
+    with torch.no_grad():
+        # weights become constants of the graph, which loads much faster
+        traced = torch.jit.freeze(torch.jit.trace(model, x))
+
+    with contextlib.suppress(OSError):
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_file = "{}.{}".format(cache_file, os.getpid())
+        traced.save(tmp_file)
+        os.replace(tmp_file, cache_file)
+    return traced, False
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii Inc. All rights reserved.
+
+import contextlib
+import hashlib
+import json
+import os
+import platform
+import time
+from typing import Dict, Sequence
+
+import torch
+import torch.nn as nn
+
+from .model_utils import adjust_status
+
+__all__ = ["PROFILE_CACHE_DIR", "profile_model", "format_profile"]
+
+PROFILE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "yolox", "profile")
+# bumped when the counting changes, so that cached profiles are computed again
+_PROFILE_VERSION = 2
+
+
+def _profiled_names(model: nn.Module) -> Sequence[str]:
+    """
+    Names of the CSPDarknet, YOLOPAFPN and YOLOXHead of the model and of their children,
+    with the items of children module lists, in the order of ``named_modules``.
+    """
+    from yolox.models import CSPDarknet, YOLOPAFPN, YOLOXHead
+
+    names = set()
+    for name, m in model.named_modules():
+        if isinstance(m, (CSPDarknet, YOLOPAFPN, YOLOXHead)):
+            names.add(name)
+            for child_name, child in m.named_children():
+                child_name = "{}.{}".format(name, child_name)
+                if isinstance(child, nn.ModuleList):
+                    names.update("{}.{}".format(child_name, i) for i in range(len(child)))
+                else:
+                    names.add(child_name)
+    return [name for name, _ in model.named_modules() if name in names]
+
+
+def _architecture_hash(model, tsize, batch_sizes, iters) -> str:
+    param = next(model.parameters())
+    key = [
+        repr(model), tuple(tsize), tuple(batch_sizes), iters, str(param.device), str(param.dtype),
+        torch.__version__, torch.get_num_threads(), platform.node(), platform.processor(),
+        _PROFILE_VERSION,
+    ]
+    return hashlib.sha1(repr(key).encode()).hexdigest()
+
+
+def _sync(device):
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+
+
+def _count(model, img, names):
+    """FLOPs of the convs and bytes of the outputs of the leaf modules, summed per module."""
+    stats = {name: {"flops": 0, "activations": 0} for name in names}
+
+    def hook_fn(leaf_name):
+        owners = [
+            n for n in names if n == "" or n == leaf_name or leaf_name.startswith(n + ".")
+        ]
+
+        def hook(module, inputs, output):
+            if not isinstance(output, torch.Tensor):
+                return
+            flops = 0
+            if isinstance(module, nn.Conv2d):
+                # multiply-adds of the conv, times 2 to count flops
+                kernel_size = module.kernel_size[0] * module.kernel_size[1]
+                flops = 2 * output.numel() * kernel_size * module.in_channels // module.groups
+            for n in owners:
+                stats[n]["flops"] += flops
+                stats[n]["activations"] += output.numel() * output.element_size()
+        return hook
+
+    handles = [
+        m.register_forward_hook(hook_fn(name))
+        for name, m in model.named_modules() if len(list(m.children())) == 0
+    ]
+    try:
+        model(img)
+    finally:
+        for handle in handles:
+            handle.remove()
+    return stats
+
+
+def _time(model, img, names, iters):
+    """Mean wall time of each module in ms, the modules not run are left out."""
+    starts, times = {}, {}
+
+    def start(name):
+        def hook(module, inputs):
+            _sync(img.device)
+            starts[name] = time.perf_counter()
+        return hook
+
+    def stop(name):
+        def hook(module, inputs, output):
+            _sync(img.device)
+            times[name] = times.get(name, 0.0) + time.perf_counter() - starts[name]
+        return hook
+
+    modules = dict(model.named_modules())
+    handles = []
+    for name in names[1:]:
+        handles.append(modules[name].register_forward_pre_hook(start(name)))
+        handles.append(modules[name].register_forward_hook(stop(name)))
+    try:
+        for _ in range(iters):
+            model(img)
+    finally:
+        for handle in handles:
+            handle.remove()
+
+    # whole model, without the overhead of the hooks
+    _sync(img.device)
+    begin = time.perf_counter()
+    for _ in range(iters):
+        model(img)
+    _sync(img.device)
+    times[""] = time.perf_counter() - begin
+    return {name: 1000 * t / iters for name, t in times.items()}
+
+
+def _profile_batch(model, img, names, iters, warmup):
+    stats = _count(model, img, names)
+    for _ in range(warmup):
+        model(img)
+    times = _time(model, img, names, iters)
+    return {name: dict(stats[name], time=times[name]) for name in names if name in times}
+
+
+def profile_model(
+    model: nn.Module,
+    tsize: Sequence[int],
+    batch_sizes: Sequence[int] = (1,),
+    iters: int = 5,
+    warmup: int = 1,
+    cache_dir: str = PROFILE_CACHE_DIR,
+) -> Dict:
+    """
+    Profile the model at its real input size, with forward hooks on CSPDarknet, YOLOPAFPN,
+    YOLOXHead and their children. The model runs in eval mode on its own device and dtype,
+    and is not copied. Results are cached in ``cache_dir`` under a hash of the architecture,
+    input sizes and machine, so that later calls return without running the model.
+
+    Args:
+        model (nn.Module): model to profile.
+        tsize (Sequence[int]): (height, width) of the input.
+        batch_sizes (Sequence[int]): batch sizes to profile.
+        iters (int): timed forwards per batch size.
+        warmup (int): untimed forwards per batch size.
+        cache_dir (str): where to cache results, None to disable the cache.
+
+    Returns:
+        dict: "params" of each module, and for each batch size, the "flops", "activations"
+        (bytes of leaf module outputs) and wall "time" (ms) of each module. Module ""
+        is the whole model.
+    """
+    cache_file = None
+    if cache_dir is not None:
+        key = _architecture_hash(model, tsize, batch_sizes, iters)
+        cache_file = os.path.join(cache_dir, "{}.json".format(key))
+        if os.path.exists(cache_file):
+            with open(cache_file) as f:
+                return json.load(f)
+
+    names = [""] + _profiled_names(model)
+    modules = dict(model.named_modules())
+    result = {
+        "params": {n: sum(p.numel() for p in modules[n].parameters()) for n in names},
+        "batches": {},
+    }
+    param = next(model.parameters())
+    with torch.no_grad(), adjust_status(model, training=False):
+        for batch_size in batch_sizes:
+            img = torch.zeros(
+                (batch_size, 3, tsize[0], tsize[1]), device=param.device, dtype=param.dtype
+            )
+            result["batches"][str(batch_size)] = _profile_batch(model, img, names, iters, warmup)
+    result["params"] = {
+        name: params for name, params in result["params"].items()
+        if any(name in stats for stats in result["batches"].values())
+    }
+
+    if cache_file is not None:
+        with contextlib.suppress(OSError):
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_file = "{}.{}".format(cache_file, os.getpid())
+            with open(tmp_file, "w") as f:
+                json.dump(result, f)
+            os.replace(tmp_file, cache_file)
+    return result
+
+
+def format_profile(profile: Dict) -> str:
+    """Table of a :func:`profile_model` result, one row per module and batch size."""
+    rows = ["{:<40} {:>5} {:>9} {:>9} {:>12} {:>10}".format(
+        "module", "batch", "params(M)", "GFLOPs", "act(MB)", "time(ms)"
+    )]
+    for batch_size, stats in profile["batches"].items():
+        for name, stat in stats.items():
+            rows.append("{:<40} {:>5} {:>9.2f} {:>9.2f} {:>12.1f} {:>10.2f}".format(
+                name or "total",
+                batch_size,
+                profile["params"][name] / 1e6,
+                stat["flops"] / 1e9,
+                stat["activations"] / 2 ** 20,
+                stat["time"],
+            ))
+    return "\n".join(rows)
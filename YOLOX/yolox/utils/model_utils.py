@@ -3,7 +3,6 @@
 # Copyright (c) Megvii Inc. All rights reserved.
 
 import contextlib
-from copy import deepcopy
 from typing import Sequence
 
 import torch
@@ -11,6 +10,8 @@ import torch.nn as nn
 
 __all__ = [
     "fuse_conv_and_bn",
+    "fuse_focus_conv",
+    "merge_convs",
     "fuse_model",
     "get_model_info",
     "replace_module",
@@ -20,15 +21,14 @@ __all__ = [
 
 
 def get_model_info(model: nn.Module, tsize: Sequence[int]) -> str:
-    from thop import profile
-
-    stride = 64
-    img = torch.zeros((1, 3, stride, stride), device=next(model.parameters()).device)
-    flops, params = profile(deepcopy(model), inputs=(img,), verbose=False)
-    params /= 1e6
-    flops /= 1e9
-    flops *= tsize[0] * tsize[1] / stride / stride * 2  # Gflops
-    info = "Params: {:.2f}M, Gflops: {:.2f}".format(params, flops)
+    from .model_profiler import profile_model
+
+    # cached per architecture, see `profile_model`
+    profile = profile_model(model, tsize)
+    stats = profile["batches"]["1"][""]
+    info = "Params: {:.2f}M, Gflops: {:.2f}, Latency: {:.2f}ms".format(
+        profile["params"][""] / 1e6, stats["flops"] / 1e9, stats["time"]
+    )
     return info
 
 
@@ -77,22 +77,111 @@ def fuse_conv_and_bn(conv: nn.Conv2d, bn: nn.BatchNorm2d) -> nn.Conv2d:
     return fusedconv
 
 
-def fuse_model(model: nn.Module) -> nn.Module:
-    """fuse conv and bn in model
+def fuse_focus_conv(conv: nn.Conv2d) -> nn.Conv2d:
+    """
+    Fold the space to depth slicing of Focus into its convolution.
+
+    Args:
+        conv (nn.Conv2d): convolution of Focus, applied on the concatenated
+            top left, bottom left, top right and bottom right patches.
+
+    Returns:
+        nn.Conv2d: convolution with twice the kernel size, stride and padding applied on the
+            input image, which behaves the same as the slicing followed by the input conv.
+    """
+    in_channels = conv.in_channels // 4
+    fusedconv = (
+        nn.Conv2d(
+            in_channels,
+            conv.out_channels,
+            kernel_size=2 * conv.kernel_size[0],
+            stride=2 * conv.stride[0],
+            padding=2 * conv.padding[0],
+            bias=conv.bias is not None,
+        )
+        .requires_grad_(False)
+        .to(conv.weight.device)
+    )
+
+    # patch (dy, dx) of Focus only sees the pixels (2 * y + dy, 2 * x + dx) of the image
+    weight = torch.zeros_like(fusedconv.weight)
+    for idx, (dy, dx) in enumerate(((0, 0), (1, 0), (0, 1), (1, 1))):
+        weight[:, :, dy::2, dx::2] = conv.weight[:, idx * in_channels:(idx + 1) * in_channels]
+    fusedconv.weight.copy_(weight)
+    if conv.bias is not None:
+        fusedconv.bias.copy_(conv.bias)
+
+    return fusedconv
+
+
+def merge_convs(convs: Sequence[nn.Conv2d]) -> nn.Conv2d:
+    """
+    Merge convolutions applied on the same input into one conv with concatenated outputs.
+
+    Args:
+        convs (Sequence[nn.Conv2d]): convolutions sharing their input and hyper-parameters.
+
+    Returns:
+        nn.Conv2d: merged convolution, its output is the concatenation of the input convs outputs.
+    """
+    conv = convs[0]
+    mergedconv = (
+        nn.Conv2d(
+            conv.in_channels,
+            sum(c.out_channels for c in convs),
+            kernel_size=conv.kernel_size,
+            stride=conv.stride,
+            padding=conv.padding,
+            groups=conv.groups,
+            bias=True,
+        )
+        .requires_grad_(False)
+        .to(conv.weight.device)
+    )
+    mergedconv.weight.copy_(torch.cat([c.weight for c in convs]))
+    mergedconv.bias.copy_(torch.cat([
+        c.bias if c.bias is not None else torch.zeros_like(c.weight[:, 0, 0, 0]) for c in convs
+    ]))
+    return mergedconv
+
+
+def fuse_model(model: nn.Module, export: bool = False) -> nn.Module:
+    """
+    fuse model into an equivalent inference graph with fewer kernels:
+    conv and bn are fused, the slicing of Focus is folded into a strided conv,
+    and the reg and obj prediction convs of each head level are merged.
+    The cls prediction convs take other features, so they are left as they are.
 
     Args:
         model (nn.Module): model to fuse
+        export (bool): also replace nn.SiLU with the export friendly SiLU, like export tools do.
 
     Returns:
         nn.Module: fused model
     """
-    from yolox.models.network_blocks import BaseConv
+    from yolox.models.network_blocks import BaseConv, Focus, SiLU
+    from yolox.models.yolo_head import YOLOXHead
 
     for m in model.modules():
         if type(m) is BaseConv and hasattr(m, "bn"):
             m.conv = fuse_conv_and_bn(m.conv, m.bn)  # update conv
             delattr(m, "bn")  # remove batchnorm
             m.forward = m.fuseforward  # update forward
+
+    for m in model.modules():
+        if type(m) is Focus and m.forward != m.fuseforward:
+            m.conv.conv = fuse_focus_conv(m.conv.conv)
+            m.forward = m.fuseforward
+        elif isinstance(m, YOLOXHead) and m.reg_obj_preds is None:
+            m.reg_obj_preds = nn.ModuleList(
+                merge_convs([reg_pred, obj_pred])
+                for reg_pred, obj_pred in zip(m.reg_preds, m.obj_preds)
+            )
+            delattr(m, "reg_preds")
+            delattr(m, "obj_preds")
+
+    if export:
+        model = replace_module(model, nn.SiLU, SiLU)
     return model
 
 
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii Inc. All rights reserved.
+
+import json
+import os
+from loguru import logger
+
+import numpy as np
+
+import torch
+import torch.nn as nn
+
+from .model_cache import file_digest
+
+__all__ = ["ORTModel", "get_ort_model"]
+
+_NUMPY_DTYPES = {
+    torch.float32: np.float32,
+    torch.float16: np.float16,
+    torch.uint8: np.uint8,
+}
+_ORT_DTYPES = {
+    "tensor(float)": torch.float32,
+    "tensor(float16)": torch.float16,
+}
+
+
+class ORTModel(nn.Module):
+    """
+    Run an onnx model with onnxruntime in place of the pytorch model, eg. in the demo
+    :class:`Predictor` or the evaluators. Inputs and outputs are torch tensors, bound
+    to the session with IO binding, so no array is copied or allocated per call.
+
+    Args:
+        onnx_file (str): path of the onnx model.
+        providers (list): execution providers, the available ones by default.
+        opt_level (str): graph optimization level, one of disable, basic, extended, all.
+        intra_op_threads (int): threads used inside an op, 0 lets onnxruntime decide.
+        inter_op_threads (int): threads used across ops in parallel mode, 0 lets onnxruntime
+            decide.
+        parallel (bool): run independent branches of the graph in parallel.
+        optimized_file (str): where to cache the optimized graph. If it exists and was
+            optimized from the same onnx file, opt level, providers and onnxruntime version,
+            as recorded in its `.json` sidecar, the session is created from it and the graph
+            is not optimized again. Otherwise it is optimized and written again. With
+            opt_level "all" the cached graph is specific to the machine it was optimized on.
+
+    NOTE: the returned tensor is a buffer reused by the next call with the same input shape.
+    """
+
+    def __init__(
+        self,
+        onnx_file,
+        providers=None,
+        opt_level="all",
+        intra_op_threads=0,
+        inter_op_threads=0,
+        parallel=False,
+        optimized_file=None,
+    ):
+        super().__init__()
+        import onnxruntime as ort
+
+        levels = {
+            "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+            "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+            "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+            "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+        }
+        options = ort.SessionOptions()
+        options.graph_optimization_level = levels[opt_level]
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = (
+            ort.ExecutionMode.ORT_PARALLEL if parallel else ort.ExecutionMode.ORT_SEQUENTIAL
+        )
+        if providers is None:
+            providers = ort.get_available_providers()
+        cache_info = None
+        if optimized_file is not None:
+            cache_info = {
+                "source": file_digest(onnx_file),
+                "opt_level": opt_level,
+                "providers": list(providers),
+                "onnxruntime": ort.__version__,
+            }
+            info_file = optimized_file + ".json"
+            if _read_json(info_file) == cache_info and os.path.exists(optimized_file):
+                onnx_file = optimized_file
+                options.graph_optimization_level = levels["disable"]
+                cache_info = None
+            else:
+                if os.path.exists(optimized_file):
+                    logger.info("{} is out of date, optimizing {} again".format(
+                        optimized_file, onnx_file
+                    ))
+                options.optimized_model_filepath = optimized_file
+
+        self.session = ort.InferenceSession(onnx_file, options, providers=providers)
+        if cache_info is not None:
+            # written once the session has saved the optimized graph
+            with open(info_file, "w") as f:
+                json.dump(cache_info, f)
+        self.input_name = self.session.get_inputs()[0].name
+        self.output = self.session.get_outputs()[0]
+        self.io_binding = self.session.io_binding()
+        # output buffers, by input shape and device
+        self.output_buffers = {}
+
+    def forward(self, x):
+        x = x.contiguous()
+        device_type = "cuda" if x.is_cuda else "cpu"
+        device_id = x.device.index or 0
+        self.io_binding.bind_input(
+            self.input_name, device_type, device_id,
+            _NUMPY_DTYPES[x.dtype], tuple(x.shape), x.data_ptr(),
+        )
+
+        key = (tuple(x.shape), x.device)
+        output = self.output_buffers.get(key)
+        if output is None:
+            # let onnxruntime allocate the first output to learn its shape
+            self.io_binding.bind_output(self.output.name, device_type, device_id)
+            self.session.run_with_iobinding(self.io_binding)
+            shape = self.io_binding.get_outputs()[0].shape()
+            output = torch.empty(shape, dtype=_ORT_DTYPES[self.output.type], device=x.device)
+            self.output_buffers[key] = output
+        self.io_binding.bind_output(
+            self.output.name, device_type, device_id,
+            _NUMPY_DTYPES[output.dtype], tuple(output.shape), output.data_ptr(),
+        )
+        self.session.run_with_iobinding(self.io_binding)
+        return output
+
+
+def _read_json(file_name):
+    try:
+        with open(file_name) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def get_ort_model(model, exp, args):
+    """
+    Wrap the onnx model of `args.onnx`, with the decoder of its outputs if needed.
+
+    Args:
+        model (nn.Module): pytorch model of `exp`, whose head decodes the outputs of
+            onnx models exported without decoding.
+        exp (Exp): experiment of the model.
+        args (argparse.Namespace): onnx and ort options of tools/demo.py and tools/eval.py.
+
+    Returns:
+        tuple: the :class:`ORTModel` and the decoder of its outputs, or None.
+    """
+    decoder = None
+    if not args.decode_in_inference:
+        # a forward of the pytorch model sets up the grids of the decoder
+        model.head.decode_in_inference = False
+        x = torch.ones(1, 3, exp.test_size[0], exp.test_size[1])
+        with torch.no_grad():
+            model.eval()(x.type_as(next(model.parameters())))
+        decoder = model.head.decode_outputs
+    ort_model = ORTModel(
+        args.onnx,
+        opt_level=args.ort_opt_level,
+        intra_op_threads=args.ort_threads,
+        inter_op_threads=args.ort_inter_threads,
+        parallel=args.ort_parallel,
+        optimized_file=args.ort_cache,
+    )
+    return ort_model, decoder
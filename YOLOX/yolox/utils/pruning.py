@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii Inc. All rights reserved.
+
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+import torch
+import torch.nn as nn
+
+__all__ = [
+    "channel_groups",
+    "bn_gamma_importance",
+    "bn_taylor_importance",
+    "keep_bn_stats",
+    "prune_channels",
+    "get_pruned_channels",
+    "apply_pruned_channels",
+]
+
+
+def _producer(model: nn.Module, name: str) -> str:
+    """Name of the BaseConv computing the output channels of module ``name``."""
+    from yolox.models.network_blocks import DWConv
+
+    if isinstance(model.get_submodule(name), DWConv):
+        return name + ".pconv"
+    return name
+
+
+def channel_groups(model: nn.Module) -> List[Tuple[List[str], List[Tuple[str, int]]]]:
+    """
+    Find the channels of a YOLOX model which can be pruned without touching the inputs or
+    outputs of its blocks, so that the residual adds and the concats of YOLOPAFPN keep
+    matching shapes. These are the hidden channels of Bottleneck, CSPLayer and SPPBottleneck,
+    and the channels of the YOLOXHead stems and branches.
+
+    Args:
+        model (nn.Module): model to prune.
+
+    Returns:
+        list: (producers, consumers) groups. Producers are the names of the BaseConvs whose
+        output channels are pruned together, consumers are (name, offset) of the modules
+        reading them at ``offset`` of their input channels.
+    """
+    from yolox.models.network_blocks import Bottleneck, CSPLayer, SPPBottleneck
+    from yolox.models.yolo_head import YOLOXHead
+
+    groups = []
+    for name, m in model.named_modules():
+        prefix = name + "." if name else ""
+        if isinstance(m, Bottleneck):
+            groups.append(([prefix + "conv1"], [(prefix + "conv2", 0)]))
+        elif isinstance(m, CSPLayer):
+            hidden = m.conv2.conv.out_channels
+            groups.append(([prefix + "conv2"], [(prefix + "conv3", hidden)]))
+            # x_1 goes through the bottlenecks, tied together by their residual adds
+            chain = [prefix + "conv1"] + [
+                _producer(model, "{}m.{}.conv2".format(prefix, i)) for i in range(len(m.m))
+            ]
+            readers = [("{}m.{}.conv1".format(prefix, i), 0) for i in range(len(m.m))]
+            readers.append((prefix + "conv3", 0))
+            if len(m.m) > 0 and m.m[0].use_add:
+                groups.append((chain, readers))
+            else:
+                groups.extend(([p], [r]) for p, r in zip(chain, readers))
+        elif isinstance(m, SPPBottleneck):
+            hidden = m.conv1.conv.out_channels
+            groups.append(
+                ([prefix + "conv1"], [(prefix + "conv2", i * hidden) for i in range(len(m.m) + 1)])
+            )
+        elif isinstance(m, YOLOXHead):
+            for k in range(len(m.stems)):
+                cls0, cls1 = ["{}cls_convs.{}.{}".format(prefix, k, i) for i in range(2)]
+                reg0, reg1 = ["{}reg_convs.{}.{}".format(prefix, k, i) for i in range(2)]
+                groups.append((["{}stems.{}".format(prefix, k)], [(cls0, 0), (reg0, 0)]))
+                groups.append(([_producer(model, cls0)], [(cls1, 0)]))
+                groups.append(([_producer(model, reg0)], [(reg1, 0)]))
+                groups.append(
+                    ([_producer(model, cls1)], [("{}cls_preds.{}".format(prefix, k), 0)])
+                )
+                groups.append(([_producer(model, reg1)], [
+                    ("{}reg_preds.{}".format(prefix, k), 0),
+                    ("{}obj_preds.{}".format(prefix, k), 0),
+                ]))
+    return groups
+
+
+def bn_gamma_importance(model: nn.Module) -> Dict[str, torch.Tensor]:
+    """Channel importance as the absolute scale of the batchnorm following each conv."""
+    return {
+        name: m.weight.detach().abs()
+        for name, m in model.named_modules() if isinstance(m, nn.BatchNorm2d)
+    }
+
+
+def bn_taylor_importance(model: nn.Module) -> Dict[str, torch.Tensor]:
+    """
+    First order Taylor estimate of the loss change when a channel is removed,
+    |gamma * dL/dgamma + beta * dL/dbeta|. Gradients of the loss must have been
+    accumulated on the model, eg. by calling ``backward`` over a few batches, within
+    :func:`keep_bn_stats` so that these batches do not change the running stats.
+    """
+    importance = {}
+    for name, m in model.named_modules():
+        if isinstance(m, nn.BatchNorm2d) and m.weight.grad is not None:
+            importance[name] = (
+                m.weight * m.weight.grad + m.bias * m.bias.grad
+            ).detach().abs()
+    return importance
+
+
+@contextmanager
+def keep_bn_stats(model: nn.Module):
+    """
+    Restore the batchnorm running stats of ``model`` on exit, eg. around the training mode
+    forwards of :func:`bn_taylor_importance`, which would otherwise replace the stats of the
+    model being pruned by those of the scoring batches.
+    """
+    stats = {
+        name: buffer.clone() for name, buffer in model.named_buffers()
+        if isinstance(model.get_submodule(name.rpartition(".")[0]), nn.modules.batchnorm._BatchNorm)
+    }
+    try:
+        yield model
+    finally:
+        buffers = dict(model.named_buffers())
+        with torch.no_grad():
+            for name, buffer in stats.items():
+                buffers[name].copy_(buffer)
+
+
+def _prune_conv(conv: nn.Conv2d, in_idx=None, out_idx=None) -> nn.Conv2d:
+    depthwise = conv.groups > 1 and conv.groups == conv.in_channels == conv.out_channels
+    if depthwise:
+        # the channels of a depthwise conv are its input channels
+        out_idx = in_idx if in_idx is not None else out_idx
+        in_idx = None
+    weight = conv.weight.detach()
+    if out_idx is not None:
+        weight = weight[out_idx]
+    if in_idx is not None:
+        weight = weight[:, in_idx]
+    out_channels = weight.shape[0]
+    pruned = nn.Conv2d(
+        weight.shape[1] * (out_channels if depthwise else conv.groups),
+        out_channels,
+        kernel_size=conv.kernel_size,
+        stride=conv.stride,
+        padding=conv.padding,
+        groups=out_channels if depthwise else conv.groups,
+        bias=conv.bias is not None,
+    ).to(weight.device)
+    pruned.weight.data.copy_(weight)
+    if conv.bias is not None:
+        bias = conv.bias.detach()
+        pruned.bias.data.copy_(bias if out_idx is None else bias[out_idx])
+    return pruned
+
+
+def _prune_bn(bn: nn.BatchNorm2d, idx) -> nn.BatchNorm2d:
+    pruned = nn.BatchNorm2d(len(idx), eps=bn.eps, momentum=bn.momentum).to(bn.weight.device)
+    pruned.train(bn.training)
+    for key in ("weight", "bias", "running_mean", "running_var"):
+        getattr(pruned, key).data.copy_(getattr(bn, key).detach()[idx])
+    return pruned
+
+
+def _prune_input(model: nn.Module, name: str, idx):
+    from yolox.models.network_blocks import BaseConv, DWConv
+
+    m = model.get_submodule(name)
+    if isinstance(m, DWConv):
+        m.dconv.conv = _prune_conv(m.dconv.conv, in_idx=idx)
+        m.dconv.bn = _prune_bn(m.dconv.bn, idx)
+        m.pconv.conv = _prune_conv(m.pconv.conv, in_idx=idx)
+    elif isinstance(m, BaseConv):
+        m.conv = _prune_conv(m.conv, in_idx=idx)
+    else:
+        parent, _, key = name.rpartition(".")
+        model.get_submodule(parent).add_module(key, _prune_conv(m, in_idx=idx))
+
+
+def prune_channels(
+    model: nn.Module,
+    importance: Dict[str, torch.Tensor],
+    ratio: float,
+    divisor: int = 8,
+) -> nn.Module:
+    """
+    Physically remove the least important channels of every group found by
+    :func:`channel_groups`, in place.
+
+    Args:
+        model (nn.Module): unfused model to prune.
+        importance (dict): per channel importance of each batchnorm, by module name,
+            see :func:`bn_gamma_importance` and :func:`bn_taylor_importance`.
+        ratio (float): fraction of the channels to remove in each group.
+        divisor (int): number of kept channels is rounded to a multiple of it,
+            which the CPU kernels run faster on.
+
+    Returns:
+        nn.Module: the pruned model.
+    """
+    groups = channel_groups(model)
+
+    # choose all the kept channels first, since pruning shifts the concat offsets
+    plans = []
+    for producers, consumers in groups:
+        channels = model.get_submodule(producers[0]).conv.out_channels
+        score = sum(
+            importance[p + ".bn"] / (importance[p + ".bn"].max() + 1e-12)
+            for p in producers
+        )
+        num_keep = int(round(channels * (1 - ratio) / divisor)) * divisor
+        num_keep = min(max(num_keep, divisor), channels)
+        keep = score.topk(num_keep)[1].sort()[0]
+        plans.append((producers, consumers, channels, keep))
+
+    input_masks = {}
+    for producers, consumers, channels, keep in plans:
+        for name, offset in consumers:
+            if name not in input_masks:
+                m = model.get_submodule(name)
+                conv = m.dconv.conv if hasattr(m, "dconv") else getattr(m, "conv", m)
+                input_masks[name] = torch.ones(conv.in_channels, dtype=torch.bool)
+            mask = input_masks[name]
+            mask[offset:offset + channels] = False
+            mask[offset + keep.cpu()] = True
+
+    for producers, _, _, keep in plans:
+        for name in producers:
+            m = model.get_submodule(name)
+            m.conv = _prune_conv(m.conv, out_idx=keep)
+            m.bn = _prune_bn(m.bn, keep)
+    for name, mask in input_masks.items():
+        _prune_input(model, name, mask.nonzero().squeeze(1))
+    return model
+
+
+def get_pruned_channels(
+    model: nn.Module, reference: nn.Module
+) -> Dict[str, Sequence[int]]:
+    """
+    Shapes of the convs of ``model`` which differ from the unpruned ``reference``.
+
+    Returns:
+        dict: [in_channels, out_channels, groups] of the pruned convs, by module name.
+    """
+    reference_convs = dict(reference.named_modules())
+    channels = {}
+    for name, m in model.named_modules():
+        if isinstance(m, nn.Conv2d):
+            shape = [m.in_channels, m.out_channels, m.groups]
+            ref = reference_convs[name]
+            if shape != [ref.in_channels, ref.out_channels, ref.groups]:
+                channels[name] = shape
+    return channels
+
+
+def apply_pruned_channels(model: nn.Module, channels: Dict[str, Sequence[int]]) -> nn.Module:
+    """
+    Rebuild the convs and batchnorms of an unpruned model with the shapes returned by
+    :func:`get_pruned_channels`, so that a pruned checkpoint can be loaded into it.
+    Weights of the rebuilt layers are re-initialized.
+    """
+    for name, (in_channels, out_channels, groups) in channels.items():
+        parent_name, _, key = name.rpartition(".")
+        parent = model.get_submodule(parent_name)
+        conv = getattr(parent, key)
+        parent.add_module(key, nn.Conv2d(
+            in_channels,
+            out_channels,
+            kernel_size=conv.kernel_size,
+            stride=conv.stride,
+            padding=conv.padding,
+            groups=groups,
+            bias=conv.bias is not None,
+        ).to(conv.weight.device))
+        bn = getattr(parent, "bn", None)
+        if isinstance(bn, nn.BatchNorm2d) and bn.num_features != out_channels:
+            parent.bn = nn.BatchNorm2d(out_channels, eps=bn.eps, momentum=bn.momentum).to(
+                bn.weight.device
+            ).train(bn.training)
+    return model
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii Inc. All rights reserved.
+
+import random
+
+import numpy as np
+
+__all__ = ["counter_rng", "global_rng"]
+
+
+def counter_rng(seed, *counters, stream=0):
+    """
+    Counter-based random generator of the stream `counters` (e.g. batch index, position
+    in the batch, sample index) of `seed`. It does not depend on any previous draw, so that
+    the random numbers of a sample are the same whichever process draws them and whatever
+    was drawn before, e.g. after resuming a training.
+
+    Args:
+        seed (int): non negative 64 bits seed.
+        counters (int): up to 3 non negative ints selecting the stream. Every stream gets
+            its own 2**64 block of the Philox counter, streams never overlap.
+        stream (int): kind of the random draws, so that e.g. the augmentations and the
+            sampling of the same seed and counters are independent. With the seed, it
+            makes the 128 bits Philox key.
+
+    Returns:
+        np.random.Generator: the generator.
+    """
+    assert len(counters) <= 3, "at most 3 counters, got {}".format(len(counters))
+    counter = [0, *counters] + [0] * (3 - len(counters))
+    key = (stream << 64) | (seed & (2 ** 64 - 1))
+    return np.random.Generator(np.random.Philox(key=key, counter=counter))
+
+
+def global_rng():
+    """
+    Generator seeded from the global `random` state, for draws without a counter key,
+    which keeps them reproducible with `random.seed`.
+    """
+    return np.random.default_rng(random.getrandbits(64))
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii Inc. All rights reserved.
+
+import math
+
+import numpy as np
+
+__all__ = ["roi_region", "roi_input_size"]
+
+
+def roi_region(boxes, img_shape, margin=0.5):
+    """
+    Region of interest around the union of previous detections.
+
+    Args:
+        boxes (np.ndarray or Tensor): `[N, 4]` xyxy boxes in image coordinates.
+        img_shape (tuple): (height, width) of the image.
+        margin (float): the union is grown on each side by this fraction of its size.
+
+    Returns:
+        tuple: (x0, y0, x1, y1) int corners of the region, clipped to the image.
+    """
+    boxes = np.asarray(boxes.cpu() if hasattr(boxes, "cpu") else boxes, dtype=np.float64)
+    x0, y0 = boxes[:, :2].min(axis=0)
+    x1, y1 = boxes[:, 2:4].max(axis=0)
+    pad_x, pad_y = margin * (x1 - x0), margin * (y1 - y0)
+    height, width = img_shape[:2]
+    x0, y0 = int(max(math.floor(x0 - pad_x), 0)), int(max(math.floor(y0 - pad_y), 0))
+    # at least a pixel, even for degenerate boxes
+    x1 = int(max(min(math.ceil(x1 + pad_x), width), x0 + 1))
+    y1 = int(max(min(math.ceil(y1 + pad_y), height), y0 + 1))
+    return x0, y0, x1, y1
+
+
+def roi_input_size(roi_shape, img_shape, test_size, stride=32):
+    """
+    Model input size of a region, chosen so that the objects keep the scale they have
+    when the whole image is letterboxed into `test_size`, which the model is trained for.
+
+    Args:
+        roi_shape (tuple): (height, width) of the region.
+        img_shape (tuple): (height, width) of the whole image.
+        test_size (tuple): (height, width) input size of the whole image.
+        stride (int): the size is rounded up to a multiple of it.
+
+    Returns:
+        tuple: (height, width) input size, at most `test_size`.
+    """
+    ratio = min(test_size[0] / img_shape[0], test_size[1] / img_shape[1])
+    return tuple(
+        int(min(max(math.ceil(length * ratio / stride), 1) * stride, max_length))
+        for length, max_length in zip(roi_shape[:2], test_size)
+    )
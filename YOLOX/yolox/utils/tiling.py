@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii Inc. All rights reserved.
+
+import math
+
+import numpy as np
+
+import torch
+import torchvision
+
+from .boxes import bboxes_iou, postprocess
+
+__all__ = ["tile_offsets", "tile_image", "merge_tiles", "weighted_box_fusion"]
+
+
+def tile_offsets(length, tile, overlap):
+    """Evenly spaced origins of the tiles covering `length` with at least `overlap` of a tile."""
+    if length <= tile:
+        return [0]
+    step = tile * (1 - overlap)
+    num_tiles = math.ceil((length - tile) / step) + 1
+    return np.linspace(0, length - tile, num_tiles).round().astype(int).tolist()
+
+
+def tile_image(img, tile_size, overlap=0.2, full_image=False, out=None, dtype=np.float32):
+    """
+    Cut an image into overlapping tiles of the model input size, batched in one array.
+
+    Args:
+        img (np.ndarray): HWC BGR image.
+        tile_size (tuple): (height, width) of the tiles, usually the test size of the model.
+        overlap (float): min overlap between neighbouring tiles, as a fraction of the tile.
+        full_image (bool): also add the whole image letterboxed to `tile_size` as the last
+            tile, to detect the objects larger than a tile.
+        out (np.ndarray, optional): buffer reused across calls, see `preproc_batch`.
+        dtype (np.dtype): dtype of the output if `out` is not given.
+
+    Returns:
+        np.ndarray: tiles of shape `[N, 3, tile_h, tile_w]`.
+        np.ndarray: `[N, 3]` (x0, y0, ratio) of the tiles. A point of a tile maps to
+        the image point `point / ratio + (x0, y0)`.
+    """
+    from yolox.data.data_augment import preproc_batch
+
+    height, width = img.shape[:2]
+    crops, origins = [], []
+    for y0 in tile_offsets(height, tile_size[0], overlap):
+        for x0 in tile_offsets(width, tile_size[1], overlap):
+            crops.append(img[y0:y0 + tile_size[0], x0:x0 + tile_size[1]])
+            origins.append((x0, y0))
+    if full_image:
+        crops.append(img)
+        origins.append((0, 0))
+
+    tiles, ratios = preproc_batch(crops, tile_size, out=out, dtype=dtype)
+    tile_info = np.concatenate([np.array(origins), np.array(ratios)[:, None]], axis=1)
+    return tiles, tile_info.astype(np.float32)
+
+
+def weighted_box_fusion(detections, iou_thr, class_agnostic=False):
+    """
+    Fuse the detections overlapping more than `iou_thr` into their score weighted mean box,
+    instead of keeping only the best one like NMS.
+
+    Args:
+        detections (Tensor): `[N, 7]` (x1, y1, x2, y2, obj_conf, class_conf, class_pred).
+        iou_thr (float): IoU above which two detections are fused.
+        class_agnostic (bool): fuse detections of different classes too.
+
+    Returns:
+        Tensor: `[M, 7]` fused detections, with the confidences of their best member.
+    """
+    scores = detections[:, 4] * detections[:, 5]
+    classes = torch.zeros_like(detections[:, 6]) if class_agnostic else detections[:, 6]
+    keep = torchvision.ops.batched_nms(detections[:, :4], scores, classes, iou_thr)
+
+    # NMS suppressed every other box through a higher scored kept one of its class,
+    # assign it to the first of them in score order
+    ious = bboxes_iou(detections[:, :4], detections[keep, :4])
+    ious[classes[:, None] != classes[keep][None, :]] = 0
+    ious[keep, torch.arange(len(keep), device=keep.device)] = 1
+    cluster = (ious > iou_thr).float().argmax(dim=1)
+
+    weights = torch.zeros(len(keep), device=scores.device, dtype=scores.dtype)
+    weights.index_add_(0, cluster, scores)
+    boxes = torch.zeros(len(keep), 4, device=scores.device, dtype=scores.dtype)
+    boxes.index_add_(0, cluster, detections[:, :4] * scores[:, None])
+
+    fused = detections[keep].clone()
+    fused[:, :4] = boxes / weights[:, None]
+    return fused
+
+
+def merge_tiles(
+    outputs, tile_info, num_classes, conf_thre=0.3, nms_thre=0.45, merge="nms",
+    class_agnostic=False,
+):
+    """
+    Map the decoded model outputs of the tiles of :func:`tile_image` back to the image and
+    merge the detections of all the tiles.
+
+    Args:
+        outputs (Tensor): `[N, n_anchors, 5 + num_classes]` decoded outputs of the tiles.
+        tile_info (np.ndarray or Tensor): `[N, 3]` (x0, y0, ratio) of the tiles.
+        num_classes (int): number of classes.
+        conf_thre (float): score threshold of the detections.
+        nms_thre (float): IoU threshold of the merge.
+        merge (str): "nms" keeps the best of overlapping detections, "wbf" fuses them with
+            :func:`weighted_box_fusion`.
+        class_agnostic (bool): merge detections of different classes too.
+
+    Returns:
+        Tensor: `[M, 7]` (x1, y1, x2, y2, obj_conf, class_conf, class_pred) in image
+        coordinates, or None if nothing is detected.
+    """
+    assert merge in ("nms", "wbf"), "unknown merge {}".format(merge)
+    tile_info = torch.as_tensor(tile_info, dtype=outputs.dtype, device=outputs.device)
+    outputs = outputs.clone()
+    outputs[..., :4] /= tile_info[:, None, 2:3]
+    outputs[..., :2] += tile_info[:, None, :2]
+
+    # the anchors of all the tiles are the candidates of one image
+    outputs = outputs.reshape(1, -1, outputs.shape[-1])
+    if merge == "nms":
+        return postprocess(outputs, num_classes, conf_thre, nms_thre, class_agnostic)[0]
+
+    # threshold only, NMS with an IoU above 1 keeps everything
+    detections = postprocess(outputs, num_classes, conf_thre, 1.1, class_agnostic)[0]
+    if detections is None:
+        return None
+    return weighted_box_fusion(detections, nms_thre, class_agnostic)
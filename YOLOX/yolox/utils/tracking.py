@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# Copyright (c) Megvii Inc. All rights reserved.
+
+import itertools
+
+import cv2
+import numpy as np
+
+__all__ = ["BoxTracker", "DetectionScheduler", "frame_motion"]
+
+
+def _box_iou(boxes_a, boxes_b):
+    """IoU matrix of two sets of xyxy boxes."""
+    tl = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    br = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+class _Track(object):
+    """
+    Constant velocity Kalman filter on (cx, cy, w, h) of one object, with noises
+    proportional to the box size like SORT / ByteTrack.
+    """
+
+    std_position = 1.0 / 20
+    std_velocity = 1.0 / 160
+
+    def __init__(self, box, score, cls, track_id):
+        cxcywh = np.array(
+            [(box[0] + box[2]) / 2, (box[1] + box[3]) / 2, box[2] - box[0], box[3] - box[1]]
+        )
+        self.mean = np.concatenate([cxcywh, np.zeros(4)])
+        size = np.array([cxcywh[2], cxcywh[3]] * 2)
+        std = np.concatenate([2 * self.std_position * size, 10 * self.std_velocity * size])
+        self.covariance = np.diag(std ** 2)
+        self.score = score
+        self.cls = cls
+        self.track_id = track_id
+        self.hits = 1
+        self.misses = 0
+        self.frames_since_update = 0
+
+    @property
+    def box(self):
+        cx, cy, w, h = self.mean[:4]
+        return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2])
+
+    def predict(self):
+        transition = np.eye(8)
+        transition[:4, 4:] = np.eye(4)
+        size = np.array([self.mean[2], self.mean[3]] * 2)
+        noise = np.concatenate([self.std_position * size, self.std_velocity * size]) ** 2
+        self.mean = transition @ self.mean
+        self.covariance = transition @ self.covariance @ transition.T + np.diag(noise)
+        # a box can not shrink below a pixel
+        self.mean[2:4] = np.maximum(self.mean[2:4], 1)
+        self.frames_since_update += 1
+
+    def update(self, box, score, momentum):
+        measurement = np.array(
+            [(box[0] + box[2]) / 2, (box[1] + box[3]) / 2, box[2] - box[0], box[3] - box[1]]
+        )
+        size = np.array([self.mean[2], self.mean[3]] * 2)
+        innovation_cov = self.covariance[:4, :4] + np.diag((self.std_position * size) ** 2)
+        gain = np.linalg.solve(innovation_cov, self.covariance[:4]).T
+        self.mean = self.mean + gain @ (measurement - self.mean[:4])
+        self.covariance = self.covariance - gain @ self.covariance[:4]
+        self.score = momentum * self.score + (1 - momentum) * score
+        self.hits += 1
+        self.misses = 0
+        self.frames_since_update = 0
+
+
+class BoxTracker(object):
+    """
+    Lightweight IoU + Kalman tracker propagating detections between the frames the
+    detector runs on. Call :meth:`predict` on every frame, then :meth:`update` with the
+    detections of the frames the detector ran on.
+
+    Each track keeps an id and a stable score, the moving average of the scores of its
+    detections. Its confidence is the stable score decayed by ``score_decay`` for every
+    frame since its last detection, so that it drops while the track is only propagated.
+
+    Args:
+        iou_thre (float): min IoU between a propagated track and a detection of its class
+            to match them.
+        score_momentum (float): momentum of the moving average of the detection scores.
+        score_decay (float): decay of the confidence per frame without detection.
+        max_age (int): tracks not detected for more frames are removed.
+        max_misses (int): tracks missed by more consecutive detector runs are removed.
+    """
+
+    def __init__(
+        self, iou_thre=0.3, score_momentum=0.6, score_decay=0.95, max_age=30, max_misses=1
+    ):
+        self.iou_thre = iou_thre
+        self.score_momentum = score_momentum
+        self.score_decay = score_decay
+        self.max_age = max_age
+        self.max_misses = max_misses
+        self.tracks = []
+        self._next_id = itertools.count(1)
+
+    def predict(self):
+        """Propagate the tracks one frame forward and return :meth:`outputs`."""
+        for track in self.tracks:
+            track.predict()
+        self.tracks = [t for t in self.tracks if t.frames_since_update <= self.max_age]
+        return self.outputs()
+
+    def update(self, detections):
+        """
+        Match the detections of the current frame to the propagated tracks, greedily by IoU.
+        Unmatched detections start new tracks.
+
+        Args:
+            detections (np.ndarray or Tensor): ``[N, 7]`` (x1, y1, x2, y2, obj_conf,
+                class_conf, class_pred) in image coordinates, or None.
+
+        Returns:
+            np.ndarray: see :meth:`outputs`.
+        """
+        if detections is None:
+            detections = np.zeros((0, 7))
+        detections = np.asarray(
+            detections.cpu() if hasattr(detections, "cpu") else detections, dtype=np.float64
+        )
+        boxes = detections[:, :4]
+        scores = detections[:, 4] * detections[:, 5]
+        classes = detections[:, 6]
+
+        matched_tracks, matched_dets = set(), set()
+        if self.tracks and len(detections):
+            ious = _box_iou(np.stack([t.box for t in self.tracks]), boxes)
+            ious[np.array([t.cls for t in self.tracks])[:, None] != classes[None, :]] = 0
+            for index in np.argsort(-ious, axis=None):
+                i, j = np.unravel_index(index, ious.shape)
+                if ious[i, j] < self.iou_thre:
+                    break
+                if i in matched_tracks or j in matched_dets:
+                    continue
+                self.tracks[i].update(boxes[j], scores[j], self.score_momentum)
+                matched_tracks.add(i)
+                matched_dets.add(j)
+
+        for i, track in enumerate(self.tracks):
+            if i not in matched_tracks:
+                track.misses += 1
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+        for j in range(len(detections)):
+            if j not in matched_dets:
+                self.tracks.append(
+                    _Track(boxes[j], scores[j], int(classes[j]), next(self._next_id))
+                )
+        return self.outputs()
+
+    def scores(self):
+        """Stable score of each track."""
+        return np.array([t.score for t in self.tracks])
+
+    def confidences(self):
+        """Stable score of each track, decayed by the frames since its last detection."""
+        return np.array(
+            [t.score * self.score_decay ** t.frames_since_update for t in self.tracks]
+        )
+
+    def outputs(self):
+        """
+        Returns:
+            np.ndarray: ``[M, 7]`` (x1, y1, x2, y2, confidence, class_pred, track_id)
+            of the tracks, in image coordinates.
+        """
+        if not self.tracks:
+            return np.zeros((0, 7))
+        return np.concatenate([
+            np.stack([t.box for t in self.tracks]),
+            self.confidences()[:, None],
+            np.array([[t.cls, t.track_id] for t in self.tracks]),
+        ], axis=1)
+
+    def class_scores(self, num_classes):
+        """Best confidence of the tracks of each class, eg. to trigger a capture."""
+        scores = np.zeros(num_classes)
+        tracks = self.outputs()
+        np.maximum.at(scores, tracks[:, 5].astype(int), tracks[:, 4])
+        return scores
+
+
+def frame_motion(frame_a, frame_b, size=64):
+    """Mean absolute difference of two BGR frames in [0, 1], on small gray thumbnails."""
+    thumbs = [
+        cv2.resize(cv2.cvtColor(f, cv2.COLOR_BGR2GRAY), (size, size), interpolation=cv2.INTER_AREA)
+        for f in (frame_a, frame_b)
+    ]
+    return float(np.abs(thumbs[0].astype(np.float32) - thumbs[1]).mean()) / 255
+
+
+class DetectionScheduler(object):
+    """
+    Decide on which frames of a video the detector runs, the :class:`BoxTracker`
+    propagating the boxes on the others. The detector runs every ``interval`` frames,
+    and earlier when the frame moved by more than ``motion_thre`` since the last detection
+    or the confidence of a track scored above ``track_conf`` fell below it, so that the
+    tracks around a decision threshold are confirmed by the detector.
+
+    Args:
+        interval (int): max frames between two detections, 1 detects on every frame.
+        motion_thre (float): :func:`frame_motion` since the last detection above which
+            the detector runs.
+        track_conf (float): track confidence below which the detector runs.
+    """
+
+    def __init__(self, interval=5, motion_thre=0.05, track_conf=0.3):
+        self.interval = interval
+        self.motion_thre = motion_thre
+        self.track_conf = track_conf
+        self.last_frame = None
+        self.frames_since_detection = 0
+        self.num_frames = 0
+        self.num_detections = 0
+
+    def need_detection(self, frame, tracker):
+        """Whether to run the detector on ``frame``, to call on every frame."""
+        self.num_frames += 1
+        self.frames_since_detection += 1
+        detect = (
+            self.last_frame is None
+            or self.frames_since_detection >= self.interval
+            or frame_motion(self.last_frame, frame) > self.motion_thre
+            or bool(
+                ((tracker.scores() >= self.track_conf) & (tracker.confidences() < self.track_conf))
+                .any()
+            )
+        )
+        if detect:
+            self.last_frame = frame
+            self.frames_since_detection = 0
+            self.num_detections += 1
+        return detect
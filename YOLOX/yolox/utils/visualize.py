@@ -8,7 +8,7 @@ import numpy as np
 __all__ = ["vis"]
 
 
-def vis(img, boxes, scores, cls_ids, conf=0.5, class_names=None):
+def vis(img, boxes, scores, cls_ids, conf=0.5, class_names=None, track_ids=None):
 
     for i in range(len(boxes)):
         box = boxes[i]
@@ -23,6 +23,8 @@ def vis(img, boxes, scores, cls_ids, conf=0.5, class_names=None):
 
         color = (_COLORS[cls_id] * 255).astype(np.uint8).tolist()
         text = '{}:{:.1f}%'.format(class_names[cls_id], score * 100)
+        if track_ids is not None:
+            text = '#{} {}'.format(int(track_ids[i]), text)
         txt_color = (0, 0, 0) if np.mean(_COLORS[cls_id]) > 0.5 else (255, 255, 255)
         font = cv2.FONT_HERSHEY_SIMPLEX
 